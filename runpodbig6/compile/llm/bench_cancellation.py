@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Client cancellation and timeout-storm benchmark.
+
+Production clients close streams when users navigate away, and requests that hit the client
+timeout are dropped the same way. If the server frees the KV cache of an aborted request
+promptly, the capacity goes to the surviving requests; if it keeps decoding into a closed
+socket, cancellations buy nothing. This replays the same seeded Poisson arrival process twice:
+
+    control   every stream is read to the end
+    cancel    --cancel-fraction of the streams are closed after a random number of tokens
+              (uniform over 1..max_tokens-1), plus any stream that exceeds --timeout
+
+and compares throughput and latency of the surviving requests, the server's waiting/running
+queues and KV cache usage over time (/metrics), and the decode work the aborts should have saved.
+Survivor metrics and goodput of the control run are computed over the same plan indices that
+survived (or were not aborted) in the cancel run, so fewer survivors alone never shows up as a change.
+
+Usage: python bench_cancellation.py [--label vllm] [--rate 8] [--cancel-fraction 0.3] [--duration 60]
+"""
+
+import argparse
+import asyncio
+import random
+from datetime import datetime
+
+from loadgen import (add_slo_args, build_payload, chat_url, goodput, itl_ms, new_session, now, percentiles,
+                     save_results, slo_from_args, stream_chat)
+from server_metrics import MetricsPoller
+from trace_export import add_trace_args, save_trace
+
+MODEL = "Qwen3-235B-A22B-Instruct-FP8"
+QUESTIONS = [
+    "Explain how a hash map handles collisions.", "What is the difference between TCP and UDP?",
+    "Describe how garbage collection works in Python.", "How does HTTPS protect data in transit?",
+    "What is a race condition and how do you prevent one?", "Explain eventual consistency with an example.",
+]
+
+
+def plan(args):
+    """Seeded arrival times and abort points, identical for the control and cancel runs."""
+    rng = random.Random(args.seed)
+    requests, t = [], 0.0
+    while True:
+        t += rng.expovariate(args.rate)
+        if t >= args.duration:
+            return requests
+        cancel = rng.random() < args.cancel_fraction
+        requests.append({"t": t, "abort_after": rng.randint(1, args.max_tokens - 1) if cancel else None})
+
+
+async def wait_for_idle(url, limit=120.0):
+    """Let the previous run's queue drain before the next one starts."""
+    poller = MetricsPoller(url, interval=1.0).start()
+    deadline = now() + limit
+    while now() < deadline:
+        await asyncio.sleep(1.0)
+        if poller.samples and poller.samples[-1].get("running", 0) == 0 and poller.samples[-1].get("waiting", 0) == 0:
+            break
+    await poller.stop()
+
+
+async def run_once(args, requests, cancel):
+    url = chat_url(args.url)
+    poller = MetricsPoller(args.url, interval=args.poll_interval).start()
+    tasks = []
+    async with new_session(args.timeout) as session:
+        start = now()
+        for i, req in enumerate(requests):
+            await asyncio.sleep(max(0.0, start + req["t"] - now()))
+            question = f"{QUESTIONS[i % len(QUESTIONS)]} (request {i})"
+            payload = build_payload(args.model, [{"role": "user", "content": question}], args.max_tokens,
+                                    ignore_eos=True)
+            abort_after = req["abort_after"] if cancel else None
+            tasks.append(asyncio.create_task(stream_chat(session, url, payload, abort_after=abort_after)))
+        records = await asyncio.gather(*tasks)
+        end = now()
+    for i, record in enumerate(records):
+        record["id"] = i
+    await poller.stop()
+    return summarize_run(args, records, start, end, poller), {"records": records, "samples": poller.samples}
+
+
+def completed(record):
+    return not record["aborted"] and not record["error"] and record["ttft"] is not None
+
+
+def request_metrics(args, survivors, kept, duration):
+    """Throughput and latency of the completed requests, and goodput of the non-aborted ones."""
+    return {
+        "survivor_tokens_per_second": sum(r["tokens"] for r in survivors) / duration if duration else None,
+        "survivor_requests_per_second": len(survivors) / duration if duration else None,
+        "survivor_ttft_ms": percentiles([r["ttft"] * 1000 for r in survivors]),
+        "survivor_itl_ms": percentiles([g for r in survivors for g in itl_ms(r)]),
+        "survivor_e2e_s": percentiles([r["time"] for r in survivors]),
+        # Aborted streams are the client's choice, so they count neither for nor against the SLO
+        "goodput": goodput(kept, duration, slo_from_args(args)),
+    }
+
+
+def match_control(args, control, control_records, cancel_records):
+    """Recompute the control run's request metrics over the plan indices the cancel run kept."""
+    survived = {r["id"] for r in cancel_records if completed(r)}
+    kept = {r["id"] for r in cancel_records if not r["aborted"]}
+    control.update(request_metrics(args, [r for r in control_records if r["id"] in survived and completed(r)],
+                                   [r for r in control_records if r["id"] in kept], control["duration_s"]))
+    control["matched_requests"] = len(survived)
+
+
+def summarize_run(args, records, start, end, poller):
+    survivors = [r for r in records if completed(r)]
+    aborted = [r for r in records if r["aborted"]]
+    timeouts = [r for r in records if r["error"] and "Timeout" in r["error"]]
+    duration = end - start
+    timeline = []
+    t0 = 0.0
+    while t0 < duration:
+        window = [s for s in poller.samples if t0 <= s["t"] - start < t0 + args.window]
+        timeline.append({
+            "t": t0,
+            "waiting": max((s.get("waiting", 0) for s in window), default=None),
+            "running": max((s.get("running", 0) for s in window), default=None),
+            "kv_usage": max((s.get("kv_usage", 0) for s in window), default=None),
+        })
+        t0 += args.window
+    return {
+        "duration_s": duration,
+        "num_requests": len(records),
+        "completed": len(survivors),
+        "aborted": len(aborted),
+        "timeouts": len(timeouts),
+        "other_errors": sum(1 for r in records if r["error"]) - len(timeouts),
+        "tokens_not_generated": sum(args.max_tokens - r["tokens"] for r in aborted + timeouts),
+        **request_metrics(args, survivors, [r for r in records if not r["aborted"]], duration),
+        "waiting_mean": poller.mean("waiting"),
+        "waiting_peak": poller.peak("waiting"),
+        "running_mean": poller.mean("running"),
+        "kv_usage_mean": poller.mean("kv_usage"),
+        "timeline": timeline,
+    }
+
+
+def delta(control, cancel, lower_is_better=True):
+    if control is None or cancel is None or not control:
+        return "n/a"
+    change = (cancel - control) / control * 100
+    if lower_is_better is None or change == 0:
+        return f"{change:+.1f}%"
+    better = change < 0 if lower_is_better else change > 0
+    return f"{change:+.1f}% {'✅' if better else '⚠️ '}"
+
+
+def print_comparison(control, cancel):
+    rows = [
+        ("Completed requests", "completed", "{:.0f}", None),
+        ("Aborted / timed out", None, None, None),
+        ("Survivor tok/s", "survivor_tokens_per_second", "{:.1f}", None),
+        ("Survivor req/s", "survivor_requests_per_second", "{:.2f}", None),
+        ("Survivor TTFT p50 (ms)", ("survivor_ttft_ms", "p50"), "{:.1f}", True),
+        ("Survivor TTFT p99 (ms)", ("survivor_ttft_ms", "p99"), "{:.1f}", True),
+        ("Survivor ITL p50 (ms)", ("survivor_itl_ms", "p50"), "{:.2f}", True),
+        ("Survivor e2e p50 (s)", ("survivor_e2e_s", "p50"), "{:.2f}", True),
+        ("SLO met (non-aborted)", ("goodput", "attainment"), "{:.1%}", False),
+        ("Goodput tok/s", ("goodput", "tokens_per_second"), "{:.1f}", None),
+        ("Waiting queue mean", "waiting_mean", "{:.1f}", True),
+        ("Waiting queue peak", "waiting_peak", "{:.0f}", True),
+        ("Running mean", "running_mean", "{:.1f}", True),
+        ("KV cache usage mean", "kv_usage_mean", "{:.3f}", True),
+    ]
+    print(f"{'Metric':<26} {'control':>12} {'cancel':>12} {'change':>14}")
+    print(f"{'─'*26} {'─'*12} {'─'*12} {'─'*14}")
+    for label, key, fmt, lower in rows:
+        if key is None:
+            print(f"{label:<26} {control['aborted']:>5} / {control['timeouts']:<4} {cancel['aborted']:>5} / {cancel['timeouts']:<4}")
+            continue
+
+        def get(run):
+            if isinstance(key, tuple):
+                return run[key[0]].get(key[1])
+            return run[key]
+
+        a, b = get(control), get(cancel)
+        sa = fmt.format(a) if a is not None else "n/a"
+        sb = fmt.format(b) if b is not None else "n/a"
+        print(f"{label:<26} {sa:>12} {sb:>12} {delta(a, b, lower):>14}")
+
+    print(f"\n{'t (s)':>6} {'waiting ctl':>12} {'waiting cxl':>12} {'running ctl':>12} {'running cxl':>12}")
+    print(f"{'─'*6} {'─'*12} {'─'*12} {'─'*12} {'─'*12}")
+    for a, b in zip(control["timeline"], cancel["timeline"]):
+        cells = [f"{v:>12.0f}" if v is not None else f"{'-':>12}"
+                 for v in (a["waiting"], b["waiting"], a["running"], b["running"])]
+        print(f"{a['t']:>6.0f} " + " ".join(cells))
+    if "matched_requests" in control:
+        print(f"\n  Control survivor and goodput rows cover the {control['matched_requests']} plan indices "
+              f"that completed in the cancel run")
+
+
+async def run(args):
+    requests = plan(args)
+    runs, traces = {}, []
+    for name, cancel in [("control", False), ("cancel", True)]:
+        if name == "control" and args.skip_control:
+            continue
+        if runs:
+            print("⏳ Waiting for the server to go idle...")
+            await wait_for_idle(args.url)
+        print(f"▶️  {name}: {len(requests)} requests over {args.duration}s...", flush=True)
+        runs[name], trace = await run_once(args, requests, cancel)
+        traces.append(dict(trace, name=name))
+        r = runs[name]
+        print(f"   ✅ {r['completed']} completed, {r['aborted']} aborted, {r['timeouts']} timed out | "
+              f"survivors {r['survivor_tokens_per_second'] or 0:.1f} tok/s, "
+              f"TTFT p50 {r['survivor_ttft_ms'].get('p50', 0):.1f}ms")
+    if "control" in runs:
+        match_control(args, runs["control"], traces[0]["records"], traces[-1]["records"])
+    return runs, traces
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Client cancellation and timeout-storm benchmark")
+    parser.add_argument("--label", default="server", help="Name of the server under test (e.g. vllm, sglang)")
+    parser.add_argument("--url", default="http://localhost:8083", help="Server URL")
+    parser.add_argument("--model", default=MODEL, help="Served model name")
+    parser.add_argument("--rate", type=float, default=8.0, help="Arrival rate (req/s), ideally near capacity")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of arrivals per run")
+    parser.add_argument("--cancel-fraction", type=float, default=0.3, help="Fraction of streams closed mid-generation")
+    parser.add_argument("--max-tokens", type=int, default=512, help="Decode length (ignore_eos)")
+    parser.add_argument("--timeout", type=int, default=120, help="Client timeout per request (s); expired streams are dropped")
+    parser.add_argument("--window", type=float, default=5.0, help="Queue timeline window (s)")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="/metrics scrape interval (s)")
+    parser.add_argument("--skip-control", action="store_true", help="Only run with cancellations")
+    parser.add_argument("--seed", type=int, default=0, help="Arrival and abort point seed")
+    add_slo_args(parser)
+    add_trace_args(parser)
+    args = parser.parse_args()
+
+    print(f"\n{'='*80}")
+    print(f"✂️  Cancellation Storm ({args.label})")
+    print(f"{'='*80}")
+    print(f"Endpoint:    {chat_url(args.url)}")
+    print(f"Arrivals:    {args.rate} req/s for {args.duration}s, {args.max_tokens} tokens each")
+    print(f"Cancel:      {args.cancel_fraction * 100:.0f}% of streams at a random token, timeout {args.timeout}s")
+    print(f"{'='*80}\n")
+
+    runs, traces = asyncio.run(run(args))
+    cancel = runs["cancel"]
+    print(f"\n{'─'*80}")
+    if "control" in runs:
+        print_comparison(runs["control"], cancel)
+        reclaimed = cancel["tokens_not_generated"]
+        print(f"\n  Decode work the aborts should free: {reclaimed} tokens "
+              f"({reclaimed / cancel['duration_s']:.1f} tok/s over the run)")
+    else:
+        print(f"  Survivors: {cancel['survivor_tokens_per_second'] or 0:.1f} tok/s, "
+              f"waiting peak {cancel['waiting_peak']}")
+
+    save_results(f"cancellation_{args.label}", {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "cancellation",
+        "label": args.label,
+        "endpoint": chat_url(args.url),
+        "config": vars(args),
+        "runs": runs,
+    })
+    if args.trace:
+        save_trace(f"cancellation_{args.label}", traces, tokens=args.trace_tokens)
+    print(f"{'='*80}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Embedding throughput benchmark for the Qwen3-Embedding server (run_vllm_qwen3_embedding.sh, port 8007).
+
+Sweeps inputs per request x text length (up to the 8192 max-model-len) x concurrency and reports
+embeddings/s, tokens/s and latency percentiles. Request bodies are serialized before timing and
+responses are parsed/decoded after the timer stops; vectors are requested as base64 and decoded
+straight into NumPy arrays instead of JSON float lists.
+
+Usage: python bench_embeddings.py [--url http://localhost:8007] [--batch-sizes 1,8,32] [--text-tokens 64,512,2048,8000]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+
+import aiohttp
+import numpy as np
+
+from loadgen import new_session, now, percentiles
+
+RESULTS_DIR = Path(__file__).resolve().parent
+MODEL = "Qwen3-Embedding-0.6B"
+MAX_MODEL_LEN = 8192
+
+WORDS = (
+    "server model vector index search document query cache token batch memory latency "
+    "throughput cluster shard replica request response payload network kernel graph"
+).split()
+
+
+def embeddings_url(url):
+    url = url.rstrip("/")
+    if url.endswith("/embeddings"):
+        return url
+    return f"{url}/embeddings" if url.endswith("/v1") else f"{url}/v1/embeddings"
+
+
+def make_text(approx_tokens, seed):
+    """Deterministic text of roughly `approx_tokens` tokens (~4 chars per token), unique per seed."""
+    rng = random.Random(seed)
+    words = [f"doc{seed}"]
+    chars = len(words[0])
+    while chars < approx_tokens * 4:
+        w = rng.choice(WORDS)
+        words.append(w)
+        chars += len(w) + 1
+    return " ".join(words)
+
+
+def decode_embeddings(response_json):
+    """(n, dim) float32 array from an embeddings response (base64 or float lists)."""
+    data = sorted(response_json["data"], key=lambda d: d["index"])
+    if data and isinstance(data[0]["embedding"], str):
+        return np.stack([np.frombuffer(base64.b64decode(d["embedding"]), dtype=np.float32) for d in data])
+    return np.asarray([d["embedding"] for d in data], dtype=np.float32)
+
+
+async def post_embeddings(session, url, body):
+    """POST a pre-serialized body. Only the network round trip is timed; parsing happens after."""
+    start = now()
+    record = {"start_ts": start, "latency": None, "error": None, "inputs": 0, "tokens": 0, "decode_ms": 0.0}
+    try:
+        async with session.post(url, data=body, headers={"Content-Type": "application/json"}) as response:
+            raw = await response.read()
+            status = response.status
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        record["latency"] = now() - start
+        return record
+    record["latency"] = now() - start
+
+    if status != 200:
+        record["error"] = f"HTTP {status}: {raw[:200].decode('utf-8', 'replace')}"
+        return record
+
+    t0 = time.perf_counter()
+    try:
+        result = json.loads(raw)
+        vectors = decode_embeddings(result)
+    except (ValueError, KeyError) as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        return record
+    record["decode_ms"] = (time.perf_counter() - t0) * 1000
+    record["inputs"] = vectors.shape[0]
+    record["dim"] = vectors.shape[1] if vectors.ndim == 2 else 0
+    record["tokens"] = (result.get("usage") or {}).get("prompt_tokens", 0)
+    return record
+
+
+async def run_cell(url, model, batch_size, text_tokens, concurrency, num_requests, encoding, timeout):
+    # Build and serialize every body up front
+    bodies = []
+    for i in range(num_requests):
+        texts = [make_text(text_tokens, seed=i * batch_size + j) for j in range(batch_size)]
+        bodies.append(json.dumps({"model": model, "input": texts, "encoding_format": encoding}).encode("utf-8"))
+
+    records = []
+    pending = list(range(num_requests))
+
+    async def worker(session):
+        while pending:
+            records.append(await post_embeddings(session, url, bodies[pending.pop()]))
+
+    async with new_session(timeout) as session:
+        # One warmup request per cell
+        await post_embeddings(session, url, bodies[0])
+        start = now()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        duration = now() - start
+
+    ok = [r for r in records if not r["error"]]
+    errors = [r["error"] for r in records if r["error"]]
+    return {
+        "batch_size": batch_size,
+        "text_tokens": text_tokens,
+        "concurrency": concurrency,
+        "num_requests": num_requests,
+        "num_errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "duration_s": duration,
+        "embeddings_per_second": sum(r["inputs"] for r in ok) / duration,
+        "tokens_per_second": sum(r["tokens"] for r in ok) / duration,
+        "requests_per_second": len(ok) / duration,
+        "latency_ms": percentiles([r["latency"] * 1000 for r in ok]),
+        "decode_ms": percentiles([r["decode_ms"] for r in ok]),
+        "dim": ok[0]["dim"] if ok else None,
+    }
+
+
+async def run(args):
+    url = embeddings_url(args.url)
+    cells = []
+    for text_tokens in args.text_tokens:
+        for batch_size in args.batch_sizes:
+            if batch_size * text_tokens > args.max_tokens_per_request:
+                continue
+            for concurrency in args.concurrency:
+                num_requests = max(args.requests, concurrency * 2)
+                print(f"  len {text_tokens:>5} x batch {batch_size:>4} @ conc {concurrency:>3}...", end=" ", flush=True)
+                cell = await run_cell(url, args.model, batch_size, text_tokens, concurrency, num_requests,
+                                      args.encoding, args.timeout)
+                cells.append(cell)
+                if cell["num_errors"] == num_requests:
+                    print(f"❌ {cell['first_error']}")
+                    continue
+                print(f"✅ {cell['embeddings_per_second']:9.1f} emb/s | {cell['tokens_per_second']:10.0f} tok/s | "
+                      f"p50 {cell['latency_ms']['p50']:8.1f}ms p99 {cell['latency_ms']['p99']:8.1f}ms | "
+                      f"decode {cell['decode_ms']['p50']:.2f}ms")
+    return cells
+
+
+def parse_levels(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding throughput benchmark")
+    parser.add_argument("--url", default="http://localhost:8007", help="Embedding server URL")
+    parser.add_argument("--model", default=MODEL, help="Served model name")
+    parser.add_argument("--batch-sizes", type=parse_levels, default=[1, 8, 32], help="Inputs per request")
+    parser.add_argument("--text-tokens", type=parse_levels, default=[64, 512, 2048, 8000],
+                        help=f"Approximate tokens per input (max-model-len {MAX_MODEL_LEN})")
+    parser.add_argument("--concurrency", type=parse_levels, default=[1, 8, 32], help="Concurrent requests")
+    parser.add_argument("--requests", type=int, default=16, help="Requests per cell (at least 2x concurrency)")
+    parser.add_argument("--max-tokens-per-request", type=int, default=131072, help="Skip larger batch x length cells")
+    parser.add_argument("--encoding", choices=["base64", "float"], default="base64", help="encoding_format")
+    parser.add_argument("--timeout", type=int, default=300, help="Per-request timeout (s)")
+    args = parser.parse_args()
+
+    print(f"\n{'='*80}")
+    print("📐 Embedding Throughput Benchmark")
+    print(f"{'='*80}")
+    print(f"Endpoint:    {embeddings_url(args.url)}")
+    print(f"Model:       {args.model}")
+    print(f"Batch sizes: {args.batch_sizes}")
+    print(f"Text tokens: {args.text_tokens}")
+    print(f"Concurrency: {args.concurrency}")
+    print(f"Encoding:    {args.encoding}")
+    print(f"{'='*80}\n")
+
+    cells = asyncio.run(run(args))
+    ok = [c for c in cells if c["num_errors"] < c["num_requests"]]
+
+    if ok:
+        best = max(ok, key=lambda c: c["embeddings_per_second"])
+        best_tokens = max(ok, key=lambda c: c["tokens_per_second"])
+        print(f"\n{'─'*80}")
+        print("BEST CONFIGURATIONS:")
+        print(f"{'─'*80}")
+        print(f"  Embeddings/s: {best['embeddings_per_second']:.1f} "
+              f"(len {best['text_tokens']}, batch {best['batch_size']}, conc {best['concurrency']}, "
+              f"p99 {best['latency_ms']['p99']:.1f}ms)")
+        print(f"  Tokens/s:     {best_tokens['tokens_per_second']:.0f} "
+              f"(len {best_tokens['text_tokens']}, batch {best_tokens['batch_size']}, "
+              f"conc {best_tokens['concurrency']}, p99 {best_tokens['latency_ms']['p99']:.1f}ms)")
+
+    output_data = {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "embeddings",
+        "endpoint": embeddings_url(args.url),
+        "model": args.model,
+        "encoding_format": args.encoding,
+        "cells": cells,
+    }
+    output_file = RESULTS_DIR / f"eval_embeddings_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(output_data, f, indent=2)
+
+    print(f"\n💾 Results saved to: {output_file}")
+    print(f"{'='*80}\n")
+
+
+if __name__ == "__main__":
+    main()
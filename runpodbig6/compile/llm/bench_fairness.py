@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Multi-tenant priority and fairness benchmark.
+
+Several tenant classes share one server, each with its own prompt shape, Poisson arrival rate
+and TTFT SLO. Longest-prefix-match scheduling (SGLang --schedule-policy lpm) favours tenants whose
+prompts share a cached prefix and can starve the rest; FCFS (vLLM default) serves in arrival
+order. Per tenant this reports:
+
+    latency        TTFT / ITL / e2e percentiles and SLO attainment
+    slowdown       TTFT under the mixed load / TTFT of the same tenant running alone
+    HOL blocking   TTFT added over running alone, and how often a request was overtaken
+                   (a later arrival from another tenant got its first token first)
+
+plus Jain's fairness index over per-tenant 1/slowdown and over SLO attainment (1.0 = fair).
+
+Tenant classes default to TENANTS below; pass --tenants file.json (same keys) to override.
+Run once per server / policy with a --label, then compare:
+    python bench_fairness.py --label vllm-fcfs
+    python bench_fairness.py --label sglang-lpm
+    python bench_fairness.py --compare
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import random
+import uuid
+from datetime import datetime
+
+from loadgen import (RESULTS_DIR, add_slo_args, build_payload, chat_url, goodput, itl_ms, new_session, now,
+                     percentiles, stream_chat)
+
+MODEL = "Qwen3-235B-A22B-Instruct-FP8"
+
+# prefix_tokens: shared per-tenant prefix (cacheable), unique_tokens: per-request body led by a nonce
+TENANTS = [
+    {"name": "rag", "rate": 2.0, "slo_ttft_ms": 2000, "prefix_tokens": 4000, "unique_tokens": 50, "max_tokens": 256,
+     "question": "Answer the question using only the document above."},
+    {"name": "chat", "rate": 4.0, "slo_ttft_ms": 500, "prefix_tokens": 0, "unique_tokens": 100, "max_tokens": 256,
+     "question": "Reply to the user message above."},
+    {"name": "agent", "rate": 2.0, "slo_ttft_ms": 1000, "prefix_tokens": 1500, "unique_tokens": 300, "max_tokens": 128,
+     "question": "Decide which tool to call next and explain why."},
+    {"name": "batch", "rate": 0.5, "slo_ttft_ms": 10000, "prefix_tokens": 0, "unique_tokens": 3000, "max_tokens": 512,
+     "question": "Summarize the report above."},
+]
+
+FILLER = {
+    "rag": "Section 4.2 of the operations handbook describes failover between regions and the runbook for DNS. ",
+    "agent": "Tool list: search(query), fetch(url), run_sql(query), send_email(to, body). Always think first. ",
+    "default": "The quarterly report covers revenue, churn, infrastructure cost and hiring across all teams. ",
+}
+
+
+def pad(text, tokens):
+    """Repeat text to ~tokens tokens (~4 chars each)."""
+    return (text * (tokens * 4 // len(text) + 1))[:tokens * 4] if tokens > 0 else ""
+
+
+def make_messages(tenant, nonce):
+    filler = FILLER.get(tenant["name"], FILLER["default"])
+    prefix = pad(f"[{tenant['name']} context] " + filler, tenant["prefix_tokens"])
+    body = pad(f"[{nonce}] " + filler, tenant["unique_tokens"])
+    messages = [{"role": "system", "content": prefix}] if prefix else []
+    messages.append({"role": "user", "content": f"{body}\n\n{tenant['question']}"})
+    return messages
+
+
+def jain(values):
+    """Jain's fairness index: 1.0 when all equal, 1/n when one tenant gets everything."""
+    values = [v for v in values if v is not None]
+    if not values or not any(values):
+        return None
+    return sum(values) ** 2 / (len(values) * sum(v * v for v in values))
+
+
+async def isolation(args, url, tenants):
+    """Median TTFT of each tenant running alone (sequential requests)."""
+    alone = {}
+    async with new_session(args.timeout) as session:
+        for tenant in tenants:
+            ttfts = []
+            for _ in range(args.isolation_requests):
+                payload = build_payload(args.model, make_messages(tenant, uuid.uuid4().hex), tenant["max_tokens"])
+                record = await stream_chat(session, url, payload)
+                if not record["error"] and record["ttft"] is not None:
+                    ttfts.append(record["ttft"] * 1000)
+            alone[tenant["name"]] = percentiles(ttfts).get("p50")
+            print(f"  {tenant['name']:<10} alone: TTFT p50 {alone[tenant['name']] or 0:.1f}ms")
+    return alone
+
+
+async def mixed(args, url, tenants):
+    """All tenants at once: independent seeded Poisson streams merged into one schedule."""
+    rng = random.Random(args.seed)
+    schedule = []
+    for tenant in tenants:
+        t = 0.0
+        while True:
+            t += rng.expovariate(tenant["rate"])
+            if t >= args.duration:
+                break
+            schedule.append((t, tenant))
+    schedule.sort(key=lambda item: item[0])
+
+    tasks = []
+    async with new_session(args.timeout) as session:
+        start = now()
+        for t, tenant in schedule:
+            await asyncio.sleep(max(0.0, start + t - now()))
+            payload = build_payload(args.model, make_messages(tenant, uuid.uuid4().hex), tenant["max_tokens"])
+            tasks.append(asyncio.create_task(stream_chat(session, url, payload)))
+        records = await asyncio.gather(*tasks)
+        duration = now() - start
+    for (_, tenant), record in zip(schedule, records):
+        record["tenant"] = tenant["name"]
+    return records, duration
+
+
+def overtaken(records):
+    """Per request: how many later arrivals from other tenants got their first token first."""
+    ok = sorted((r for r in records if not r["error"] and r["ttft"] is not None), key=lambda r: r["start_ts"])
+    counts = {}
+    for i, r in enumerate(ok):
+        first = r["start_ts"] + r["ttft"]
+        counts[id(r)] = sum(1 for later in ok[i + 1:]
+                            if later["tenant"] != r["tenant"] and later["start_ts"] + later["ttft"] < first)
+    return counts
+
+
+def analyze(tenants, records, duration, alone, slo_tpot_ms):
+    passes = overtaken(records)
+    per_tenant = {}
+    for tenant in tenants:
+        group = [r for r in records if r["tenant"] == tenant["name"]]
+        ok = [r for r in group if not r["error"] and r["ttft"] is not None]
+        ttfts = [r["ttft"] * 1000 for r in ok]
+        ttft = percentiles(ttfts)
+        base = alone.get(tenant["name"])
+        over = [passes[id(r)] for r in ok]
+        good = goodput(group, duration, {"ttft_ms": tenant["slo_ttft_ms"], "tpot_ms": slo_tpot_ms})
+        per_tenant[tenant["name"]] = {
+            "requests": len(group),
+            "errors": len(group) - len(ok),
+            "offered_rate": tenant["rate"],
+            "slo_ttft_ms": tenant["slo_ttft_ms"],
+            "ttft_ms": ttft,
+            "itl_ms": percentiles([g for r in ok for g in itl_ms(r)]),
+            "e2e_s": percentiles([r["time"] for r in ok]),
+            "slo_attainment": good["attainment"],
+            "goodput": good,
+            "tokens_per_second": sum(r["tokens"] for r in ok) / duration if duration else None,
+            "alone_ttft_ms": base,
+            "slowdown": ttft["p50"] / base if ttft and base else None,
+            "hol_ms": percentiles([v - base for v in ttfts]) if base else {},
+            "overtaken_rate": sum(1 for v in over if v) / len(over) if over else None,
+            "overtaken_mean": sum(over) / len(over) if over else None,
+        }
+    slowdowns = [t["slowdown"] for t in per_tenant.values()]
+    return {
+        "duration_s": duration,
+        "tenants": per_tenant,
+        "jain_slowdown": jain([1 / s for s in slowdowns if s]) if all(slowdowns) else None,
+        "jain_slo": jain([t["slo_attainment"] for t in per_tenant.values()]),
+        "worst_slowdown": max((s for s in slowdowns if s), default=None),
+        "goodput_requests_per_second": sum(t["goodput"]["requests_per_second"] or 0 for t in per_tenant.values()),
+        "goodput_tokens_per_second": sum(t["goodput"]["tokens_per_second"] or 0 for t in per_tenant.values()),
+    }
+
+
+def print_report(result):
+    print(f"{'Tenant':<10} {'reqs':>5} {'TTFT p50':>9} {'TTFT p99':>9} {'alone':>8} {'slowdown':>9} "
+          f"{'HOL p99':>9} {'overtaken':>10} {'SLO':>7} {'met':>6}")
+    print(f"{'─'*10} {'─'*5} {'─'*9} {'─'*9} {'─'*8} {'─'*9} {'─'*9} {'─'*10} {'─'*7} {'─'*6}")
+    for name, t in result["tenants"].items():
+        slowdown = f"{t['slowdown']:>8.2f}x" if t["slowdown"] else f"{'n/a':>9}"
+        overtaken_pct = f"{t['overtaken_rate'] * 100:>9.0f}%" if t["overtaken_rate"] is not None else f"{'n/a':>10}"
+        met = f"{t['slo_attainment'] * 100:>5.0f}%" if t["slo_attainment"] is not None else f"{'n/a':>6}"
+        print(f"{name:<10} {t['requests']:>5} {t['ttft_ms'].get('p50', 0):>9.1f} {t['ttft_ms'].get('p99', 0):>9.1f} "
+              f"{t['alone_ttft_ms'] or 0:>8.1f} {slowdown} {t['hol_ms'].get('p99', 0):>9.1f} {overtaken_pct} "
+              f"{t['slo_ttft_ms']:>7.0f} {met}")
+    print(f"\n{'─'*80}")
+    if result["jain_slowdown"] is not None:
+        print(f"  Jain index (1/slowdown):   {result['jain_slowdown']:.3f}  (worst slowdown {result['worst_slowdown']:.2f}x)")
+    if result["jain_slo"] is not None:
+        print(f"  Jain index (SLO met):      {result['jain_slo']:.3f}")
+    print(f"  Goodput (per-tenant SLO):  {result['goodput_requests_per_second']:.2f} req/s, "
+          f"{result['goodput_tokens_per_second']:.1f} tok/s")
+
+
+def load_latest_per_label():
+    latest = {}
+    for path in sorted(glob.glob(str(RESULTS_DIR / "eval_fairness_*.json"))):
+        with open(path, "r") as f:
+            data = json.load(f)
+        latest[data["label"]] = data
+    return latest
+
+
+def compare():
+    runs = load_latest_per_label()
+    if not runs:
+        print("❌ No eval_fairness_*.json files found (run with --label first)")
+        return 1
+
+    print(f"\n{'='*80}")
+    print("MULTI-TENANT FAIRNESS")
+    print(f"{'='*80}")
+    names = sorted({name for data in runs.values() for name in data["result"]["tenants"]})
+    print(f"{'Label':<18} {'Jain slow':>10} {'Jain SLO':>9} " + " ".join(f"{n[:12] + ' p99':>17}" for n in names))
+    print(f"{'─'*18} {'─'*10} {'─'*9} " + " ".join(f"{'─'*17}" for _ in names))
+    for label, data in sorted(runs.items()):
+        r = data["result"]
+        cells = []
+        for n in names:
+            t = r["tenants"].get(n)
+            cells.append(f"{t['ttft_ms'].get('p99', 0):>10.0f}ms {t['slo_attainment'] * 100:>3.0f}%"
+                         if t and t["slo_attainment"] is not None else f"{'n/a':>17}")
+        jain_slow = f"{r['jain_slowdown']:>10.3f}" if r["jain_slowdown"] is not None else f"{'n/a':>10}"
+        jain_slo = f"{r['jain_slo']:>9.3f}" if r["jain_slo"] is not None else f"{'n/a':>9}"
+        print(f"{label:<18} {jain_slow} {jain_slo} " + " ".join(cells))
+    print(f"{'='*80}\n")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-tenant priority and fairness benchmark")
+    parser.add_argument("--label", help="Server / scheduling policy under test, e.g. sglang-lpm")
+    parser.add_argument("--compare", action="store_true", help="Compare the latest result file of every label")
+    parser.add_argument("--url", default="http://localhost:8083", help="Server URL")
+    parser.add_argument("--model", default=MODEL, help="Served model name")
+    parser.add_argument("--tenants", help="JSON file with a list of tenant classes (keys as in TENANTS)")
+    parser.add_argument("--rate-scale", type=float, default=1.0, help="Multiply every tenant's rate")
+    parser.add_argument("--duration", type=float, default=120.0, help="Seconds of mixed arrivals")
+    parser.add_argument("--isolation-requests", type=int, default=5,
+                        help="Sequential requests per tenant to measure TTFT alone (0: skip slowdown/HOL)")
+    parser.add_argument("--seed", type=int, default=0, help="Arrival process seed")
+    parser.add_argument("--timeout", type=int, default=600, help="Per-request timeout (s)")
+    add_slo_args(parser)
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare()
+    if not args.label:
+        parser.error("--label is required unless --compare is given")
+
+    tenants = TENANTS
+    if args.tenants:
+        with open(args.tenants, "r") as f:
+            tenants = json.load(f)
+    tenants = [{**t, "rate": t["rate"] * args.rate_scale} for t in tenants]
+    url = chat_url(args.url)
+
+    print(f"\n{'='*80}")
+    print(f"⚖️  Multi-tenant Fairness ({args.label})")
+    print(f"{'='*80}")
+    print(f"Endpoint:    {url}")
+    for t in tenants:
+        print(f"  {t['name']:<10} {t['rate']:>5.2f} req/s | prefix {t['prefix_tokens']:>5} + unique "
+              f"{t['unique_tokens']:>5} tok | SLO TTFT {t['slo_ttft_ms']}ms")
+    print(f"{'='*80}\n")
+
+    alone = {}
+    if args.isolation_requests:
+        print("🔬 Each tenant alone...")
+        alone = asyncio.run(isolation(args, url, tenants))
+    print(f"\n▶️  Mixed load for {args.duration}s...\n")
+    records, duration = asyncio.run(mixed(args, url, tenants))
+    result = analyze(tenants, records, duration, alone, args.slo_tpot_ms)
+    print_report(result)
+
+    output_data = {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "fairness",
+        "label": args.label,
+        "endpoint": url,
+        "config": vars(args),
+        "tenant_classes": tenants,
+        "result": result,
+    }
+    output_file = RESULTS_DIR / f"eval_fairness_{args.label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(output_data, f, indent=2)
+    print(f"\n💾 Results saved to: {output_file}")
+    print(f"{'='*80}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
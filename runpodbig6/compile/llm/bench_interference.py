@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Prefill/decode interference workload: long prompts injected into a steady population of chat streams.
+
+With chunked prefill every scheduler step mixes decode tokens with one chunk of a pending
+prompt (vLLM --max-num-batched-tokens, SGLang --chunked-prefill-size), so a 100k-token prompt
+slows every running stream until its prefill is done. This keeps --streams short chat
+streams running back to back and injects a long, cache-busting prompt every --inject-interval
+seconds. Each injection's prefill window runs from its send time to its first token; every
+inter-token gap of the short streams that overlaps a window counts as "during", the rest as
+baseline. Reports ITL percentiles for both, per-injection worst stalls and short-request TTFT.
+
+Run once per server setting with a --label, then compare the saved files:
+    python bench_interference.py --label vllm-chunk32k        # run_vllm_qwen3_235b.sh (32768)
+    python bench_interference.py --label vllm-chunk8k         # same with --max-num-batched-tokens 8192
+    python bench_interference.py --label sglang-chunk32k      # run_sglang_qwen3_235b.sh
+    python bench_interference.py --compare
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import random
+import uuid
+from datetime import datetime
+
+from loadgen import (RESULTS_DIR, add_slo_args, build_payload, chat_url, goodput, new_session, now, percentiles,
+                     slo_from_args, stream_chat)
+
+MODEL = "Qwen3-235B-A22B-Instruct-FP8"
+
+FILLER = (
+    "The scheduler admits requests while KV cache blocks are free, runs prefill for new prompts and "
+    "decode for running sequences, and preempts the newest sequences when memory runs out. "
+)
+SHORT_QUESTIONS = [
+    "Explain how a hash map handles collisions.", "What is the difference between TCP and UDP?",
+    "Describe how garbage collection works in Python.", "How does HTTPS protect data in transit?",
+    "What is a race condition and how do you prevent one?", "Explain eventual consistency with an example.",
+]
+
+
+def long_prompt(tokens, nonce):
+    """~tokens tokens of filler led by a nonce so prefix caching cannot skip the prefill."""
+    head = f"[{nonce}] "
+    body = (FILLER * (tokens * 4 // len(FILLER) + 1))[:max(0, tokens * 4 - len(head))]
+    return head + body + "\n\nSummarize the text above in three sentences."
+
+
+async def short_stream(worker, args, url, stop_at, records):
+    """One closed-loop chat stream until stop_at (wall clock)."""
+    i = 0
+    async with new_session(args.timeout) as session:
+        while now() < stop_at:
+            question = SHORT_QUESTIONS[(worker + i) % len(SHORT_QUESTIONS)]
+            payload = build_payload(args.model, [{"role": "user", "content": question}], args.short_max_tokens,
+                                    ignore_eos=True)
+            record = await stream_chat(session, url, payload)
+            record.update({"worker": worker, "seq": i})
+            records.append(record)
+            i += 1
+
+
+async def injector(args, url, start, stop_at, injections):
+    """Send one long prompt per interval (fixed or Poisson) after the baseline period."""
+    rng = random.Random(args.seed)
+    tasks = []
+    async with new_session(args.timeout) as session:
+        t = start + args.baseline
+        while t < stop_at:
+            await asyncio.sleep(max(0.0, t - now()))
+            payload = build_payload(args.model, [{"role": "user", "content": long_prompt(args.long_tokens, uuid.uuid4().hex)}],
+                                    args.long_max_tokens, temperature=0.0)
+            tasks.append(asyncio.create_task(stream_chat(session, url, payload)))
+            t += rng.expovariate(1 / args.inject_interval) if args.poisson else args.inject_interval
+        injections.extend(await asyncio.gather(*tasks))
+
+
+def prefill_windows(injections):
+    """(start, end) wall-clock prefill window of each injection: send time to first token."""
+    windows = []
+    for r in injections:
+        first = r["ttft"] if r["ttft"] is not None else r["first_chunk"] if r["first_chunk"] is not None else r["time"]
+        windows.append((r["start_ts"], r["start_ts"] + first))
+    return windows
+
+
+def classify_gaps(records, windows, after):
+    """Split every inter-token gap (ms) into baseline and per-window lists."""
+    baseline, during = [], [[] for _ in windows]
+    for r in records:
+        if r["error"]:
+            continue
+        ts = [r["start_ts"] + t for t in r["chunk_ts"]]
+        for a, b in zip(ts, ts[1:]):
+            if a < after:
+                continue
+            hit = [i for i, (w0, w1) in enumerate(windows) if b > w0 and a < w1]
+            for i in hit:
+                during[i].append((b - a) * 1000)
+            if not hit:
+                baseline.append((b - a) * 1000)
+    return baseline, during
+
+
+def analyze(records, injections, start, args):
+    windows = prefill_windows(injections)
+    baseline, during = classify_gaps(records, windows, after=start + args.warmup)
+    all_during = [g for gaps in during for g in gaps]
+    base = percentiles(baseline)
+
+    def ttfts(inside):
+        return [r["ttft"] * 1000 for r in records if not r["error"] and r["ttft"] is not None
+                and r["start_ts"] >= start + args.warmup
+                and any(w0 <= r["start_ts"] < w1 for w0, w1 in windows) == inside]
+
+    per_injection = []
+    for r, (w0, w1), gaps in zip(injections, windows, during):
+        per_injection.append({
+            "offset_s": w0 - start,
+            "prefill_s": w1 - w0,
+            "prompt_tokens": r.get("prompt_tokens"),
+            "error": r["error"],
+            "itl_ms": percentiles(gaps),
+            "max_stall_ms": max(gaps) if gaps else None,
+            "gaps": len(gaps),
+        })
+    during_pct = percentiles(all_during)
+    return {
+        "baseline_itl_ms": base,
+        "during_itl_ms": during_pct,
+        "itl_slowdown": {k: during_pct[k] / base[k] for k in ("p50", "p90", "p99")
+                         if k in during_pct and base.get(k)},
+        "short_ttft_ms": {"baseline": percentiles(ttfts(False)), "during": percentiles(ttfts(True))},
+        "long_ttft_s": percentiles([i["prefill_s"] for i in per_injection if not i["error"]]),
+        "injections": per_injection,
+        "short_goodput": goodput(records, args.duration, slo_from_args(args)),
+        "short_requests": len(records),
+        "short_errors": sum(1 for r in records if r["error"]),
+    }
+
+
+async def run(args):
+    url = chat_url(args.url)
+    records, injections = [], []
+    start = now()
+    stop_at = start + args.duration
+    await asyncio.gather(injector(args, url, start, stop_at, injections),
+                         *(short_stream(w, args, url, stop_at, records) for w in range(args.streams)))
+    return analyze(records, injections, start, args)
+
+
+def print_report(result):
+    print(f"{'#':>3} {'at (s)':>7} {'prefill (s)':>12} {'ITL p50':>9} {'ITL p99':>9} {'max stall':>10} {'gaps':>6}")
+    print(f"{'─'*3} {'─'*7} {'─'*12} {'─'*9} {'─'*9} {'─'*10} {'─'*6}")
+    for n, inj in enumerate(result["injections"]):
+        if inj["error"]:
+            print(f"{n:>3} {inj['offset_s']:>7.1f} ❌ {inj['error']}")
+            continue
+        print(f"{n:>3} {inj['offset_s']:>7.1f} {inj['prefill_s']:>12.2f} {inj['itl_ms'].get('p50', 0):>9.1f} "
+              f"{inj['itl_ms'].get('p99', 0):>9.1f} {inj['max_stall_ms'] or 0:>10.1f} {inj['gaps']:>6}")
+
+    base, during = result["baseline_itl_ms"], result["during_itl_ms"]
+    print(f"\n{'─'*80}")
+    print(f"{'Short-stream ITL (ms)':<28} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+    for label, p in [("baseline", base), ("during long prefill", during)]:
+        print(f"  {label:<26} {p.get('p50', 0):>9.2f} {p.get('p90', 0):>9.2f} {p.get('p99', 0):>9.2f} "
+              f"{p.get('max', 0):>9.2f}")
+    slowdown = result["itl_slowdown"]
+    if slowdown:
+        print(f"  {'slowdown':<26} " + " ".join(f"{slowdown.get(k, 0):>8.2f}x" for k in ("p50", "p90", "p99")))
+    ttft = result["short_ttft_ms"]
+    print(f"  Short TTFT p50:            {ttft['baseline'].get('p50', 0):.1f}ms baseline, "
+          f"{ttft['during'].get('p50', 0):.1f}ms during long prefill")
+    print(f"  Long prompt TTFT p50:      {result['long_ttft_s'].get('p50', 0):.2f}s")
+    good = result["short_goodput"]
+    print(f"  Short-stream goodput:      {good['requests_per_second'] or 0:.2f} req/s, {good['tokens_per_second'] or 0:.1f} tok/s "
+          f"({(good['attainment'] or 0) * 100:.1f}% met SLO)")
+    print(f"  Short requests:            {result['short_requests']} ({result['short_errors']} failed)")
+
+
+def load_latest_per_label():
+    latest = {}
+    for path in sorted(glob.glob(str(RESULTS_DIR / "eval_interference_*.json"))):
+        with open(path, "r") as f:
+            data = json.load(f)
+        latest[data["label"]] = data
+    return latest
+
+
+def compare():
+    runs = load_latest_per_label()
+    if not runs:
+        print("❌ No eval_interference_*.json files found (run with --label first)")
+        return 1
+
+    print(f"\n{'='*80}")
+    print("PREFILL/DECODE INTERFERENCE: short-stream ITL during long-prompt prefill")
+    print(f"{'='*80}")
+    print(f"{'Label':<22} {'base p50':>9} {'base p99':>9} {'during p50':>11} {'during p99':>11} {'p99 x':>7} "
+          f"{'long TTFT':>10} {'good tok/s':>11}")
+    print(f"{'─'*22} {'─'*9} {'─'*9} {'─'*11} {'─'*11} {'─'*7} {'─'*10} {'─'*11}")
+    for label, data in sorted(runs.items(), key=lambda kv: kv[1]["result"]["during_itl_ms"].get("p99", float("inf"))):
+        r = data["result"]
+        base, during = r["baseline_itl_ms"], r["during_itl_ms"]
+        print(f"{label:<22} {base.get('p50', 0):>9.1f} {base.get('p99', 0):>9.1f} {during.get('p50', 0):>11.1f} "
+              f"{during.get('p99', 0):>11.1f} {r['itl_slowdown'].get('p99', 0):>6.2f}x "
+              f"{r['long_ttft_s'].get('p50', 0):>9.2f}s "
+              f"{(r.get('short_goodput') or {}).get('tokens_per_second') or 0:>11.1f}")
+    print(f"{'='*80}\n")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefill/decode interference workload")
+    parser.add_argument("--label", help="Name of the server setting under test, e.g. vllm-chunk32k")
+    parser.add_argument("--compare", action="store_true", help="Compare the latest result file of every label")
+    parser.add_argument("--url", default="http://localhost:8083", help="Server URL")
+    parser.add_argument("--model", default=MODEL, help="Served model name")
+    parser.add_argument("--streams", type=int, default=16, help="Concurrent short chat streams")
+    parser.add_argument("--short-max-tokens", type=int, default=256, help="Decode length of short streams (ignore_eos)")
+    parser.add_argument("--long-tokens", type=int, default=100000, help="Prompt length of injected requests")
+    parser.add_argument("--long-max-tokens", type=int, default=16, help="Decode length of injected requests")
+    parser.add_argument("--inject-interval", type=float, default=20.0, help="Seconds between injections")
+    parser.add_argument("--poisson", action="store_true", help="Exponential instead of fixed injection intervals")
+    parser.add_argument("--duration", type=float, default=120.0, help="Test length (s)")
+    parser.add_argument("--baseline", type=float, default=15.0, help="Seconds before the first injection")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Ignore gaps in the first N seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for Poisson injection times")
+    parser.add_argument("--timeout", type=int, default=600, help="Per-request timeout (s)")
+    add_slo_args(parser)
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare()
+    if not args.label:
+        parser.error("--label is required unless --compare is given")
+
+    print(f"\n{'='*80}")
+    print(f"🧱 Prefill/Decode Interference ({args.label})")
+    print(f"{'='*80}")
+    print(f"Endpoint:    {chat_url(args.url)}")
+    print(f"Short:       {args.streams} streams x {args.short_max_tokens} tokens, back to back")
+    print(f"Long:        {args.long_tokens} prompt tokens every "
+          f"{'~' if args.poisson else ''}{args.inject_interval}s after {args.baseline}s")
+    print(f"Duration:    {args.duration}s")
+    print(f"{'='*80}\n")
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    output_data = {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "interference",
+        "label": args.label,
+        "endpoint": chat_url(args.url),
+        "config": vars(args),
+        "result": result,
+    }
+    output_file = RESULTS_DIR / f"eval_interference_{args.label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(output_data, f, indent=2)
+    print(f"\n💾 Results saved to: {output_file}")
+    print(f"{'='*80}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Multi-turn conversation workload: many concurrent sessions whose history grows every turn.
+
+Each session starts from a shared system prompt, and every turn resends the whole
+conversation so far (previous assistant replies included) plus a new user message, then waits
+an exponentially distributed think time before the next turn. With prefix caching
+(vLLM --enable-prefix-caching, SGLang radix cache) turn N should only pay prefill for the new
+user message, so TTFT should stay flat as history grows. Reports TTFT by turn index and by
+history length, server-reported cached tokens, and the prefix cache hit rate from /metrics.
+
+--bust-cache puts a per-turn nonce in front of the system prompt as a no-cache control run.
+
+Usage: python bench_multiturn.py [--url http://localhost:8083] [--sessions 32] [--turns 8] [--think-time 2.0]
+"""
+
+import argparse
+import asyncio
+import random
+import uuid
+
+import aiohttp
+
+from loadgen import (add_slo_args, build_payload, chat_url, goodput, itl_ms, new_session, now, percentiles,
+                     save_results, slo_from_args, stream_chat)
+from server_metrics import scrape
+
+MODEL = "Qwen3-235B-A22B-Instruct-FP8"
+
+TOPICS = ["a database migration", "a flaky integration test", "GPU memory fragmentation", "a slow web page",
+          "a Kubernetes rollout", "an on-call incident", "a cache stampede", "a memory leak in a service"]
+FILLER = ("We run the service on several nodes behind a load balancer, deploy twice a day and keep the "
+          "dashboards for latency, error rate and saturation open during every rollout. ")
+FOLLOW_UPS = ["Can you go deeper on the second point?", "What would you try first, and why?",
+              "How would we verify that fix in production?", "What are the risks of that approach?",
+              "Summarize the plan so far as a checklist.", "What metrics should we alert on?",
+              "How does this change if traffic doubles?", "What would a rollback look like?"]
+
+
+def system_prompt(tokens):
+    text = "You are a senior site reliability engineer helping a teammate debug production systems. "
+    return (text + FILLER * (tokens * 4 // len(FILLER) + 1))[:tokens * 4]
+
+
+def user_message(session, turn, tokens, rng):
+    if turn == 0:
+        text = f"I'm dealing with {TOPICS[session % len(TOPICS)]}. "
+    else:
+        text = rng.choice(FOLLOW_UPS) + " "
+    # Pad with session-specific context so each message is ~`tokens` long and unique
+    detail = f"(session {session}, turn {turn}) " + FILLER
+    return (text + detail * (tokens * 4 // len(detail) + 1))[:max(len(text), tokens * 4)]
+
+
+async def run_session(session_id, args, url, system, records, start_gate):
+    rng = random.Random(args.seed * 100003 + session_id)
+    messages = [{"role": "system", "content": system}]
+    async with new_session(args.timeout) as session:
+        await asyncio.sleep(rng.uniform(0, args.ramp))
+        await start_gate.wait()
+        for turn in range(args.turns):
+            messages.append({"role": "user", "content": user_message(session_id, turn, args.user_tokens, rng)})
+            sent = messages
+            if args.bust_cache:
+                sent = [{"role": "system", "content": f"[{uuid.uuid4().hex}] {system}"}] + messages[1:]
+            record = await stream_chat(session, url, build_payload(args.model, sent, args.max_tokens,
+                                                                   temperature=0.7))
+            record.update({"session": session_id, "turn": turn, "history_messages": len(messages),
+                           "history_chars": sum(len(m["content"]) for m in messages)})
+            records.append(record)
+            if record["error"]:
+                return
+            messages.append({"role": "assistant", "content": record["text"]})
+            if turn < args.turns - 1 and args.think_time > 0:
+                await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+async def prefix_cache_counters(url):
+    """(hits, queries) from vLLM /metrics, or None when unavailable (e.g. SGLang without metrics)."""
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+            sample = await scrape(session, url)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+    if not sample:
+        return None
+    raw = sample["raw"]
+    for hits, queries in [("vllm:prefix_cache_hits_total", "vllm:prefix_cache_queries_total"),
+                          ("vllm:gpu_prefix_cache_hits_total", "vllm:gpu_prefix_cache_queries_total")]:
+        if hits in raw and queries in raw:
+            return raw[hits], raw[queries]
+    return None
+
+
+def by_turn(records):
+    rows = []
+    for turn in sorted({r["turn"] for r in records}):
+        group = [r for r in records if r["turn"] == turn and not r["error"] and r["ttft"] is not None]
+        if not group:
+            continue
+        prompt = [r["prompt_tokens"] for r in group if r.get("prompt_tokens")]
+        cached = [r["cached_tokens"] / r["prompt_tokens"] for r in group
+                  if r.get("cached_tokens") is not None and r.get("prompt_tokens")]
+        rows.append({
+            "turn": turn,
+            "requests": len(group),
+            "avg_prompt_tokens": sum(prompt) / len(prompt) if prompt else None,
+            "ttft_ms": percentiles([r["ttft"] * 1000 for r in group]),
+            "itl_ms": percentiles([g for r in group for g in itl_ms(r)]),
+            "cached_fraction": sum(cached) / len(cached) if cached else None,
+        })
+    return rows
+
+
+def by_history(records, bucket_tokens):
+    buckets = {}
+    for r in records:
+        if r["error"] or r["ttft"] is None or not r.get("prompt_tokens"):
+            continue
+        buckets.setdefault(r["prompt_tokens"] // bucket_tokens, []).append(r["ttft"] * 1000)
+    return [{"history_tokens_from": b * bucket_tokens, "history_tokens_to": (b + 1) * bucket_tokens,
+             "requests": len(v), "ttft_ms": percentiles(v)} for b, v in sorted(buckets.items())]
+
+
+def ttft_slope(records):
+    """Least-squares TTFT ms per 1k prompt tokens (how much history still costs)."""
+    points = [(r["prompt_tokens"] / 1000, r["ttft"] * 1000) for r in records
+              if not r["error"] and r["ttft"] is not None and r.get("prompt_tokens")]
+    if len(points) < 2:
+        return None
+    mx = sum(p[0] for p in points) / len(points)
+    my = sum(p[1] for p in points) / len(points)
+    var = sum((p[0] - mx) ** 2 for p in points)
+    if var == 0:
+        return None
+    slope = sum((p[0] - mx) * (p[1] - my) for p in points) / var
+    return {"ms_per_1k_tokens": slope, "intercept_ms": my - slope * mx}
+
+
+async def run(args):
+    url = chat_url(args.url)
+    system = system_prompt(args.system_tokens)
+    records = []
+    before = await prefix_cache_counters(args.url)
+    gate = asyncio.Event()
+    tasks = [asyncio.create_task(run_session(i, args, url, system, records, gate)) for i in range(args.sessions)]
+    start = now()
+    gate.set()
+    await asyncio.gather(*tasks)
+    duration = now() - start
+    after = await prefix_cache_counters(args.url)
+
+    hit_rate = None
+    if before and after and after[1] > before[1]:
+        hit_rate = (after[0] - before[0]) / (after[1] - before[1])
+    return records, duration, hit_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-turn conversation workload")
+    parser.add_argument("--url", default="http://localhost:8083", help="Server URL")
+    parser.add_argument("--model", default=MODEL, help="Served model name")
+    parser.add_argument("--sessions", type=int, default=32, help="Concurrent conversations")
+    parser.add_argument("--turns", type=int, default=8, help="Turns per conversation")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Mean think time between turns (s, exponential)")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Spread session starts over this many seconds")
+    parser.add_argument("--system-tokens", type=int, default=1000, help="Shared system prompt length")
+    parser.add_argument("--user-tokens", type=int, default=60, help="Tokens per user message")
+    parser.add_argument("--max-tokens", type=int, default=200, help="Assistant reply length")
+    parser.add_argument("--bucket-tokens", type=int, default=1024, help="History bucket width for the TTFT table")
+    parser.add_argument("--bust-cache", action="store_true", help="Control run: unique nonce before the system prompt")
+    parser.add_argument("--seed", type=int, default=0, help="Think-time / follow-up seed")
+    parser.add_argument("--timeout", type=int, default=300, help="Per-request timeout (s)")
+    add_slo_args(parser)
+    args = parser.parse_args()
+
+    print(f"\n{'='*80}")
+    print(f"💬 Multi-turn Conversation Workload{' (cache-busting control)' if args.bust_cache else ''}")
+    print(f"{'='*80}")
+    print(f"Endpoint:    {chat_url(args.url)}")
+    print(f"Sessions:    {args.sessions} x {args.turns} turns, think time ~{args.think_time}s")
+    print(f"Messages:    system ~{args.system_tokens} tok, user ~{args.user_tokens} tok, reply <= {args.max_tokens} tok")
+    print(f"{'='*80}\n")
+
+    records, duration, hit_rate = asyncio.run(run(args))
+    errors = [r["error"] for r in records if r["error"]]
+    turns = by_turn(records)
+    history = by_history(records, args.bucket_tokens)
+    slope = ttft_slope(records)
+    good = goodput(records, duration, slo_from_args(args))
+
+    print(f"{'Turn':>5} {'Reqs':>5} {'Prompt tok':>11} {'TTFT p50':>10} {'TTFT p90':>10} {'TTFT p99':>10} "
+          f"{'ITL p50':>8} {'Cached':>7}")
+    print(f"{'─'*5} {'─'*5} {'─'*11} {'─'*10} {'─'*10} {'─'*10} {'─'*8} {'─'*7}")
+    for row in turns:
+        cached = f"{row['cached_fraction'] * 100:6.0f}%" if row["cached_fraction"] is not None else f"{'n/a':>7}"
+        print(f"{row['turn']:>5} {row['requests']:>5} {row['avg_prompt_tokens'] or 0:>11.0f} "
+              f"{row['ttft_ms']['p50']:>10.1f} {row['ttft_ms']['p90']:>10.1f} {row['ttft_ms']['p99']:>10.1f} "
+              f"{row['itl_ms'].get('p50', 0):>8.2f} {cached}")
+
+    print(f"\n{'History tokens':>16} {'Reqs':>5} {'TTFT p50':>10} {'TTFT p99':>10}")
+    print(f"{'─'*16} {'─'*5} {'─'*10} {'─'*10}")
+    for row in history:
+        label = f"{row['history_tokens_from']}-{row['history_tokens_to']}"
+        print(f"{label:>16} {row['requests']:>5} {row['ttft_ms']['p50']:>10.1f} {row['ttft_ms']['p99']:>10.1f}")
+
+    print(f"\n{'─'*80}")
+    print(f"  Requests:          {len(records)} ({len(errors)} failed) in {duration:.1f}s")
+    print(f"  Goodput:           {good['requests_per_second'] or 0:.2f} req/s, {good['tokens_per_second'] or 0:.1f} tok/s "
+          f"({(good['attainment'] or 0) * 100:.1f}% met TTFT <= {good['slo']['ttft_ms']:.0f}ms, "
+          f"TPOT <= {good['slo']['tpot_ms']:.0f}ms)")
+    if slope:
+        print(f"  TTFT vs history:   {slope['ms_per_1k_tokens']:+.2f}ms per 1k prompt tokens "
+              f"(intercept {slope['intercept_ms']:.1f}ms)")
+    if hit_rate is not None:
+        print(f"  Prefix cache hits: {hit_rate * 100:.1f}% of queried blocks (from /metrics)")
+    if errors:
+        print(f"  ⚠️  First error: {errors[0]}")
+
+    save_results("multiturn", {
+        "test_type": "multiturn",
+        "endpoint": chat_url(args.url),
+        "config": vars(args),
+        "duration_s": duration,
+        "num_errors": len(errors),
+        "prefix_cache_hit_rate": hit_rate,
+        "goodput": good,
+        "ttft_slope": slope,
+        "by_turn": turns,
+        "by_history": history,
+        "records": [{k: v for k, v in r.items() if k not in ("text", "reasoning_text")} for r in records],
+    })
+    print(f"{'='*80}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Burst, step and ramp load scenarios with queue and latency recovery measurement.
+
+Sends open-loop (Poisson) arrivals whose rate follows a scenario:
+    step    base rate, then --peak-rate for --event seconds, then back to base
+    spike   same shape with a short event (default 5s): traffic at the top of the hour
+    ramp    base rate rising linearly to --peak-rate over --event seconds, then back to base
+
+and measures, against the baseline period before the event:
+    peak TTFT      worst TTFT of requests sent during the event (and p99); the worst TTFT of
+                   requests sent after it is reported separately (post-event peak)
+    drain time     seconds after the event until the server's waiting queue is back to its
+                   baseline level (vllm:num_requests_waiting / sglang:num_queue_reqs from /metrics,
+                   or the "Waiting: N reqs" lines of a vLLM log given with --log)
+    recovery time  seconds after the event until TTFT p50 per --window stays below
+                   --tolerance x the baseline p90
+
+Usage: python bench_scenarios.py --scenario spike [--base-rate 2] [--peak-rate 20] [--url http://localhost:8083]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from loadgen import (RESULTS_DIR, add_slo_args, build_payload, chat_url, goodput, new_session, now, percentiles,
+                     save_results, slo_from_args, stream_chat)
+from server_metrics import MetricsPoller
+from trace_export import add_trace_args, save_trace
+
+sys.path.insert(0, str(RESULTS_DIR / "vllm"))
+from analyze_vllm_logs import parse_log_line
+
+MODEL = "Qwen3-235B-A22B-Instruct-FP8"
+DEFAULT_EVENT = {"step": 60.0, "spike": 5.0, "ramp": 60.0}
+QUESTIONS = [
+    "Explain how a hash map handles collisions.", "What is the difference between TCP and UDP?",
+    "Describe how garbage collection works in Python.", "How does HTTPS protect data in transit?",
+    "What is a race condition and how do you prevent one?", "Explain eventual consistency with an example.",
+]
+
+
+def offered_rate(args, t):
+    """Arrival rate (req/s) at t seconds into the run."""
+    e0, e1 = args.baseline, args.baseline + args.event
+    if t < e0 or t >= e1:
+        return args.base_rate
+    if args.scenario == "ramp":
+        return args.base_rate + (args.peak_rate - args.base_rate) * (t - e0) / args.event
+    return args.peak_rate
+
+
+def arrival_times(args):
+    """Non-homogeneous Poisson arrivals by thinning, seeded (seconds from start)."""
+    rng = random.Random(args.seed)
+    total = args.baseline + args.event + args.recovery
+    max_rate = max(args.base_rate, args.peak_rate)
+    times, t = [], 0.0
+    while True:
+        t += rng.expovariate(max_rate)
+        if t >= total:
+            return times
+        if rng.random() < offered_rate(args, t) / max_rate:
+            times.append(t)
+
+
+def log_waiting_series(path, start, end):
+    """[(t, waiting)] from vLLM log stat lines within the run (needs vllm_logging_config.json dates)."""
+    series = []
+    with open(path, "r", errors="replace") as f:
+        for line in f:
+            data = parse_log_line(line.strip())
+            if not data or "waiting_reqs" not in data or "timestamp" not in data:
+                continue
+            t = datetime.strptime(data["timestamp"], "%Y-%m-%d %H:%M:%S").timestamp()
+            if start - 1 <= t <= end + 1:
+                series.append((t, data["waiting_reqs"]))
+    return series
+
+
+async def run(args):
+    url = chat_url(args.url)
+    poller = MetricsPoller(args.url, interval=args.poll_interval).start()
+    tasks = []
+    async with new_session(args.timeout) as session:
+        start = now()
+        for i, t in enumerate(arrival_times(args)):
+            await asyncio.sleep(max(0.0, start + t - now()))
+            question = f"{QUESTIONS[i % len(QUESTIONS)]} (request {i})"
+            payload = build_payload(args.model, [{"role": "user", "content": question}], args.max_tokens)
+            tasks.append(asyncio.create_task(stream_chat(session, url, payload)))
+        records = await asyncio.gather(*tasks)
+        end = now()
+    await poller.stop()
+    for r in records:
+        r["offset_s"] = r["start_ts"] - start
+    return records, start, end, poller
+
+
+def window_stats(args, records, waiting, running):
+    """Per-window timeline: offered vs sent rate, TTFT and queue depth."""
+    total = args.baseline + args.event + args.recovery
+    rows = []
+    t = 0.0
+    while t < total:
+        group = [r for r in records if t <= r["offset_s"] < t + args.window]
+        ok = [r["ttft"] * 1000 for r in group if not r["error"] and r["ttft"] is not None]
+        queue = [v for s, v in waiting if t <= s < t + args.window]
+        busy = [v for s, v in running if t <= s < t + args.window]
+        rows.append({
+            "t": t,
+            "offered_rate": offered_rate(args, t + args.window / 2),
+            "sent_rate": len(group) / args.window,
+            "errors": len(group) - len(ok),
+            "slo_attainment": goodput(group, args.window, slo_from_args(args))["attainment"],
+            "ttft_ms": percentiles(ok),
+            "waiting_max": max(queue) if queue else None,
+            "running_max": max(busy) if busy else None,
+        })
+        t += args.window
+    return rows
+
+
+def analyze(args, records, start, waiting, running):
+    e0, e1 = args.baseline, args.baseline + args.event
+
+    def ttfts(t0, t1):
+        return [r["ttft"] * 1000 for r in records
+                if t0 <= r["offset_s"] < t1 and not r["error"] and r["ttft"] is not None]
+
+    baseline = percentiles(ttfts(args.warmup, e0))
+    burst = percentiles(ttfts(e0, e1))
+    timeline = window_stats(args, records, waiting, running)
+
+    # Queue drain: first sample after the event back at the baseline queue depth
+    base_queue = max([v for t, v in waiting if args.warmup <= t < e0], default=0)
+    after = [(t, v) for t, v in waiting if t >= e1]
+    peak_queue = max([v for t, v in waiting if t >= e0], default=None)
+    drain_s = None
+    if after:
+        drain_s = next((t - e1 for t, v in after if v <= base_queue), None)
+
+    # Latency recovery: end of the last post-event window whose TTFT p50 is above the threshold
+    threshold = baseline.get("p90", 0) * args.tolerance
+    recovery_s = 0.0
+    post = [row for row in timeline if row["t"] + args.window > e1 and row["ttft_ms"]]
+    for row in post:
+        if row["ttft_ms"]["p50"] > threshold:
+            recovery_s = row["t"] + args.window - e1
+    if post and post[-1]["ttft_ms"]["p50"] > threshold:
+        recovery_s = None
+
+    return {
+        "baseline_ttft_ms": baseline,
+        "burst_ttft_ms": burst,
+        "peak_ttft_ms": max(ttfts(e0, e1), default=None),
+        "post_event_peak_ttft_ms": max(ttfts(e1, float("inf")), default=None),
+        "ttft_threshold_ms": threshold,
+        "baseline_waiting": base_queue,
+        "peak_waiting": peak_queue,
+        "drain_s": drain_s,
+        "recovery_s": recovery_s,
+        "goodput": goodput(records, args.baseline + args.event + args.recovery, slo_from_args(args)),
+        "burst_goodput": goodput([r for r in records if e0 <= r["offset_s"] < e1], args.event, slo_from_args(args)),
+        "num_requests": len(records),
+        "num_errors": sum(1 for r in records if r["error"]),
+        "timeline": timeline,
+    }
+
+
+def print_report(args, result, queue_source):
+    print(f"{'t (s)':>6} {'offered':>8} {'sent':>6} {'TTFT p50':>10} {'TTFT p99':>10} {'SLO met':>8} {'waiting':>8} "
+          f"{'running':>8} {'err':>4}")
+    print(f"{'─'*6} {'─'*8} {'─'*6} {'─'*10} {'─'*10} {'─'*8} {'─'*8} {'─'*8} {'─'*4}")
+    for row in result["timeline"]:
+        ttft = row["ttft_ms"]
+        waiting = f"{row['waiting_max']:>8.0f}" if row["waiting_max"] is not None else f"{'-':>8}"
+        running = f"{row['running_max']:>8.0f}" if row["running_max"] is not None else f"{'-':>8}"
+        met = f"{row['slo_attainment'] * 100:>7.0f}%" if row["slo_attainment"] is not None else f"{'-':>8}"
+        print(f"{row['t']:>6.0f} {row['offered_rate']:>8.1f} {row['sent_rate']:>6.1f} {ttft.get('p50', 0):>10.1f} "
+              f"{ttft.get('p99', 0):>10.1f} {met} {waiting} {running} {row['errors']:>4}")
+
+    base, burst = result["baseline_ttft_ms"], result["burst_ttft_ms"]
+    print(f"\n{'─'*80}")
+    print(f"  Baseline TTFT:     p50 {base.get('p50', 0):.1f}ms | p90 {base.get('p90', 0):.1f}ms | "
+          f"p99 {base.get('p99', 0):.1f}ms")
+    print(f"  Burst TTFT:        p50 {burst.get('p50', 0):.1f}ms | p99 {burst.get('p99', 0):.1f}ms | "
+          f"peak {result['peak_ttft_ms'] or 0:.1f}ms (after the event: {result['post_event_peak_ttft_ms'] or 0:.1f}ms)")
+    if queue_source:
+        drain = f"{result['drain_s']:.1f}s" if result["drain_s"] is not None else "not drained by end of run"
+        print(f"  Waiting queue:     peak {result['peak_waiting'] or 0:.0f} (baseline {result['baseline_waiting']:.0f}), "
+              f"drained {drain} after the event ({queue_source})")
+    else:
+        print("  Waiting queue:     n/a (no /metrics; pass --log with a vLLM log)")
+    recovery = f"{result['recovery_s']:.1f}s" if result["recovery_s"] is not None else "not recovered by end of run"
+    print(f"  Latency recovery:  {recovery} after the event (TTFT p50 <= {result['ttft_threshold_ms']:.1f}ms)")
+    good, burst_good = result["goodput"], result["burst_goodput"]
+    print(f"  Goodput:           {good['requests_per_second'] or 0:.2f} req/s overall "
+          f"({(good['attainment'] or 0) * 100:.1f}% met SLO), {burst_good['requests_per_second'] or 0:.2f} req/s "
+          f"during the event ({(burst_good['attainment'] or 0) * 100:.1f}%)")
+    print(f"  Requests:          {result['num_requests']} ({result['num_errors']} failed)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Burst, step and ramp load scenarios")
+    parser.add_argument("--scenario", choices=["step", "spike", "ramp"], default="spike", help="Arrival rate shape")
+    parser.add_argument("--url", default="http://localhost:8083", help="Server URL")
+    parser.add_argument("--model", default=MODEL, help="Served model name")
+    parser.add_argument("--base-rate", type=float, default=2.0, help="Baseline arrival rate (req/s)")
+    parser.add_argument("--peak-rate", type=float, default=20.0, help="Arrival rate at the top of the event (req/s)")
+    parser.add_argument("--baseline", type=float, default=30.0, help="Seconds at the base rate before the event")
+    parser.add_argument("--event", type=float, help="Event length in seconds (default: spike 5, step/ramp 60)")
+    parser.add_argument("--recovery", type=float, default=90.0, help="Seconds at the base rate after the event")
+    parser.add_argument("--max-tokens", type=int, default=256, help="max_tokens per request")
+    parser.add_argument("--window", type=float, default=5.0, help="Timeline window (s)")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Recovered when TTFT p50 <= tolerance x baseline p90")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Ignore the first N seconds of the baseline")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="/metrics scrape interval (s)")
+    parser.add_argument("--log", help="vLLM log to read 'Waiting: N reqs' from when /metrics is unavailable")
+    parser.add_argument("--seed", type=int, default=0, help="Arrival process seed")
+    parser.add_argument("--timeout", type=int, default=600, help="Per-request timeout (s)")
+    add_slo_args(parser)
+    add_trace_args(parser)
+    args = parser.parse_args()
+    if args.event is None:
+        args.event = DEFAULT_EVENT[args.scenario]
+
+    print(f"\n{'='*80}")
+    print(f"🌊 Load Scenario: {args.scenario}")
+    print(f"{'='*80}")
+    print(f"Endpoint:    {chat_url(args.url)}")
+    print(f"Shape:       {args.base_rate} req/s for {args.baseline}s -> {args.peak_rate} req/s for {args.event}s "
+          f"({args.scenario}) -> {args.base_rate} req/s for {args.recovery}s")
+    print(f"{'='*80}\n")
+
+    records, start, end, poller = asyncio.run(run(args))
+    waiting = [(t - start, v) for t, v in poller.series("waiting")]
+    running = [(t - start, v) for t, v in poller.series("running")]
+    queue_source = "/metrics" if waiting else None
+    if not waiting and args.log and Path(args.log).exists():
+        waiting = [(t - start, v) for t, v in log_waiting_series(args.log, start, end)]
+        queue_source = f"log {args.log}" if waiting else None
+
+    result = analyze(args, records, start, waiting, running)
+    print_report(args, result, queue_source)
+
+    save_results(f"scenario_{args.scenario}", {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "scenario",
+        "scenario": args.scenario,
+        "endpoint": chat_url(args.url),
+        "config": vars(args),
+        "queue_source": queue_source,
+        "result": result,
+        "waiting_series": waiting,
+        "records": [{k: v for k, v in r.items() if k not in ("text", "reasoning_text", "chunk_ts")} for r in records],
+    })
+    if args.trace:
+        save_trace(f"scenario_{args.scenario}", [{"name": f"{args.scenario} scenario", "records": records,
+                                                  "samples": poller.samples}], tokens=args.trace_tokens)
+    print(f"{'='*80}\n")
+
+
+if __name__ == "__main__":
+    main()
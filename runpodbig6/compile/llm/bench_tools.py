@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Tool-calling and structured-output latency benchmark for the Qwen3-235B servers on port 8083
+(vLLM: --tool-call-parser hermes, SGLang: --tool-call-parser qwen).
+
+Runs four workloads at each concurrency level:
+    chat          plain chat, no tools (baseline)
+    tool_auto     three tool schemas, tool_choice=auto, prompt that needs a tool
+    tool_named    same tools, tool_choice forcing one function (guided decoding of the arguments)
+    json_schema   response_format json_schema (grammar-constrained content)
+
+and reports time to first output (first content token, or first delta.tool_calls chunk),
+total latency, ITL and per-stream decode tok/s, how often the output is a valid tool call /
+valid JSON, and the decode slowdown of each structured workload versus plain chat.
+Only one backend serves 8083 at a time, so run once per backend and compare the saved files.
+
+Usage:
+    python bench_tools.py --backend vllm [--concurrency 1,8] [--requests 16]
+    python bench_tools.py --backend sglang
+    python bench_tools.py --compare          # latest eval_tools_vllm_* vs eval_tools_sglang_*
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+from datetime import datetime
+
+from loadgen import RESULTS_DIR, add_slo_args, build_payload, chat_url, goodput, percentiles, run_level, slo_from_args
+
+MODEL = "Qwen3-235B-A22B-Instruct-FP8"
+
+TOOLS = [
+    {"type": "function", "function": {
+        "name": "get_weather",
+        "description": "Current weather for a city.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "city": {"type": "string", "description": "City name"},
+                "unit": {"type": "string", "enum": ["celsius", "fahrenheit"]},
+            },
+            "required": ["city"],
+        },
+    }},
+    {"type": "function", "function": {
+        "name": "search_flights",
+        "description": "Search flights between two airports on a date.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "origin": {"type": "string", "description": "IATA code"},
+                "destination": {"type": "string", "description": "IATA code"},
+                "date": {"type": "string", "description": "YYYY-MM-DD"},
+                "passengers": {"type": "integer"},
+            },
+            "required": ["origin", "destination", "date"],
+        },
+    }},
+    {"type": "function", "function": {
+        "name": "convert_currency",
+        "description": "Convert an amount between currencies.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "amount": {"type": "number"},
+                "from_currency": {"type": "string"},
+                "to_currency": {"type": "string"},
+            },
+            "required": ["amount", "from_currency", "to_currency"],
+        },
+    }},
+]
+
+ANSWER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "city": {"type": "string"},
+        "country": {"type": "string"},
+        "population_millions": {"type": "number"},
+        "landmarks": {"type": "array", "items": {"type": "string"}},
+        "is_capital": {"type": "boolean"},
+    },
+    "required": ["city", "country", "population_millions", "landmarks", "is_capital"],
+    "additionalProperties": False,
+}
+
+CITIES = ["Paris", "Tokyo", "Nairobi", "Lima", "Oslo", "Hanoi", "Toronto", "Cairo"]
+
+
+def make_workloads(model, max_tokens):
+    """name -> make_payload(i); each request names a different city so prefix caching varies."""
+    def chat(i):
+        city = CITIES[i % len(CITIES)]
+        return build_payload(model, [{"role": "user", "content": f"Describe the weather you would expect in {city} "
+                                                                  f"in spring, in a short paragraph."}],
+                             max_tokens, temperature=0.0)
+
+    def tool_auto(i):
+        city = CITIES[i % len(CITIES)]
+        return build_payload(model, [{"role": "user", "content": f"What's the weather in {city} right now, in celsius?"}],
+                             max_tokens, temperature=0.0, tools=TOOLS, tool_choice="auto")
+
+    def tool_named(i):
+        origin, destination = CITIES[i % len(CITIES)], CITIES[(i + 3) % len(CITIES)]
+        return build_payload(model, [{"role": "user", "content": f"Find flights for 2 people from {origin} to "
+                                                                  f"{destination} on 2026-03-14."}],
+                             max_tokens, temperature=0.0, tools=TOOLS,
+                             tool_choice={"type": "function", "function": {"name": "search_flights"}})
+
+    def json_schema(i):
+        city = CITIES[i % len(CITIES)]
+        return build_payload(model, [{"role": "user", "content": f"Give me facts about {city} as JSON."}],
+                             max_tokens, temperature=0.0,
+                             response_format={"type": "json_schema",
+                                              "json_schema": {"name": "city_facts", "schema": ANSWER_SCHEMA}})
+
+    return {"chat": chat, "tool_auto": tool_auto, "tool_named": tool_named, "json_schema": json_schema}
+
+
+def first_output(record):
+    """Seconds to the first content token or tool-call delta, whichever came first."""
+    times = [t for t in (record["ttft"], record["first_tool_call"]) if t is not None]
+    return min(times) if times else None
+
+
+def is_valid(workload, record):
+    """Did the request produce what the workload asked for?"""
+    if workload.startswith("tool"):
+        if not record["tool_calls"]:
+            return False
+        try:
+            return all(isinstance(json.loads(c["arguments"] or "{}"), dict) for c in record["tool_calls"])
+        except json.JSONDecodeError:
+            return False
+    if workload == "json_schema":
+        try:
+            data = json.loads(record["text"])
+        except json.JSONDecodeError:
+            return False
+        return isinstance(data, dict) and all(k in data for k in ANSWER_SCHEMA["required"])
+    return bool(record["text"])
+
+
+def summarize_workload(workload, records, duration, slo=None):
+    ok = [r for r in records if not r["error"] and first_output(r) is not None]
+    itls, decode_rates = [], []
+    for r in ok:
+        ts = sorted(r["chunk_ts"] + r["tool_call_ts"])
+        itls.extend((b - a) * 1000 for a, b in zip(ts, ts[1:]))
+        if r["tokens"] > 1 and r["time"] > first_output(r):
+            decode_rates.append((r["tokens"] - 1) / (r["time"] - first_output(r)))
+    tool_ttfts = [r["first_tool_call"] * 1000 for r in ok if r["first_tool_call"] is not None]
+    return {
+        "workload": workload,
+        "num_requests": len(records),
+        "num_errors": len(records) - len(ok),
+        "first_error": next((r["error"] for r in records if r["error"]), None),
+        "first_output_ms": percentiles([first_output(r) * 1000 for r in ok]),
+        "first_tool_call_ms": percentiles(tool_ttfts),
+        "e2e_ms": percentiles([r["time"] * 1000 for r in ok]),
+        "itl_ms": percentiles(itls),
+        "decode_tok_per_s": percentiles(decode_rates),
+        "completion_tokens": percentiles([r["tokens"] for r in ok]),
+        "tokens_per_second": sum(r["tokens"] for r in ok) / duration if duration else 0.0,
+        "goodput": goodput(records, duration, slo),
+        "valid_rate": sum(1 for r in ok if is_valid(workload, r)) / len(ok) if ok else 0.0,
+        "finish_reasons": sorted({r["finish_reason"] for r in ok if r["finish_reason"]}),
+        "tool_names": sorted({c["name"] for r in ok for c in r["tool_calls"]}),
+    }
+
+
+async def run(args):
+    url = chat_url(args.url)
+    workloads = make_workloads(args.model, args.max_tokens)
+    levels = []
+    for concurrency in args.concurrency:
+        num_requests = max(args.requests, concurrency * 2)
+        results = {}
+        for name in args.workloads:
+            print(f"  {name:<12} @ conc {concurrency:>3}...", end=" ", flush=True)
+            records, duration = await run_level(url, workloads[name], concurrency, num_requests,
+                                                warmup=1, timeout=args.timeout)
+            s = summarize_workload(name, records, duration, slo_from_args(args))
+            results[name] = s
+            if s["num_errors"] == s["num_requests"]:
+                print(f"❌ {s['first_error']}")
+                continue
+            print(f"✅ first output p50 {s['first_output_ms']['p50']:7.1f}ms | e2e p50 {s['e2e_ms']['p50']:7.1f}ms | "
+                  f"ITL p50 {s['itl_ms'].get('p50', 0):5.2f}ms | "
+                  f"decode {s['decode_tok_per_s'].get('p50', 0):6.1f} tok/s | valid {s['valid_rate'] * 100:5.1f}% | "
+                  f"SLO met {(s['goodput']['attainment'] or 0) * 100:5.1f}%")
+
+        # Structured overhead relative to plain chat at the same concurrency
+        base = results.get("chat", {}).get("decode_tok_per_s", {}).get("p50")
+        for name, s in results.items():
+            rate = s["decode_tok_per_s"].get("p50")
+            s["decode_vs_chat"] = rate / base if base and rate else None
+        levels.append({"concurrency": concurrency, "num_requests": num_requests, "workloads": results})
+    return levels
+
+
+def print_overhead(levels, label):
+    print(f"\n{'─'*80}")
+    print(f"STRUCTURED OUTPUT OVERHEAD ({label}, decode tok/s vs plain chat)")
+    print(f"{'─'*80}")
+    names = [n for n in levels[0]["workloads"] if n != "chat"] if levels else []
+    print(f"{'Conc':>6} " + " ".join(f"{n:>14}" for n in names))
+    for level in levels:
+        cells = []
+        for n in names:
+            ratio = level["workloads"][n].get("decode_vs_chat")
+            cells.append(f"{(ratio - 1) * 100:+13.1f}%" if ratio else f"{'n/a':>14}")
+        print(f"{level['concurrency']:>6} " + " ".join(cells))
+
+
+def load_latest(backend):
+    files = sorted(glob.glob(str(RESULTS_DIR / f"eval_tools_{backend}_*.json")), reverse=True)
+    if not files:
+        return None
+    with open(files[0], "r") as f:
+        return json.load(f)
+
+
+def compare():
+    vllm_data, sglang_data = load_latest("vllm"), load_latest("sglang")
+    if not vllm_data or not sglang_data:
+        print("❌ Need both eval_tools_vllm_*.json and eval_tools_sglang_*.json (run with --backend first)")
+        return 1
+
+    print(f"\n{'='*80}")
+    print("TOOL CALLING / STRUCTURED OUTPUT: vLLM vs SGLang")
+    print(f"{'='*80}")
+    print(f"{'Conc':>5} {'Workload':<12} {'first out p50 (ms)':>22} {'e2e p50 (ms)':>20} {'decode tok/s':>16} {'valid %':>12}")
+    print(f"{'':>5} {'':<12} {'vLLM':>10} {'SGLang':>11} {'vLLM':>9} {'SGLang':>10} {'vLLM':>7} {'SGLang':>8} "
+          f"{'vLLM':>5} {'SGLang':>6}")
+    sglang_levels = {lvl["concurrency"]: lvl for lvl in sglang_data["levels"]}
+    for level in vllm_data["levels"]:
+        other = sglang_levels.get(level["concurrency"])
+        if not other:
+            continue
+        for name, v in level["workloads"].items():
+            s = other["workloads"].get(name)
+            if not s:
+                continue
+            print(f"{level['concurrency']:>5} {name:<12} "
+                  f"{v['first_output_ms'].get('p50', 0):>10.1f} {s['first_output_ms'].get('p50', 0):>11.1f} "
+                  f"{v['e2e_ms'].get('p50', 0):>9.0f} {s['e2e_ms'].get('p50', 0):>10.0f} "
+                  f"{v['decode_tok_per_s'].get('p50', 0):>7.1f} {s['decode_tok_per_s'].get('p50', 0):>8.1f} "
+                  f"{v['valid_rate'] * 100:>5.0f} {s['valid_rate'] * 100:>6.0f}")
+    print(f"{'='*80}\n")
+    return 0
+
+
+def parse_levels(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tool-calling and structured-output latency benchmark")
+    parser.add_argument("--backend", choices=["vllm", "sglang"], help="Which server is on --url (labels the results)")
+    parser.add_argument("--compare", action="store_true", help="Compare the latest vLLM and SGLang result files")
+    parser.add_argument("--url", default="http://localhost:8083", help="Server URL")
+    parser.add_argument("--model", default=MODEL, help="Served model name")
+    parser.add_argument("--workloads", default="chat,tool_auto,tool_named,json_schema",
+                        type=lambda v: [w for w in v.split(",") if w], help="Workloads to run")
+    parser.add_argument("--concurrency", type=parse_levels, default=[1, 8], help="Concurrency levels")
+    parser.add_argument("--requests", type=int, default=16, help="Requests per workload and level")
+    parser.add_argument("--max-tokens", type=int, default=256, help="max_tokens for every workload")
+    parser.add_argument("--timeout", type=int, default=300, help="Per-request timeout (s)")
+    add_slo_args(parser)
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare()
+    if not args.backend:
+        parser.error("--backend is required unless --compare is given")
+
+    print(f"\n{'='*80}")
+    print(f"🛠️  Tool Calling / Structured Output Benchmark ({args.backend})")
+    print(f"{'='*80}")
+    print(f"Endpoint:    {chat_url(args.url)}")
+    print(f"Model:       {args.model}")
+    print(f"Workloads:   {', '.join(args.workloads)}")
+    print(f"Concurrency: {args.concurrency}")
+    print(f"{'='*80}\n")
+
+    levels = asyncio.run(run(args))
+    if "chat" in args.workloads:
+        print_overhead(levels, args.backend)
+
+    output_data = {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "tools",
+        "backend": args.backend,
+        "endpoint": chat_url(args.url),
+        "model": args.model,
+        "max_tokens": args.max_tokens,
+        "levels": levels,
+    }
+    output_file = RESULTS_DIR / f"eval_tools_{args.backend}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(output_data, f, indent=2)
+
+    print(f"\n💾 Results saved to: {output_file}")
+    print(f"{'='*80}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
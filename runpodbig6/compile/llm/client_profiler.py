@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+In-process profiler for benchmark clients.
+Samples the client's own CPU%, RSS, scheduling lag, event-loop lag and GC pauses
+so a bad latency number can be attributed to the server or to the Python client.
+
+Usage:
+    from client_profiler import ClientProfiler
+
+    profiler = ClientProfiler()
+    profiler.start()
+    ...                       # run requests, keep a "start_ts" + "ttft"/"time" per result
+    profiler.stop()
+    profiler.print_summary(results)
+    output_data["client_profile"] = profiler.to_dict(results)
+"""
+
+import asyncio
+import gc
+import os
+import resource
+import statistics
+import threading
+import time
+
+# Thresholds above which the client itself is considered saturated
+CPU_SATURATION_PCT = 90.0   # % of one core (the GIL caps useful work at ~100%)
+LAG_SATURATION_MS = 50.0    # thread wake-up or event-loop lag
+GC_SATURATION_MS = 20.0     # total GC pause time inside one sample interval
+
+# A request counts as a latency spike when it is this much slower than the median
+SPIKE_FACTOR = 2.0
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def read_rss_mb():
+    """Current resident set size in MB (falls back to peak RSS off Linux)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ClientProfiler:
+    """Background sampler for the benchmark client's own resource usage."""
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.samples = []
+        self.gc_pauses = []
+        self._gc_start = None
+        self._loop_lag_ms = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._loop_task = None
+
+    # ------------------------------------------------------------------ control
+
+    def start(self):
+        """Start sampling in a daemon thread and hook GC callbacks."""
+        self._stop.clear()
+        gc.callbacks.append(self._on_gc)
+        self._thread = threading.Thread(target=self._run, name="client-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling and unhook GC callbacks."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        if self._loop_task:
+            self._loop_task.cancel()
+            self._loop_task = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def watch_loop(self):
+        """Measure event-loop lag. Must be called from inside the running loop."""
+        self._loop_task = asyncio.get_running_loop().create_task(self._probe_loop())
+        return self._loop_task
+
+    # ------------------------------------------------------------------ sampling
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self._gc_start = time.perf_counter()
+        elif phase == "stop" and self._gc_start is not None:
+            self.gc_pauses.append({
+                "t": time.time(),
+                "generation": info.get("generation"),
+                "pause_ms": (time.perf_counter() - self._gc_start) * 1000,
+            })
+            self._gc_start = None
+
+    async def _probe_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            self._loop_lag_ms = max(self._loop_lag_ms, lag_ms)
+
+    def _run(self):
+        last_wall = time.perf_counter()
+        last_cpu = time.process_time()
+        gc_seen = 0
+
+        while not self._stop.is_set():
+            expected = time.perf_counter() + self.interval
+            self._stop.wait(self.interval)
+            wall = time.perf_counter()
+            cpu = time.process_time()
+
+            pauses = self.gc_pauses[gc_seen:]
+            gc_seen += len(pauses)
+
+            self.samples.append({
+                "t": time.time(),
+                "cpu_pct": (cpu - last_cpu) / (wall - last_wall) * 100 if wall > last_wall else 0.0,
+                "rss_mb": read_rss_mb(),
+                "thread_lag_ms": max(0.0, (wall - expected) * 1000),
+                "loop_lag_ms": self._loop_lag_ms,
+                "gc_pause_ms": sum(p["pause_ms"] for p in pauses),
+                "gc_count": len(pauses),
+            })
+            self._loop_lag_ms = 0.0
+            last_wall, last_cpu = wall, cpu
+
+    # ------------------------------------------------------------------ analysis
+
+    @staticmethod
+    def is_saturated(sample):
+        """True if a single sample shows the client as the bottleneck."""
+        return (sample["cpu_pct"] >= CPU_SATURATION_PCT
+                or sample["thread_lag_ms"] >= LAG_SATURATION_MS
+                or sample["loop_lag_ms"] >= LAG_SATURATION_MS
+                or sample["gc_pause_ms"] >= GC_SATURATION_MS)
+
+    def summary(self):
+        """Aggregate statistics over all samples."""
+        if not self.samples:
+            return {}
+
+        def peak(key):
+            return max(s[key] for s in self.samples)
+
+        cpu = [s["cpu_pct"] for s in self.samples]
+        return {
+            "num_samples": len(self.samples),
+            "interval_s": self.interval,
+            "avg_cpu_pct": statistics.mean(cpu),
+            "max_cpu_pct": max(cpu),
+            "max_rss_mb": peak("rss_mb"),
+            "max_thread_lag_ms": peak("thread_lag_ms"),
+            "max_loop_lag_ms": peak("loop_lag_ms"),
+            "gc_collections": len(self.gc_pauses),
+            "gc_total_pause_ms": sum(p["pause_ms"] for p in self.gc_pauses),
+            "gc_max_pause_ms": max((p["pause_ms"] for p in self.gc_pauses), default=0.0),
+            "saturated_samples": sum(1 for s in self.samples if self.is_saturated(s)),
+        }
+
+    def saturation_warnings(self, results, latency_key="ttft"):
+        """
+        Find latency spikes that overlap with client saturation.
+        Each result needs "start_ts" (wall clock) plus `latency_key` and "time" in seconds.
+        """
+        timed = [r for r in results if r and r.get("start_ts") is not None and r.get(latency_key)]
+        if len(timed) < 2 or not self.samples:
+            return []
+
+        median = statistics.median(r[latency_key] for r in timed)
+        warnings = []
+        for r in timed:
+            if r[latency_key] < median * SPIKE_FACTOR:
+                continue
+            window_end = r["start_ts"] + r.get("time", r[latency_key])
+            hot = [s for s in self.samples
+                   if r["start_ts"] - self.interval <= s["t"] <= window_end + self.interval
+                   and self.is_saturated(s)]
+            if not hot:
+                continue
+            reasons = []
+            if max(s["cpu_pct"] for s in hot) >= CPU_SATURATION_PCT:
+                reasons.append(f"CPU {max(s['cpu_pct'] for s in hot):.0f}%")
+            lag = max(max(s["thread_lag_ms"], s["loop_lag_ms"]) for s in hot)
+            if lag >= LAG_SATURATION_MS:
+                reasons.append(f"lag {lag:.0f}ms")
+            gc_ms = sum(s["gc_pause_ms"] for s in hot)
+            if gc_ms >= GC_SATURATION_MS:
+                reasons.append(f"GC {gc_ms:.0f}ms")
+            label = r.get("backend", "request")
+            warnings.append(
+                f"{label}: {latency_key} {r[latency_key]:.3f}s is {r[latency_key] / median:.1f}x the median "
+                f"while the client was saturated ({', '.join(reasons)})"
+            )
+        return warnings
+
+    def to_dict(self, results=None, latency_key="ttft"):
+        """Serializable profile to store next to the latency data."""
+        return {
+            "summary": self.summary(),
+            "warnings": self.saturation_warnings(results or [], latency_key),
+            "samples": self.samples,
+            "gc_pauses": self.gc_pauses,
+        }
+
+    def print_summary(self, results=None, latency_key="ttft"):
+        """Print client overhead and any saturation warnings."""
+        s = self.summary()
+        if not s:
+            return
+        print(f"\nClient overhead ({s['num_samples']} samples @ {s['interval_s'] * 1000:.0f}ms):")
+        print(f"  CPU:        avg {s['avg_cpu_pct']:.1f}% | max {s['max_cpu_pct']:.1f}%")
+        print(f"  RSS:        max {s['max_rss_mb']:.1f} MB")
+        print(f"  Lag:        thread {s['max_thread_lag_ms']:.1f}ms | event loop {s['max_loop_lag_ms']:.1f}ms")
+        print(f"  GC:         {s['gc_collections']} collections | "
+              f"total {s['gc_total_pause_ms']:.1f}ms | max {s['gc_max_pause_ms']:.1f}ms")
+        for w in self.saturation_warnings(results or [], latency_key):
+            print(f"  ⚠️  {w}")
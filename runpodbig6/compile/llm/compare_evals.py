@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-"""Compare vLLM and SGLang evaluation results."""
+"""Compare vLLM and SGLang evaluation results, ranked by SLO goodput rather than raw tokens/s."""
 
 import json
 import sys
@@ -17,12 +17,75 @@ def load_latest_eval(backend):
     with open(files[0], 'r') as f:
         return json.load(f)
 
+def load_client_floor():
+    """
+    Most recent client floor calibration as (ttft_ms percentiles, client), or (None, None).
+    The evals use synchronous `requests`, so a `loadgen.py calibrate --client requests` floor is
+    preferred; the aiohttp floor of the load generator is only a fallback and not their noise bound.
+    """
+    for client, pattern in [("requests", "/compile/llm/eval_requests_floor_*.json"),
+                            ("aiohttp", "/compile/llm/eval_client_floor_*.json")]:
+        files = sorted(glob.glob(pattern), reverse=True)
+        if not files:
+            continue
+        
+        with open(files[0], 'r') as f:
+            data = json.load(f)
+        
+        # These evals send one request at a time, so use the lowest calibrated concurrency;
+        # a calibration whose requests all failed has no percentiles and counts as missing
+        levels = sorted(data.get('levels', []), key=lambda l: l['concurrency'])
+        if levels and levels[0]['summary']['ttft_ms']:
+            return levels[0]['summary']['ttft_ms'], client
+    return None, None
+
+def load_goodput_configs():
+    """Best goodput of every saved loadgen sweep / capacity search (one entry per file)."""
+    configs = []
+    for path in sorted(glob.glob("/compile/llm/eval_*.json")):
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        name = Path(path).stem[len("eval_"):]
+        if data.get('test_type') == 'loadgen':
+            levels = [l for l in data.get('levels', []) if l['summary'].get('goodput')]
+            if levels:
+                best = max(levels, key=lambda l: l['summary']['goodput']['tokens_per_second'] or 0)
+                good = best['summary']['goodput']
+                configs.append({"name": name, "goodput_tps": good['tokens_per_second'] or 0,
+                                "raw_tps": best['summary'].get('tokens_per_second', 0),
+                                "attainment": good['attainment'], "at": f"conc {best['concurrency']}"})
+        elif data.get('test_type') == 'capacity' and data.get('max_sustainable_rate'):
+            probe = max((p for p in data['probes'] if p['ok']), key=lambda p: p['rate'])
+            good = probe['summary']['goodput']
+            configs.append({"name": name, "goodput_tps": good['tokens_per_second'] or 0,
+                            "raw_tps": probe['summary'].get('tokens_per_second', 0),
+                            "attainment": good['attainment'], "at": f"{probe['rate']:.2f} req/s max"})
+    return sorted(configs, key=lambda c: c['goodput_tps'], reverse=True)
+
+def print_goodput_ranking():
+    configs = load_goodput_configs()
+    if not configs:
+        return
+    print(f"{'─'*80}")
+    print("CONFIGURATIONS RANKED BY GOODPUT (tokens/s of requests that met the SLO):")
+    print(f"{'─'*80}\n")
+    print(f"{'#':>3} {'Config':<36} {'Goodput tok/s':>14} {'Raw tok/s':>10} {'SLO met':>8} {'At':>16}")
+    print(f"{'─'*3} {'─'*36} {'─'*14} {'─'*10} {'─'*8} {'─'*16}")
+    for i, c in enumerate(configs, 1):
+        print(f"{i:>3} {c['name'][:36]:<36} {c['goodput_tps']:>14.1f} {c['raw_tps']:>10.1f} "
+              f"{(c['attainment'] or 0) * 100:>7.1f}% {c['at']:>16}")
+    print()
+
 def main():
     # Load most recent evaluations
     vllm_data = load_latest_eval("vllm")
     sglang_data = load_latest_eval("sglang")
     
     if not vllm_data and not sglang_data:
+        print_goodput_ranking()
         print("❌ No evaluation files found!")
         print("Run test_vllm_only.py or test_sglang_only.py first.")
         sys.exit(1)
@@ -36,6 +99,8 @@ def main():
         print(f"🔵 vLLM (evaluated at {vllm_data['timestamp']})")
         print(f"   All requests:  {vllm_data['statistics']['all_requests']['avg_tokens_per_second']:.2f} tokens/s")
         print(f"   Warm requests: {vllm_data['statistics']['warm_requests']['avg_tokens_per_second']:.2f} tokens/s")
+        if vllm_data['statistics'].get('goodput'):
+            print(f"   Warm goodput:  {vllm_data['statistics']['goodput']['tokens_per_second']:.2f} tokens/s within SLO")
     else:
         print(f"🔵 vLLM: No data available")
     
@@ -46,6 +111,8 @@ def main():
         print(f"🟢 SGLang (evaluated at {sglang_data['timestamp']})")
         print(f"   All requests:  {sglang_data['statistics']['all_requests']['avg_tokens_per_second']:.2f} tokens/s")
         print(f"   Warm requests: {sglang_data['statistics']['warm_requests']['avg_tokens_per_second']:.2f} tokens/s")
+        if sglang_data['statistics'].get('goodput'):
+            print(f"   Warm goodput:  {sglang_data['statistics']['goodput']['tokens_per_second']:.2f} tokens/s within SLO")
     else:
         print(f"🟢 SGLang: No data available")
     
@@ -80,17 +147,58 @@ def main():
             diff_ttft = sglang_warm_ttft - vllm_warm_ttft
             pct_ttft = (diff_ttft / vllm_warm_ttft) * 100 if vllm_warm_ttft > 0 else 0
             print(f"{'Warm TTFT (s)':<30} {vllm_warm_ttft:>15.3f} {sglang_warm_ttft:>15.3f} {f'+{diff_ttft:.3f} ({pct_ttft:+.1f}%)' if diff_ttft >= 0 else f'{diff_ttft:.3f} ({pct_ttft:.1f}%)':>15}")
+            
+            # Client floor: TTFT the benchmark client adds on its own (zero-latency server)
+            floor, client = load_client_floor()
+            if client == "requests":
+                print(f"{'Client floor TTFT p50/p99 (ms)':<30} {floor['p50']:>15.2f} {floor['p99']:>15.2f}")
+                if abs(diff_ttft) * 1000 < floor['p99']:
+                    print(f"⚠️  TTFT difference ({abs(diff_ttft) * 1000:.1f}ms) is within the client floor "
+                          f"({floor['p99']:.1f}ms p99) - could be client noise")
+            elif client == "aiohttp":
+                print(f"{'aiohttp floor p50/p99 (ms)':<30} {floor['p50']:>15.2f} {floor['p99']:>15.2f}")
+                print(f"ℹ️  That floor was measured with loadgen's aiohttp client, not the requests client these "
+                      f"evals use, so it is not a noise bound here - run 'python loadgen.py calibrate --client requests'")
+            else:
+                print(f"ℹ️  No client floor found - run 'python loadgen.py calibrate --client requests' to qualify "
+                      f"small TTFT deltas")
         
-        # Overall winner
+        # Goodput: only requests that met the TTFT/TPOT SLO count
+        vllm_goodput = vllm_data['statistics'].get('goodput')
+        sglang_goodput = sglang_data['statistics'].get('goodput')
+        if vllm_goodput and sglang_goodput:
+            v, s = vllm_goodput['tokens_per_second'], sglang_goodput['tokens_per_second']
+            print(f"{'Warm goodput (tokens/s)':<30} {v:>15.2f} {s:>15.2f} {s - v:>+15.2f}")
+            v, s = vllm_goodput['attainment'] * 100, sglang_goodput['attainment'] * 100
+            print(f"{'Warm SLO attainment (%)':<30} {v:>15.0f} {s:>15.0f} {s - v:>+15.0f}")
+        
+        # Thinking mode: time to first thought vs first answer token
+        vllm_reasoning = vllm_data['statistics'].get('reasoning')
+        sglang_reasoning = sglang_data['statistics'].get('reasoning')
+        if vllm_reasoning and sglang_reasoning:
+            for label, key, fmt in [("Warm first thought (s)", 'avg_ttfr', '.3f'),
+                                    ("Warm thinking time (s)", 'avg_thinking_time', '.2f'),
+                                    ("Warm thinking tokens", 'avg_reasoning_tokens', '.0f'),
+                                    ("Warm answer tokens/second", 'avg_answer_tps', '.2f')]:
+                v, s = vllm_reasoning[key], sglang_reasoning[key]
+                print(f"{label:<30} {v:>15{fmt}} {s:>15{fmt}} {s - v:>+15{fmt}}")
+
+        # Overall winner: by goodput when both runs recorded it, raw tokens/s otherwise
         print(f"\n{'─'*80}")
-        if sglang_warm_tps > vllm_warm_tps:
-            speedup = sglang_warm_tps / vllm_warm_tps
-            print(f"🏆 SGLang is {speedup:.2f}x faster than vLLM (warm requests)")
-        elif vllm_warm_tps > sglang_warm_tps:
-            speedup = vllm_warm_tps / sglang_warm_tps
-            print(f"🏆 vLLM is {speedup:.2f}x faster than SGLang (warm requests)")
+        if vllm_goodput and sglang_goodput:
+            vllm_score, sglang_score = vllm_goodput['tokens_per_second'], sglang_goodput['tokens_per_second']
+            basis = "goodput, warm requests"
+        else:
+            vllm_score, sglang_score = vllm_warm_tps, sglang_warm_tps
+            basis = "raw tokens/s, warm requests - rerun the tests to record goodput"
+        if sglang_score > vllm_score:
+            speedup = sglang_score / vllm_score if vllm_score > 0 else float('inf')
+            print(f"🏆 SGLang is {speedup:.2f}x better than vLLM ({basis})")
+        elif vllm_score > sglang_score:
+            speedup = vllm_score / sglang_score if sglang_score > 0 else float('inf')
+            print(f"🏆 vLLM is {speedup:.2f}x better than SGLang ({basis})")
         else:
-            print(f"🤝 Both have identical performance")
+            print(f"🤝 Both have identical performance ({basis})")
         
         print(f"{'─'*80}\n")
         
@@ -104,7 +212,9 @@ def main():
             sglang_tps = sglang_data['results'][i]['tps'] if i < len(sglang_data['results']) else 0
             print(f"{label:<30} {vllm_tps:>20.2f} {sglang_tps:>20.2f}")
     
-    print(f"\n{'='*80}\n")
+    print()
+    print_goodput_ranking()
+    print(f"{'='*80}\n")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Client-side dynamic micro-batching for the embedding server (port 8007).
+
+Concurrent `embed(text)` calls are coalesced into batched /v1/embeddings requests, flushed
+when `max_batch_size` inputs are queued or `max_wait_ms` after the first one arrived.
+Each caller gets back exactly its own vector.
+
+Usage:
+    async with EmbeddingBatcher("http://localhost:8007", max_batch_size=64, max_wait_ms=5) as batcher:
+        vec = await batcher.embed("some text")          # np.ndarray (dim,)
+
+    python embed_batcher.py --callers 256 --texts 4096  # benchmark batched vs unbatched
+"""
+
+import argparse
+import asyncio
+import json
+from datetime import datetime
+from pathlib import Path
+
+import aiohttp
+
+from bench_embeddings import MODEL, decode_embeddings, embeddings_url, make_text
+from loadgen import new_session, now, percentiles
+
+RESULTS_DIR = Path(__file__).resolve().parent
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent embed() calls into batched requests."""
+
+    def __init__(self, url="http://localhost:8007", model=MODEL, max_batch_size=64, max_wait_ms=5.0,
+                 max_in_flight=8, timeout=120, session=None):
+        self.url = embeddings_url(url)
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self.requests_sent = 0
+        self.inputs_sent = 0
+        self._session = session
+        self._owns_session = session is None
+        self._queue = None
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._flusher = None
+        self._batches = set()
+
+    async def start(self):
+        if self._session is None:
+            self._session = new_session(self.timeout)
+        self._queue = asyncio.Queue()
+        self._flusher = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def close(self):
+        """Flush whatever is queued, wait for in-flight batches, then stop."""
+        if self._flusher:
+            await self._queue.join()
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        if self._owns_session and self._session:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def embed(self, text):
+        """Vector for one text; batched transparently with other concurrent callers."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def embed_many(self, texts):
+        """Vectors for several texts, in order."""
+        return await asyncio.gather(*(self.embed(t) for t in texts))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._in_flight.acquire()
+            task = loop.create_task(self._send(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _send(self, batch):
+        try:
+            texts = [text for text, _ in batch]
+            body = json.dumps({"model": self.model, "input": texts, "encoding_format": "base64"})
+            self.requests_sent += 1
+            self.inputs_sent += len(texts)
+            async with self._session.post(self.url, data=body, headers={"Content-Type": "application/json"}) as resp:
+                raw = await resp.read()
+                if resp.status != 200:
+                    raise RuntimeError(f"HTTP {resp.status}: {raw[:200].decode('utf-8', 'replace')}")
+            vectors = decode_embeddings(json.loads(raw))
+            if len(vectors) != len(batch):
+                raise ValueError(f"got {len(vectors)} embeddings for {len(batch)} inputs")
+            for i, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result(vectors[i])
+        except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError, ValueError, KeyError) as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+            self._in_flight.release()
+
+
+async def embed_unbatched(session, url, model, text):
+    """One request per text (the baseline our services use today)."""
+    body = json.dumps({"model": model, "input": [text], "encoding_format": "base64"})
+    async with session.post(url, data=body, headers={"Content-Type": "application/json"}) as resp:
+        raw = await resp.read()
+        if resp.status != 200:
+            raise RuntimeError(f"HTTP {resp.status}")
+    return decode_embeddings(json.loads(raw))[0]
+
+
+async def drive(callers, texts, embed_fn):
+    """`callers` concurrent callers each embedding texts one at a time; per-call latency in ms."""
+    latencies = []
+    pending = list(range(len(texts)))
+
+    async def caller():
+        while pending:
+            i = pending.pop()
+            start = now()
+            await embed_fn(texts[i])
+            latencies.append((now() - start) * 1000)
+
+    start = now()
+    await asyncio.gather(*(caller() for _ in range(callers)))
+    return latencies, now() - start
+
+
+async def benchmark(args):
+    texts = [make_text(args.text_tokens, seed=i) for i in range(args.texts)]
+    url = embeddings_url(args.url)
+    results = {}
+
+    async with new_session(args.timeout) as session:
+        await embed_unbatched(session, url, args.model, texts[0])  # warmup
+        latencies, duration = await drive(args.callers, texts,
+                                           lambda t: embed_unbatched(session, url, args.model, t))
+        results["unbatched"] = {"requests_sent": len(texts), "latencies": latencies, "duration": duration}
+
+    async with EmbeddingBatcher(args.url, args.model, max_batch_size=args.max_batch_size,
+                                max_wait_ms=args.max_wait_ms, max_in_flight=args.max_in_flight,
+                                timeout=args.timeout) as batcher:
+        await batcher.embed(texts[0])  # warmup
+        sent_before = batcher.requests_sent
+        latencies, duration = await drive(args.callers, texts, batcher.embed)
+        results["batched"] = {"requests_sent": batcher.requests_sent - sent_before,
+                              "latencies": latencies, "duration": duration}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-batched vs unbatched embedding calls")
+    parser.add_argument("--url", default="http://localhost:8007", help="Embedding server URL")
+    parser.add_argument("--model", default=MODEL, help="Served model name")
+    parser.add_argument("--callers", type=int, default=256, help="Concurrent embed() callers")
+    parser.add_argument("--texts", type=int, default=4096, help="Total texts to embed")
+    parser.add_argument("--text-tokens", type=int, default=64, help="Approximate tokens per text")
+    parser.add_argument("--max-batch-size", type=int, default=64, help="Batcher: max inputs per request")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Batcher: max wait after first input")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="Batcher: concurrent batched requests")
+    parser.add_argument("--timeout", type=int, default=120, help="Per-request timeout (s)")
+    args = parser.parse_args()
+
+    print(f"\n{'='*80}")
+    print("📦 Embedding Micro-batching Benchmark")
+    print(f"{'='*80}")
+    print(f"Endpoint: {embeddings_url(args.url)}")
+    print(f"Callers:  {args.callers} concurrent, {args.texts} texts of ~{args.text_tokens} tokens")
+    print(f"Batcher:  max batch {args.max_batch_size}, max wait {args.max_wait_ms}ms, "
+          f"{args.max_in_flight} in flight")
+    print(f"{'='*80}\n")
+
+    results = asyncio.run(benchmark(args))
+
+    print(f"{'Mode':<12} {'emb/s':>10} {'requests':>10} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    print(f"{'─'*12} {'─'*10} {'─'*10} {'─'*10} {'─'*10}")
+    summary = {}
+    for mode, r in results.items():
+        lat = percentiles(r["latencies"])
+        summary[mode] = {
+            "embeddings_per_second": len(r["latencies"]) / r["duration"],
+            "requests_sent": r["requests_sent"],
+            "latency_ms": lat,
+        }
+        print(f"{mode:<12} {summary[mode]['embeddings_per_second']:>10.1f} {r['requests_sent']:>10} "
+              f"{lat['p50']:>10.2f} {lat['p99']:>10.2f}")
+
+    speedup = summary["batched"]["embeddings_per_second"] / summary["unbatched"]["embeddings_per_second"]
+    print(f"\n🚀 Batched is {speedup:.2f}x the unbatched throughput with "
+          f"{summary['batched']['requests_sent']} instead of {summary['unbatched']['requests_sent']} requests")
+
+    output_data = {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "embedding_batcher",
+        "endpoint": embeddings_url(args.url),
+        "config": vars(args),
+        "results": summary,
+    }
+    output_file = RESULTS_DIR / f"eval_embedding_batcher_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(output_data, f, indent=2)
+
+    print(f"\n💾 Results saved to: {output_file}")
+    print(f"{'='*80}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Persistent content-addressed embedding cache in front of the Qwen3-Embedding server.
+
+Vectors live in a memory-mapped float16/float32 array file; a parallel memory-mapped key file
+(sha256 of model + normalized text) and last-used clock make up the hash index, rebuilt in
+memory on open. When the cache is full the least recently used slots are evicted. Bulk lookups
+return hits straight from the mmap and only misses are sent to the server.
+
+Layout of a cache directory:
+    meta.json      dim, capacity, dtype
+    vectors.bin    (capacity, dim) float16|float32
+    keys.bin       (capacity, 32) uint8  sha256 digests
+    clock.bin      (capacity,) int64     last-used tick, 0 = empty slot
+
+The files are created on the first write-capable open, sized for the full capacity (the default
+100k float16 1024-d vectors is ~200 MB); `stats` opens read-only and never creates them.
+
+Usage:
+    cache = EmbeddingCache("/compile/llm/embed_cache", dim=1024, capacity=100_000)
+    async with CachedEmbedder(cache, EmbeddingBatcher("http://localhost:8007")) as embedder:
+        vectors = await embedder.embed_many(texts)        # (n, dim) float32
+
+    python embed_cache.py embed --input docs.txt          # one text per line
+    python embed_cache.py stats
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+
+from bench_embeddings import MODEL
+from embed_batcher import EmbeddingBatcher
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / "embed_cache"
+DEFAULT_CAPACITY = 100_000
+KEY_BYTES = 32
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Unicode NFC, trimmed, whitespace runs collapsed to one space."""
+    return _WS_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(model, text):
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Fixed-capacity LRU of vectors backed by memory-mapped files."""
+
+    def __init__(self, path=DEFAULT_CACHE_DIR, dim=1024, capacity=DEFAULT_CAPACITY, dtype="float16", read_only=False):
+        """With `read_only`, an existing cache is opened without write access (FileNotFoundError if none)."""
+        self.path = Path(path)
+        self.read_only = read_only
+        meta_path = self.path / "meta.json"
+        if read_only and not meta_path.exists():
+            raise FileNotFoundError(f"no embedding cache in {self.path}")
+        if not read_only:
+            self.path.mkdir(parents=True, exist_ok=True)
+        if meta_path.exists():
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            dim, capacity, dtype = meta["dim"], meta["capacity"], meta["dtype"]
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"dim": dim, "capacity": capacity, "dtype": dtype}, f)
+
+        self.dim = dim
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self.vectors = self._open("vectors.bin", self.dtype, (capacity, dim))
+        self.keys = self._open("keys.bin", np.uint8, (capacity, KEY_BYTES))
+        self.clock = self._open("clock.bin", np.int64, (capacity,))
+
+        used = np.flatnonzero(self.clock)
+        self.index = {self.keys[slot].tobytes(): int(slot) for slot in used}
+        self.free = [int(s) for s in np.flatnonzero(self.clock == 0)[::-1]]
+        self.tick = int(self.clock.max()) if len(used) else 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _open(self, name, dtype, shape):
+        path = self.path / name
+        if self.read_only:
+            return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+        mode = "r+" if path.exists() else "w+"
+        return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+    def __len__(self):
+        return len(self.index)
+
+    def get_many(self, model, texts):
+        """
+        Bulk lookup. Returns (vectors, missing): a (n, dim) float32 array with hits filled in
+        and the list of indices into `texts` that were not cached.
+        """
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        hit_rows, hit_slots, missing = [], [], []
+        for i, text in enumerate(texts):
+            slot = self.index.get(cache_key(model, text))
+            if slot is None:
+                missing.append(i)
+            else:
+                hit_rows.append(i)
+                hit_slots.append(slot)
+
+        if hit_slots:
+            slots = np.asarray(hit_slots)
+            out[hit_rows] = self.vectors[slots]
+            if not self.read_only:
+                self.tick += 1
+                self.clock[slots] = self.tick
+        self.hits += len(hit_rows)
+        self.misses += len(missing)
+        return out, missing
+
+    def put_many(self, model, texts, vectors):
+        """Insert vectors, evicting least recently used slots when full."""
+        keys = [cache_key(model, t) for t in texts]
+        self.tick += 1
+        # Keys being overwritten are the most recently used, so eviction never picks them
+        existing = [self.index[k] for k in keys if k in self.index]
+        if existing:
+            self.clock[np.asarray(existing)] = self.tick
+        self._make_room(len([k for k in dict.fromkeys(keys) if k not in self.index]))
+
+        for key, vec in zip(keys, vectors):
+            slot = self.index.get(key)
+            if slot is None:
+                if not self.free:
+                    continue  # more new texts than the whole cache holds
+                slot = self.free.pop()
+                self.index[key] = slot
+                self.keys[slot] = np.frombuffer(key, dtype=np.uint8)
+            self.vectors[slot] = vec
+            self.clock[slot] = self.tick
+
+    def _make_room(self, needed):
+        shortfall = min(needed - len(self.free), len(self.index))
+        if shortfall <= 0:
+            return
+        # Empty slots are already on the free list; only occupied ones are candidates
+        occupied = np.where(self.clock == 0, np.iinfo(np.int64).max, self.clock)
+        for slot in np.argpartition(occupied, shortfall - 1)[:shortfall]:
+            slot = int(slot)
+            del self.index[self.keys[slot].tobytes()]
+            self.clock[slot] = 0
+            self.free.append(slot)
+            self.evictions += 1
+
+    def flush(self):
+        if self.read_only:
+            return
+        self.vectors.flush()
+        self.keys.flush()
+        self.clock.flush()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.index),
+            "capacity": self.capacity,
+            "dim": self.dim,
+            "dtype": str(self.dtype),
+            "file_mb": self.vectors.nbytes / (1024 * 1024),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class CachedEmbedder:
+    """Looks texts up in an EmbeddingCache and only sends misses through an EmbeddingBatcher."""
+
+    def __init__(self, cache, batcher):
+        self.cache = cache
+        self.batcher = batcher
+
+    async def __aenter__(self):
+        await self.batcher.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.batcher.close()
+        self.cache.flush()
+
+    async def embed_many(self, texts):
+        model = self.batcher.model
+        vectors, missing = self.cache.get_many(model, texts)
+        if missing:
+            # Duplicate texts in one call go to the server once
+            unique = list(dict.fromkeys(normalize_text(texts[i]) for i in missing))
+            fetched = np.stack(await self.batcher.embed_many(unique))
+            self.cache.put_many(model, unique, fetched)
+            by_text = dict(zip(unique, fetched))
+            for i in missing:
+                vectors[i] = by_text[normalize_text(texts[i])]
+        return vectors
+
+    async def embed(self, text):
+        return (await self.embed_many([text]))[0]
+
+
+async def embed_file(args):
+    with open(args.input, "r") as f:
+        texts = [line.rstrip("\n") for line in f if line.strip()]
+
+    cache = EmbeddingCache(args.cache_dir, dim=args.dim, capacity=args.capacity, dtype=args.dtype)
+    batcher = EmbeddingBatcher(args.url, args.model, max_batch_size=args.max_batch_size)
+    start = time.time()
+    async with CachedEmbedder(cache, batcher) as embedder:
+        chunks = [await embedder.embed_many(texts[i:i + args.chunk]) for i in range(0, len(texts), args.chunk)]
+        requests_sent = batcher.requests_sent
+    elapsed = time.time() - start
+
+    if args.output:
+        np.save(args.output, np.concatenate(chunks) if chunks else np.zeros((0, cache.dim), np.float32))
+    return cache, len(texts), requests_sent, elapsed
+
+
+def print_stats(stats):
+    print(f"  Entries:    {stats['entries']} / {stats['capacity']} ({stats['dtype']}, dim {stats['dim']}, "
+          f"{stats['file_mb']:.0f} MB)")
+    print(f"  Hits:       {stats['hits']} | Misses: {stats['misses']} | Hit rate: {stats['hit_rate'] * 100:.1f}%")
+    print(f"  Evictions:  {stats['evictions']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent embedding cache")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="Cache directory")
+    parser.add_argument("--dim", type=int, default=1024, help="Vector size (new caches only)")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY, help="Max entries (new caches only)")
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16", help="Storage dtype (new caches only)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    embed = sub.add_parser("embed", help="Embed a text file (one text per line) through the cache")
+    embed.add_argument("--input", required=True, help="Text file, one document per line")
+    embed.add_argument("--output", help="Optional .npy file for the vectors")
+    embed.add_argument("--url", default="http://localhost:8007", help="Embedding server URL")
+    embed.add_argument("--model", default=MODEL, help="Served model name")
+    embed.add_argument("--max-batch-size", type=int, default=64, help="Inputs per server request")
+    embed.add_argument("--chunk", type=int, default=4096, help="Texts looked up per bulk call")
+
+    sub.add_parser("stats", help="Show cache size")
+    args = parser.parse_args()
+
+    print(f"\n{'='*80}")
+    print(f"🗄️  Embedding Cache: {args.cache_dir}")
+    print(f"{'='*80}")
+    if args.command == "stats":
+        try:
+            print_stats(EmbeddingCache(args.cache_dir, read_only=True).stats())
+        except FileNotFoundError as e:
+            print(f"  ℹ️  Empty: {e}")
+    else:
+        cache, num_texts, requests_sent, elapsed = asyncio.run(embed_file(args))
+        print(f"  Texts:      {num_texts} in {elapsed:.2f}s ({num_texts / elapsed if elapsed > 0 else 0:.1f} texts/s)")
+        print(f"  Requests:   {requests_sent} sent to {args.url}")
+        print_stats(cache.stats())
+        if args.output:
+            print(f"\n💾 Vectors saved to: {args.output}")
+    print(f"{'='*80}\n")
+
+
+if __name__ == "__main__":
+    main()
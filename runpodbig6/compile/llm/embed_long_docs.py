@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Chunk-and-pool embedding pipeline for documents longer than the embedding server's
+8192-token --max-model-len.
+
+Each document is tokenized and split into overlapping windows of `--chunk-tokens`, the chunks
+of many documents are embedded together through EmbeddingBatcher, and the chunk vectors are
+pooled (mean, or weighted by chunk token count) and L2-normalized into one vector per document.
+Documents are read lazily and at most `--max-docs-in-flight` are held in memory; vectors are
+appended to the output file as documents finish, so corpus size does not bound memory.
+
+Tokenization uses the model's Hugging Face tokenizer when `transformers` is installed and
+falls back to ~4 characters per token split on whitespace otherwise.
+
+Input: a .jsonl file ({"id": ..., "text": ...} per line), a directory of .txt files,
+or --synthetic N generated documents.
+
+Output: <output>.f32 (n, dim) float32 rows and <output>.ids.jsonl with one
+{"id", "chunks", "tokens"} line per row, in completion order.
+
+Usage:
+    python embed_long_docs.py --input corpus.jsonl --output vectors
+    python embed_long_docs.py --synthetic 200 --doc-tokens 30000 --pooling weighted
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import time
+from datetime import datetime
+from pathlib import Path
+
+import aiohttp
+import numpy as np
+
+from bench_embeddings import MAX_MODEL_LEN, MODEL, embeddings_url, make_text
+from embed_batcher import EmbeddingBatcher
+
+RESULTS_DIR = Path(__file__).resolve().parent
+TOKENIZER = "Qwen/Qwen3-Embedding-0.6B"
+CHARS_PER_TOKEN = 4
+
+
+class Chunker:
+    """Splits text into overlapping token windows, returned as (chunk_text, num_tokens)."""
+
+    def __init__(self, chunk_tokens=2048, overlap=128, tokenizer=TOKENIZER):
+        if not 0 <= overlap < chunk_tokens:
+            raise ValueError("overlap must be smaller than chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap = overlap
+        self.tokenizer = _load_tokenizer(tokenizer) if tokenizer else None
+
+    @property
+    def mode(self):
+        return "tokenizer" if self.tokenizer is not None else "approx"
+
+    def split(self, text):
+        if self.tokenizer is not None:
+            return self._split_tokens(text)
+        return self._split_approx(text)
+
+    def _split_tokens(self, text):
+        enc = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        offsets = enc["offset_mapping"]
+        if not offsets:
+            return []
+        chunks = []
+        step = self.chunk_tokens - self.overlap
+        for start in range(0, len(offsets), step):
+            window = offsets[start:start + self.chunk_tokens]
+            chunks.append((text[window[0][0]:window[-1][1]], len(window)))
+            if start + self.chunk_tokens >= len(offsets):
+                break
+        return chunks
+
+    def _split_approx(self, text):
+        # Whitespace words stand in for tokens, scaled so a chunk stays under chunk_tokens
+        words = text.split()
+        if not words:
+            return []
+        chars_per_word = max(1.0, len(text) / len(words))
+        words_per_chunk = max(1, int(self.chunk_tokens * CHARS_PER_TOKEN / chars_per_word))
+        words_overlap = int(words_per_chunk * self.overlap / self.chunk_tokens)
+        chunks = []
+        step = max(1, words_per_chunk - words_overlap)
+        for start in range(0, len(words), step):
+            chunk = " ".join(words[start:start + words_per_chunk])
+            chunks.append((chunk, max(1, len(chunk) // CHARS_PER_TOKEN)))
+            if start + words_per_chunk >= len(words):
+                break
+        return chunks
+
+
+def _load_tokenizer(name):
+    try:
+        from transformers import AutoTokenizer
+    except ImportError:
+        return None
+    try:
+        return AutoTokenizer.from_pretrained(name)
+    except OSError:
+        return None
+
+
+def pool(vectors, weights, method="mean"):
+    """One L2-normalized vector from (n, dim) chunk vectors."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if method == "weighted":
+        w = np.asarray(weights, dtype=np.float32)
+        pooled = (vectors * w[:, None]).sum(axis=0) / w.sum()
+    else:
+        pooled = vectors.mean(axis=0)
+    norm = np.linalg.norm(pooled)
+    return pooled / norm if norm > 0 else pooled
+
+
+def read_documents(args):
+    """Yield (doc_id, text) lazily so the corpus never sits in memory."""
+    if args.synthetic:
+        for i in range(args.synthetic):
+            yield f"synthetic-{i}", make_text(args.doc_tokens, seed=i)
+        return
+    path = Path(args.input)
+    if path.is_dir():
+        for file in sorted(path.glob("*.txt")):
+            yield file.stem, file.read_text(errors="replace")
+        return
+    with open(path, "r") as f:
+        for lineno, line in enumerate(f):
+            if line.strip():
+                doc = json.loads(line)
+                yield doc.get("id", lineno), doc["text"]
+
+
+class VectorWriter:
+    """Appends pooled vectors and their ids to disk as documents complete."""
+
+    def __init__(self, prefix):
+        self.prefix = Path(prefix) if prefix else None
+        self.rows = 0
+        self._vectors = None
+        self._ids = None
+
+    def __enter__(self):
+        if self.prefix:
+            self._vectors = open(f"{self.prefix}.f32", "wb")
+            self._ids = open(f"{self.prefix}.ids.jsonl", "w")
+        return self
+
+    def __exit__(self, *exc):
+        if self._vectors:
+            self._vectors.close()
+            self._ids.close()
+
+    def write(self, doc_id, vector, chunks, tokens):
+        self.rows += 1
+        if self._vectors:
+            self._vectors.write(vector.astype(np.float32).tobytes())
+            self._ids.write(json.dumps({"id": doc_id, "chunks": chunks, "tokens": tokens}) + "\n")
+
+
+async def run_pipeline(args, chunker):
+    stats = {"docs": 0, "chunks": 0, "tokens": 0, "errors": 0, "dim": None, "first_error": None}
+    in_flight = asyncio.Semaphore(args.max_docs_in_flight)
+    tasks = set()
+
+    async def embed_document(batcher, writer, doc_id, text):
+        try:
+            chunks = chunker.split(text)
+            if not chunks:
+                return
+            vectors = await batcher.embed_many([c for c, _ in chunks])
+            weights = [n for _, n in chunks]
+            vector = pool(vectors, weights, args.pooling)
+            writer.write(doc_id, vector, len(chunks), sum(weights))
+            stats["docs"] += 1
+            stats["chunks"] += len(chunks)
+            stats["tokens"] += sum(weights)
+            stats["dim"] = len(vector)
+            if args.progress and stats["docs"] % args.progress == 0:
+                elapsed = time.time() - start
+                print(f"  {stats['docs']:>8} docs | {stats['docs'] / elapsed:8.2f} docs/s | "
+                      f"{stats['tokens'] / elapsed:10.0f} tok/s")
+        except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError, ValueError, KeyError) as e:
+            # One bad document should not stop the corpus
+            stats["errors"] += 1
+            stats["first_error"] = stats["first_error"] or f"{doc_id}: {e}"
+        finally:
+            in_flight.release()
+
+    start = time.time()
+    async with EmbeddingBatcher(args.url, args.model, max_batch_size=args.max_batch_size,
+                                max_wait_ms=args.max_wait_ms, max_in_flight=args.max_in_flight,
+                                timeout=args.timeout) as batcher:
+        with VectorWriter(args.output) as writer:
+            for doc_id, text in read_documents(args):
+                await in_flight.acquire()
+                task = asyncio.get_running_loop().create_task(embed_document(batcher, writer, doc_id, text))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        stats["requests_sent"] = batcher.requests_sent
+    stats["duration_s"] = time.time() - start
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk-and-pool embedding pipeline for long documents")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help=".jsonl with {id, text} per line, or a directory of .txt files")
+    source.add_argument("--synthetic", type=int, help="Generate N synthetic documents instead")
+    parser.add_argument("--doc-tokens", type=int, default=20000, help="Synthetic document length (approx tokens)")
+    parser.add_argument("--output", help="Output prefix for <prefix>.f32 and <prefix>.ids.jsonl")
+    parser.add_argument("--url", default="http://localhost:8007", help="Embedding server URL")
+    parser.add_argument("--model", default=MODEL, help="Served model name")
+    parser.add_argument("--tokenizer", default=TOKENIZER, help="HF tokenizer (empty string: approximate)")
+    parser.add_argument("--chunk-tokens", type=int, default=2048, help=f"Tokens per chunk (<= {MAX_MODEL_LEN})")
+    parser.add_argument("--overlap", type=int, default=128, help="Tokens shared by consecutive chunks")
+    parser.add_argument("--pooling", choices=["mean", "weighted"], default="mean",
+                        help="Chunk pooling (weighted: by chunk token count)")
+    parser.add_argument("--max-batch-size", type=int, default=16, help="Chunks per server request")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Batcher: max wait after first chunk")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="Concurrent server requests")
+    parser.add_argument("--max-docs-in-flight", type=int, default=64, help="Documents held in memory at once")
+    parser.add_argument("--progress", type=int, default=0, help="Print progress every N documents")
+    parser.add_argument("--timeout", type=int, default=300, help="Per-request timeout (s)")
+    args = parser.parse_args()
+
+    if args.chunk_tokens > MAX_MODEL_LEN:
+        parser.error(f"--chunk-tokens must be <= {MAX_MODEL_LEN}")
+    chunker = Chunker(args.chunk_tokens, args.overlap, args.tokenizer)
+
+    print(f"\n{'='*80}")
+    print("📚 Long-document Embedding Pipeline")
+    print(f"{'='*80}")
+    print(f"Endpoint:   {embeddings_url(args.url)}")
+    print(f"Source:     {args.input or f'{args.synthetic} synthetic docs of ~{args.doc_tokens} tokens'}")
+    print(f"Chunking:   {args.chunk_tokens} tokens, {args.overlap} overlap ({chunker.mode})")
+    print(f"Pooling:    {args.pooling}")
+    print(f"In flight:  {args.max_docs_in_flight} docs, {args.max_in_flight} requests of <= {args.max_batch_size} chunks")
+    print(f"{'='*80}\n")
+
+    stats = asyncio.run(run_pipeline(args, chunker))
+    duration = stats["duration_s"]
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(f"\n{'─'*80}")
+    print("RESULTS:")
+    print(f"{'─'*80}")
+    print(f"  Documents:  {stats['docs']} ({stats['errors']} failed) in {duration:.2f}s")
+    print(f"  Docs/s:     {stats['docs'] / duration if duration > 0 else 0:.2f}")
+    print(f"  Chunks:     {stats['chunks']} ({stats['chunks'] / max(stats['docs'], 1):.1f} per doc) "
+          f"in {stats['requests_sent']} requests")
+    print(f"  Tokens/s:   {stats['tokens'] / duration if duration > 0 else 0:.0f}")
+    print(f"  Peak RSS:   {peak_rss_mb:.0f} MB")
+    if stats["first_error"]:
+        print(f"  ⚠️  First error: {stats['first_error']}")
+
+    output_data = {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "long_doc_embeddings",
+        "endpoint": embeddings_url(args.url),
+        "config": vars(args),
+        "chunker": chunker.mode,
+        "results": {
+            **stats,
+            "docs_per_second": stats["docs"] / duration if duration > 0 else 0,
+            "tokens_per_second": stats["tokens"] / duration if duration > 0 else 0,
+            "peak_rss_mb": peak_rss_mb,
+        },
+    }
+    output_file = RESULTS_DIR / f"eval_long_doc_embeddings_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(output_data, f, indent=2)
+
+    if args.output:
+        print(f"\n💾 Vectors: {args.output}.f32 ({stats['docs']} x {stats['dim']} float32)")
+    print(f"💾 Results saved to: {output_file}")
+    print(f"{'='*80}\n")
+    return 0 if stats["docs"] else 1
+
+
+if __name__ == "__main__":
+    exit(main())
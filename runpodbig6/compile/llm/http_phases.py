@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Client-side timing breakdown of the time to first token.
+
+TTFT measured from before the POST lumps together DNS, TCP connect, the request upload (large for
+base64 images), server-side queueing and prefill, the role-only first SSE chunk and the first real
+token. Marks taken at the points the client can observe split it into consecutive phases that add
+up to TTFT:
+
+    connect           request start -> connection ready (client prep, DNS, TCP; ~0 on a reused connection)
+    upload            first -> last request body byte handed to the socket
+    wait_headers      body sent -> response headers (validation, tokenization, image preprocessing)
+    wait_first_chunk  headers -> first SSE event (queueing + prefill when headers are sent right away)
+    first_token       first SSE event -> first non-whitespace content (role-only chunk, empty deltas)
+
+Marks are seconds relative to the request start. loadgen.stream_chat records them for aiohttp;
+requests-based scripts send their body as a TimedBody and add "response_headers" themselves:
+
+    body = TimedBody(json.dumps(payload).encode("utf-8"))
+    start = time.time()
+    response = requests.post(url, data=body, headers={"Content-Type": "application/json"}, stream=True)
+    marks = dict(body.marks(start), response_headers=time.time() - start)
+    ...
+    phases = phases_ms(marks, first_chunk, ttft)
+"""
+
+import time
+
+# (phase, from mark, to mark); "start" is the request start (0)
+PHASES = [
+    ("connect", "start", "upload_start"),
+    ("upload", "upload_start", "upload_end"),
+    ("wait_headers", "upload_end", "response_headers"),
+    ("wait_first_chunk", "response_headers", "first_chunk"),
+    ("first_token", "first_chunk", "first_token"),
+]
+
+LABELS = {
+    "connect": "connect",
+    "upload": "upload",
+    "wait_headers": "headers",
+    "wait_first_chunk": "first chunk",
+    "first_token": "first token",
+}
+
+
+class TimedBody:
+    """
+    Request body for `requests` that timestamps when the upload starts and when the last byte has
+    been handed to the socket. `requests` sends file-like bodies with a Content-Length in blocks,
+    so the wire format is the same as for a bytes body (set the Content-Type yourself).
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+        self.upload_start = None
+        self.upload_end = None
+
+    def __len__(self):
+        return len(self.data) - self.offset
+
+    def read(self, size=-1):
+        t = time.time()
+        if self.upload_start is None:
+            self.upload_start = t
+        if size is None or size < 0:
+            size = len(self.data)
+        chunk = self.data[self.offset:self.offset + size]
+        self.offset += len(chunk)
+        if not chunk and self.upload_end is None:
+            self.upload_end = t
+        return chunk
+
+    def marks(self, start):
+        """Upload marks relative to `start` (time.time() before the POST)."""
+        marks = {"request_bytes": len(self.data)}
+        if self.upload_start is not None:
+            marks["upload_start"] = self.upload_start - start
+        if self.upload_end is not None:
+            marks["upload_end"] = self.upload_end - start
+        return marks
+
+
+def phases_ms(marks, first_chunk=None, first_token=None):
+    """
+    Phase durations (ms) from request marks plus the first SSE chunk and first token (seconds since
+    the request start). Phases whose marks are missing are left out, so the rest still add up.
+    """
+    points = dict(marks, start=0.0, first_chunk=first_chunk, first_token=first_token)
+    phases = {}
+    for name, a, b in PHASES:
+        if points.get(a) is not None and points.get(b) is not None:
+            phases[name] = (points[b] - points[a]) * 1000
+    if marks.get("dns_start") is not None and marks.get("dns_end") is not None:
+        phases["dns"] = (marks["dns_end"] - marks["dns_start"]) * 1000
+    if marks.get("request_bytes") and phases.get("upload"):
+        phases["upload_mb_per_s"] = marks["request_bytes"] / (1024 * 1024) / (phases["upload"] / 1000)
+    return phases
+
+
+def format_phases(phases, key=None):
+    """One-line breakdown, e.g. "connect 0.4 | upload 12.1 | headers 3.0 | first chunk 240.2 | first token 0.1 ms".
+    With `key`, `phases` maps each phase to a stats dict (e.g. percentiles) and that entry is shown."""
+    cells = []
+    for name, _, _ in PHASES:
+        value = phases.get(name)
+        if key is not None and value is not None:
+            value = value.get(key)
+        if value is not None:
+            cells.append(f"{LABELS[name]} {value:.1f}")
+    return " | ".join(cells) + " ms" if cells else "n/a"
@@ -0,0 +1,889 @@
+#!/usr/bin/env python3
+"""
+Concurrent streaming load generator for OpenAI-compatible chat servers.
+
+Subcommands:
+    run        Sweep concurrency levels against a real server and report TTFT/ITL percentiles
+               and goodput (requests/tokens per second that met --slo-ttft-ms / --slo-tpot-ms).
+               Every prompt starts with a per-request nonce (also for `capacity`), so prefix
+               caching cannot turn TTFT into a cache hit.
+    capacity   Bisect the open-loop arrival rate for the highest rate that still meets the SLO
+               for --target of the requests (max sustainable rate).
+    calibrate  Measure the client's own TTFT/ITL floor against a zero-latency endpoint
+               (spawns mock_server.py unless --url is given) and save a "client floor" curve.
+
+Usage:
+    python loadgen.py calibrate --concurrency 1,8,32,128
+    python loadgen.py calibrate --client requests      # floor of the requests-based test_*_only.py evals
+    python loadgen.py run --url http://localhost:8083 --model Qwen3-235B-A22B-Instruct-FP8 \\
+        --concurrency 1,8,32 --floor latest
+    python loadgen.py run --url http://localhost:8083 --concurrency 256 --trace     # + Perfetto timeline
+    python loadgen.py capacity --url http://localhost:8083 --slo-ttft-ms 2000 --slo-tpot-ms 80 --target 0.9
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import aiohttp
+
+from client_profiler import ClientProfiler
+from http_phases import TimedBody, format_phases, phases_ms
+from server_metrics import MetricsPoller
+from trace_export import add_trace_args, save_trace
+
+RESULTS_DIR = Path(__file__).resolve().parent
+MOCK_SERVER = RESULTS_DIR / "mock_server.py"
+
+DEFAULT_PROMPT = "Explain the concept of quantum entanglement in simple terms, as if teaching a high school student."
+
+# A request is "good" when its first answer token and its mean time per output token are within these
+DEFAULT_SLO = {"ttft_ms": 2000.0, "tpot_ms": 80.0}
+
+_WALL0 = time.time()
+_PERF0 = time.perf_counter()
+
+
+def now():
+    """Wall-clock seconds with perf_counter resolution (monotonic within a run)."""
+    return _WALL0 + (time.perf_counter() - _PERF0)
+
+
+def percentiles(values):
+    """p50/p90/p99/mean/max of a list of numbers (empty dict if no values)."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "p50": pct(50),
+        "p90": pct(90),
+        "p99": pct(99),
+        "mean": statistics.mean(ordered),
+        "max": ordered[-1],
+    }
+
+
+def chat_url(base_url):
+    """Accept either a base URL or a full /v1/chat/completions endpoint."""
+    base_url = base_url.rstrip("/")
+    if base_url.endswith("/chat/completions"):
+        return base_url
+    if base_url.endswith("/v1"):
+        return f"{base_url}/chat/completions"
+    return f"{base_url}/v1/chat/completions"
+
+
+def new_session(timeout=120):
+    """aiohttp session without a connection cap (concurrency is limited by the caller)."""
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=0, ttl_dns_cache=300),
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        trace_configs=[phase_trace_config()],
+    )
+
+
+def phase_trace_config():
+    """
+    Timestamp DNS, connection setup and the response headers into the dict a request passes as
+    `trace_request_ctx` (see stream_chat; the phases are described in http_phases).
+    """
+    config = aiohttp.TraceConfig()
+
+    def mark(name):
+        async def hook(session, ctx, params):
+            if ctx.trace_request_ctx is not None:
+                ctx.trace_request_ctx.setdefault(name, now())
+        return hook
+
+    config.on_dns_resolvehost_start.append(mark("dns_start"))
+    config.on_dns_resolvehost_end.append(mark("dns_end"))
+    config.on_connection_create_start.append(mark("connect_start"))
+    config.on_connection_create_end.append(mark("connect_end"))
+    config.on_connection_reuseconn.append(mark("reused"))
+    config.on_request_end.append(mark("response_headers"))
+    return config
+
+
+async def timed_body(body, marks, piece=65536):
+    """
+    Stream a serialized body in pieces, marking when the first piece is requested and when the
+    writer has taken the last one (each write drains to the socket before the next piece).
+    """
+    marks["upload_start"] = now()
+    for i in range(0, len(body), piece):
+        yield body[i:i + piece]
+    marks["upload_end"] = now()
+
+
+def build_payload(model, messages, max_tokens, temperature=0.7, **extra):
+    """Streaming chat payload that asks the server for a final usage chunk."""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+    payload.update(extra)
+    return payload
+
+
+async def stream_chat(session, url, payload, abort_after=None):
+    """
+    Send one streaming chat request and timestamp every content chunk.
+    Returns a record with times in seconds relative to "start_ts" (wall clock).
+    "http" holds the client-side marks of the request (connect, upload, response headers) and
+    "phases_ms" the TTFT breakdown built from them (http_phases).
+    With `abort_after`, the connection is closed after that many streamed tokens, like a client
+    navigating away ("aborted" is set; it is not an error).
+    Streamed tool calls are reassembled into "tool_calls"; "first_tool_call" and "tool_call_ts"
+    time their deltas the way "ttft" and "chunk_ts" time content. Reasoning models stream
+    thoughts as delta.reasoning_content (newer vLLM: delta.reasoning) before the answer; those
+    are timed in "first_reasoning"/"reasoning_ts" and kept out of "ttft", which stays the first
+    answer token.
+    """
+    body = json.dumps(payload).encode("utf-8")
+    record = {
+        "start_ts": now(),
+        "ttft": None,
+        "first_chunk": None,
+        "time": None,
+        "tokens": 0,
+        "prompt_tokens": None,
+        "cached_tokens": None,
+        "chunk_ts": [],
+        "text": "",
+        "first_reasoning": None,
+        "reasoning_ts": [],
+        "reasoning_tokens": None,
+        "first_tool_call": None,
+        "tool_call_ts": [],
+        "tool_calls": [],
+        "finish_reason": None,
+        "aborted": False,
+        "error": None,
+    }
+    start = record["start_ts"]
+    usage_tokens = 0
+    parts = []
+    reasoning_parts = []
+    marks = {}
+
+    try:
+        # An explicit Content-Length keeps the piecewise body from switching to chunked encoding
+        async with session.post(url, data=timed_body(body, marks), trace_request_ctx=marks,
+                                headers={"Content-Type": "application/json",
+                                         "Content-Length": str(len(body))}) as response:
+            if response.status != 200:
+                record["error"] = f"HTTP {response.status}: {(await response.text())[:200]}"
+                return record
+
+            async for raw in response.content:
+                line = raw.strip()
+                if not line.startswith(b"data: "):
+                    continue
+                data = line[6:]
+                if data == b"[DONE]":
+                    break
+                t = now() - start
+                if record["first_chunk"] is None:
+                    record["first_chunk"] = t
+                try:
+                    chunk = json.loads(data)
+                except json.JSONDecodeError:
+                    continue
+
+                if chunk.get("usage"):
+                    usage_tokens = chunk["usage"].get("completion_tokens", 0) or 0
+                    record["prompt_tokens"] = chunk["usage"].get("prompt_tokens")
+                    record["cached_tokens"] = (chunk["usage"].get("prompt_tokens_details") or {}).get("cached_tokens")
+                    details = chunk["usage"].get("completion_tokens_details") or {}
+                    record["reasoning_tokens"] = details.get("reasoning_tokens")
+
+                choices = chunk.get("choices") or []
+                if not choices:
+                    continue
+                delta = choices[0].get("delta") or {}
+                record["finish_reason"] = choices[0].get("finish_reason") or record["finish_reason"]
+                reasoning = delta.get("reasoning_content") or delta.get("reasoning")
+                if reasoning:
+                    reasoning_parts.append(reasoning)
+                    record["reasoning_ts"].append(t)
+                    if record["first_reasoning"] is None and reasoning.strip():
+                        record["first_reasoning"] = t
+                content = delta.get("content")
+                if content:
+                    parts.append(content)
+                    record["chunk_ts"].append(t)
+                    if record["ttft"] is None and content.strip():
+                        record["ttft"] = t
+                if delta.get("tool_calls"):
+                    merge_tool_call_deltas(record["tool_calls"], delta["tool_calls"])
+                    record["tool_call_ts"].append(t)
+                    if record["first_tool_call"] is None:
+                        record["first_tool_call"] = t
+                if abort_after is not None and (len(record["chunk_ts"]) + len(record["reasoning_ts"])
+                                                + len(record["tool_call_ts"])) >= abort_after:
+                    record["aborted"] = True
+                    response.close()
+                    break
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+
+    record["time"] = now() - start
+    record["http"] = {k: v - start for k, v in marks.items()}
+    record["http"]["request_bytes"] = len(body)
+    record["http"]["reused_connection"] = "reused" in marks
+    record["phases_ms"] = phases_ms(record["http"], record["first_chunk"], record["ttft"])
+    record["text"] = "".join(parts)
+    record["reasoning_text"] = "".join(reasoning_parts)
+    record["tokens"] = usage_tokens or len(record["chunk_ts"]) + len(record["tool_call_ts"]) + len(record["reasoning_ts"])
+    if record["reasoning_ts"] and record["reasoning_tokens"] is None:
+        # One token per streamed chunk: split the completion in proportion to the chunks
+        chunks = len(record["reasoning_ts"]) + len(record["chunk_ts"]) + len(record["tool_call_ts"])
+        record["reasoning_tokens"] = round(record["tokens"] * len(record["reasoning_ts"]) / chunks)
+    return record
+
+
+def requests_chat(url, payload, timeout=120):
+    """
+    One streaming request the way the synchronous evals send it (test_vllm_only.py and friends):
+    `requests.post` with a TimedBody and no connection reuse. Same record fields as stream_chat for
+    content, so summarize() works on the result; used to calibrate the floor of that client.
+    """
+    import requests
+
+    body = TimedBody(json.dumps(payload).encode("utf-8"))
+    record = {"start_ts": now(), "ttft": None, "first_chunk": None, "time": None, "tokens": 0,
+              "chunk_ts": [], "text": "", "error": None}
+    start = record["start_ts"]
+    marks = {}
+    usage_tokens = 0
+    parts = []
+    try:
+        response = requests.post(url, data=body, headers={"Content-Type": "application/json"},
+                                 stream=True, timeout=timeout)
+        marks["response_headers"] = now() - start
+        if response.status_code != 200:
+            record["error"] = f"HTTP {response.status_code}: {response.text[:200]}"
+        else:
+            for line in response.iter_lines():
+                if not line.startswith(b"data: "):
+                    continue
+                data = line[6:]
+                if data == b"[DONE]":
+                    break
+                t = now() - start
+                if record["first_chunk"] is None:
+                    record["first_chunk"] = t
+                try:
+                    chunk = json.loads(data)
+                except json.JSONDecodeError:
+                    continue
+                if chunk.get("usage"):
+                    usage_tokens = chunk["usage"].get("completion_tokens") or usage_tokens
+                content = ((chunk.get("choices") or [{}])[0].get("delta") or {}).get("content")
+                if content:
+                    parts.append(content)
+                    record["chunk_ts"].append(t)
+                    if record["ttft"] is None and content.strip():
+                        record["ttft"] = t
+        response.close()
+    except requests.RequestException as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+
+    record["time"] = now() - start
+    record["http"] = dict(body.marks(start), **marks)
+    record["phases_ms"] = phases_ms(record["http"], record["first_chunk"], record["ttft"])
+    record["text"] = "".join(parts)
+    record["tokens"] = usage_tokens or len(record["chunk_ts"])
+    return record
+
+
+def requests_floor(url, make_payload, num_requests, warmup=0, timeout=120):
+    """Back-to-back requests_chat calls, one at a time like the synchronous evals; (records, duration)."""
+    for i in range(warmup):
+        requests_chat(url, make_payload(i), timeout)
+    records = []
+    start = now()
+    for i in range(num_requests):
+        record = requests_chat(url, make_payload(i), timeout)
+        record["id"] = i
+        records.append(record)
+    return records, now() - start
+
+
+def reasoning_metrics(records):
+    """Thinking vs answer split for records that streamed reasoning content (empty dict if none)."""
+    thinking = [r for r in records if not r["error"] and r.get("first_reasoning") is not None]
+    if not thinking:
+        return {}
+    think_rates, answer_rates = [], []
+    for r in thinking:
+        answer_start = r["ttft"] if r["ttft"] is not None else r["time"]
+        if answer_start > r["first_reasoning"]:
+            think_rates.append(r["reasoning_tokens"] / (answer_start - r["first_reasoning"]))
+        if r["ttft"] is not None and r["time"] > r["ttft"]:
+            answer_rates.append((r["tokens"] - r["reasoning_tokens"]) / (r["time"] - r["ttft"]))
+    return {
+        "num_thinking": len(thinking),
+        "ttfr_ms": percentiles([r["first_reasoning"] * 1000 for r in thinking]),
+        "thinking_ms": percentiles([((r["ttft"] if r["ttft"] is not None else r["time"]) - r["first_reasoning"]) * 1000
+                                    for r in thinking]),
+        "reasoning_tokens": percentiles([r["reasoning_tokens"] for r in thinking]),
+        "answer_tokens": percentiles([r["tokens"] - r["reasoning_tokens"] for r in thinking]),
+        "reasoning_tok_per_s": percentiles(think_rates),
+        "answer_tok_per_s": percentiles(answer_rates),
+    }
+
+
+def merge_tool_call_deltas(calls, deltas):
+    """Accumulate OpenAI streaming tool_call deltas (keyed by index) into complete calls."""
+    for d in deltas:
+        index = d.get("index", len(calls))
+        while len(calls) <= index:
+            calls.append({"id": None, "name": "", "arguments": ""})
+        call = calls[index]
+        call["id"] = d.get("id") or call["id"]
+        function = d.get("function") or {}
+        call["name"] += function.get("name") or ""
+        call["arguments"] += function.get("arguments") or ""
+
+
+def itl_ms(record):
+    """Inter-token gaps (ms) between consecutive content chunks of one record."""
+    ts = record["chunk_ts"]
+    return [(b - a) * 1000 for a, b in zip(ts, ts[1:])]
+
+
+def request_tpot_ms(record):
+    """Mean time per output token after the first streamed token, or None for single-token replies."""
+    starts = [t for t in (record.get("first_reasoning"), record["ttft"], record.get("first_tool_call")) if t is not None]
+    if not starts or record["tokens"] <= 1:
+        return None
+    return (record["time"] - min(starts)) * 1000 / (record["tokens"] - 1)
+
+
+def meets_slo(record, slo):
+    """True when a finished request met both the TTFT and the TPOT target."""
+    first = record["ttft"] if record["ttft"] is not None else record.get("first_tool_call")
+    if record["error"] or record.get("aborted") or first is None or first * 1000 > slo["ttft_ms"]:
+        return False
+    tpot = request_tpot_ms(record)
+    return tpot is None or tpot <= slo["tpot_ms"]
+
+
+def goodput(records, duration, slo=None):
+    """
+    Requests/s and tokens/s of the requests that met the SLO, and the fraction that did.
+    TPOT is judged per request (its mean), so a run meets "p99 TPOT < X" when attainment >= 0.99.
+    """
+    slo = slo or DEFAULT_SLO
+    good = [r for r in records if meets_slo(r, slo)]
+    return {
+        "slo": slo,
+        "attainment": len(good) / len(records) if records else None,
+        "good_requests": len(good),
+        "requests_per_second": len(good) / duration if duration else None,
+        "tokens_per_second": sum(r["tokens"] for r in good) / duration if duration else None,
+    }
+
+
+def summarize(records, duration=None, slo=None):
+    """Aggregate latency and throughput statistics for a list of records."""
+    ok = [r for r in records if not r["error"] and r["ttft"] is not None]
+    ttfts = [r["ttft"] * 1000 for r in ok]
+    itls = [gap for r in ok for gap in itl_ms(r)]
+    tpots = [(r["time"] - r["ttft"]) * 1000 / (r["tokens"] - 1) for r in ok if r["tokens"] > 1]
+    total_tokens = sum(r["tokens"] for r in ok)
+
+    summary = {
+        "num_requests": len(records),
+        "num_errors": len(records) - len(ok),
+        "ttft_ms": percentiles(ttfts),
+        "itl_ms": percentiles(itls),
+        "tpot_ms": percentiles(tpots),
+        "e2e_s": percentiles([r["time"] for r in ok]),
+        "total_tokens": total_tokens,
+        "phases_ms": phase_percentiles(ok),
+    }
+    reasoning = reasoning_metrics(records)
+    if reasoning:
+        summary["reasoning"] = reasoning
+    if duration:
+        summary["duration_s"] = duration
+        summary["requests_per_second"] = len(ok) / duration
+        summary["tokens_per_second"] = total_tokens / duration
+        summary["goodput"] = goodput(records, duration, slo)
+    return summary
+
+
+def phase_metrics(records, duration, slo=None):
+    """summarize() plus the prefill and decode split: per-request and aggregate token rates."""
+    summary = summarize(records, duration, slo)
+    ok = [r for r in records if not r["error"] and r["ttft"] is not None]
+    prefill_rates = [r["prompt_tokens"] / r["ttft"] for r in ok if r.get("prompt_tokens") and r["ttft"] > 0]
+    decode_rates = [(r["tokens"] - 1) / (r["time"] - r["ttft"]) for r in ok
+                    if r["tokens"] > 1 and r["time"] > r["ttft"]]
+    prompt_tokens = sum(r.get("prompt_tokens") or 0 for r in ok)
+    return {
+        **summary,
+        "avg_prompt_tokens": prompt_tokens / len(ok) if ok else None,
+        "prefill_tok_per_s_per_request": statistics.median(prefill_rates) if prefill_rates else None,
+        "prefill_tok_per_s_aggregate": prompt_tokens / duration if duration else None,
+        "decode_tok_per_s_per_stream": statistics.median(decode_rates) if decode_rates else None,
+        "samples": {
+            "ttft_ms": [r["ttft"] * 1000 for r in ok],
+            "decode_tok_per_s": decode_rates,
+        },
+    }
+
+
+def phase_percentiles(records):
+    """Percentiles of each TTFT phase (http_phases) across records that have the breakdown."""
+    phases = {}
+    for r in records:
+        for name, value in (r.get("phases_ms") or {}).items():
+            phases.setdefault(name, []).append(value)
+    return {name: percentiles(values) for name, values in phases.items()}
+
+
+async def run_level(url, make_payload, concurrency, num_requests, warmup=0, timeout=120):
+    """
+    Closed-loop run: `concurrency` workers issue `num_requests` requests back to back.
+    `warmup` extra requests are sent concurrently first and not recorded (connection setup, cold caches).
+    """
+    records = []
+    counter = {"next": 0}
+
+    async def worker(session):
+        while counter["next"] < num_requests:
+            i = counter["next"]
+            counter["next"] += 1
+            record = await stream_chat(session, url, make_payload(i))
+            record["id"] = i
+            records.append(record)
+
+    async with new_session(timeout) as session:
+        if warmup:
+            await asyncio.gather(*(stream_chat(session, url, make_payload(i)) for i in range(warmup)))
+        start = now()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        duration = now() - start
+
+    return records, duration
+
+
+async def run_rate(url, make_payload, rate, duration, timeout=120, seed=0):
+    """
+    Open-loop run: Poisson arrivals at `rate` req/s for `duration` seconds, each sent whether or not
+    earlier requests have finished (queueing shows up as TTFT instead of slowing the client down).
+    """
+    rng = random.Random(seed)
+    tasks = []
+    async with new_session(timeout) as session:
+        start = now()
+        t, i = rng.expovariate(rate), 0
+        while t < duration:
+            await asyncio.sleep(max(0.0, start + t - now()))
+            tasks.append(asyncio.create_task(stream_chat(session, url, make_payload(i))))
+            t += rng.expovariate(rate)
+            i += 1
+        records = await asyncio.gather(*tasks)
+    for i, record in enumerate(records):
+        record["id"] = i
+    return records
+
+
+async def find_max_rate(url, make_payload, slo, target, low, high, duration, iterations=6, timeout=120, seed=0):
+    """
+    Highest arrival rate whose SLO attainment is still >= `target`: probe `low` and `high`, then
+    bisect. Assumes attainment falls as the rate rises. Returns (best rate or None, probes).
+    """
+    probes = []
+
+    async def probe(rate):
+        records = await run_rate(url, make_payload, rate, duration, timeout=timeout, seed=seed)
+        summary = summarize(records, duration, slo)
+        good = summary["goodput"]
+        ok = good["attainment"] is not None and good["attainment"] >= target
+        probes.append({"rate": rate, "ok": ok, "summary": summary})
+        print(f"  {rate:>8.2f} req/s: {'✅' if ok else '❌'} SLO met {(good['attainment'] or 0) * 100:5.1f}% | "
+              f"goodput {good['requests_per_second'] or 0:6.2f} req/s, {good['tokens_per_second'] or 0:8.1f} tok/s | "
+              f"TTFT p99 {summary['ttft_ms'].get('p99', 0):8.1f}ms")
+        return ok
+
+    if not await probe(low):
+        return None, probes
+    if await probe(high):
+        return high, probes
+    for _ in range(iterations):
+        mid = (low + high) / 2
+        if await probe(mid):
+            low = mid
+        else:
+            high = mid
+    return low, probes
+
+
+async def sweep(url, make_payload, levels, requests_per_level, warmup=0, timeout=120, slo=None, poll_metrics=False):
+    """
+    Run each concurrency level in turn, profiling the client while it runs.
+    With `poll_metrics`, the server's /metrics gauges are sampled during each level ("server_samples").
+    """
+    results = []
+    for concurrency in levels:
+        num_requests = max(requests_per_level, concurrency)
+        print(f"  Concurrency {concurrency:>5} ({num_requests} requests)...", end=" ", flush=True)
+
+        profiler = ClientProfiler().start()
+        profiler.watch_loop()
+        poller = MetricsPoller(url).start() if poll_metrics else None
+        records, duration = await run_level(url, make_payload, concurrency, num_requests,
+                                            warmup=warmup, timeout=timeout)
+        samples = await poller.stop() if poller else None
+        profiler.stop()
+
+        summary = summarize(records, duration, slo)
+        profile = profiler.to_dict([{"start_ts": r["start_ts"], "ttft": r["ttft"], "time": r["time"]}
+                                    for r in records if r["ttft"] is not None])
+        ttft = summary["ttft_ms"]
+        itl = summary["itl_ms"]
+        print(f"✅ TTFT p50 {ttft.get('p50', 0):7.2f}ms p99 {ttft.get('p99', 0):7.2f}ms | "
+              f"ITL p50 {itl.get('p50', 0):6.2f}ms p99 {itl.get('p99', 0):6.2f}ms | "
+              f"{summary.get('tokens_per_second', 0):8.1f} tok/s | "
+              f"CPU max {profile['summary'].get('max_cpu_pct', 0):.0f}%")
+        if summary["phases_ms"]:
+            print(f"      ⏱️  TTFT p50 breakdown: {format_phases(summary['phases_ms'], 'p50')}")
+        reasoning = summary.get("reasoning")
+        if reasoning:
+            print(f"      🧠 first thought p50 {reasoning['ttfr_ms']['p50']:.1f}ms | thinking p50 "
+                  f"{reasoning['thinking_ms']['p50']:.1f}ms | {reasoning['reasoning_tokens']['mean']:.0f} thinking + "
+                  f"{reasoning['answer_tokens']['mean']:.0f} answer tokens")
+        for w in profile["warnings"][:3]:
+            print(f"      ⚠️  {w}")
+
+        level = {
+            "concurrency": concurrency,
+            "summary": summary,
+            "client_profile": profile,
+            "records": [{k: v for k, v in r.items() if k != "text"} for r in records],
+        }
+        if samples is not None:
+            level["server_samples"] = samples
+        results.append(level)
+    return results
+
+
+# ---------------------------------------------------------------------- client floor
+
+
+def load_floor(path):
+    """Load a client floor file; `latest` picks the newest eval_client_floor_*.json."""
+    if path == "latest":
+        files = sorted(glob.glob(str(RESULTS_DIR / "eval_client_floor_*.json")), reverse=True)
+        if not files:
+            return None
+        path = files[0]
+    with open(path, "r") as f:
+        data = json.load(f)
+    data["path"] = path
+    return data
+
+
+def floor_at(floor, concurrency):
+    """Floor entry for the nearest calibrated concurrency level at or above `concurrency`."""
+    if not floor:
+        return None
+    levels = sorted(floor["levels"], key=lambda l: l["concurrency"])
+    for level in levels:
+        if level["concurrency"] >= concurrency:
+            return level
+    return levels[-1] if levels else None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_zero_latency_server(port):
+    """Spawn mock_server.py with every latency term set to zero."""
+    proc = subprocess.Popen(
+        [sys.executable, str(MOCK_SERVER), "--host", "127.0.0.1", "--port", str(port),
+         "--ttft-base-ms", "0", "--prefill-us-per-token", "0", "--itl-ms", "0",
+         "--max-num-seqs", "1000000", "--prefix-cache-blocks", "0"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"mock server did not start on port {port}")
+
+
+# ---------------------------------------------------------------------- CLI
+
+
+def make_prompt_payload(args, nonce=True):
+    """
+    Payload factory for `run` and `capacity`. With `nonce`, every prompt starts with a unique tag so
+    prefix caching (vLLM --enable-prefix-caching, SGLang radix cache) cannot turn TTFT into a cache
+    hit; `calibrate` against the zero-latency mock keeps the fixed prompt.
+    """
+    prompt = args.prompt
+    if args.prompt_chars and len(prompt) < args.prompt_chars:
+        prompt = (prompt + " ") * (args.prompt_chars // (len(prompt) + 1) + 1)
+        prompt = prompt[:args.prompt_chars]
+
+    def make_payload(i):
+        content = f"[{i}-{random.getrandbits(32):08x}] {prompt}" if nonce else prompt
+        return build_payload(args.model, [{"role": "user", "content": content}], args.max_tokens)
+
+    return make_payload
+
+
+def save_results(prefix, data):
+    output_file = RESULTS_DIR / f"eval_{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(data, f, indent=2)
+    print(f"\n💾 Results saved to: {output_file}")
+    return output_file
+
+
+def print_table(results, floor=None):
+    print(f"\n{'─'*80}")
+    print("RESULTS:")
+    print(f"{'─'*80}")
+    header = (f"{'Conc':>6} {'TTFT p50':>10} {'TTFT p99':>10} {'ITL p50':>9} {'ITL p99':>9} {'tok/s':>10} "
+              f"{'SLO met':>8} {'good tok/s':>11}")
+    if floor:
+        header += f" {'floor TTFT':>11} {'net TTFT':>10}"
+    print(header)
+    for level in results:
+        s = level["summary"]
+        line = (f"{level['concurrency']:>6} {s['ttft_ms'].get('p50', 0):>10.2f} {s['ttft_ms'].get('p99', 0):>10.2f} "
+                f"{s['itl_ms'].get('p50', 0):>9.2f} {s['itl_ms'].get('p99', 0):>9.2f} "
+                f"{s.get('tokens_per_second', 0):>10.1f} {(s['goodput']['attainment'] or 0) * 100:>7.1f}% "
+                f"{s['goodput']['tokens_per_second'] or 0:>11.1f}")
+        f = floor_at(floor, level["concurrency"])
+        if f:
+            floor_ttft = f["summary"]["ttft_ms"].get("p50", 0)
+            line += f" {floor_ttft:>11.2f} {s['ttft_ms'].get('p50', 0) - floor_ttft:>10.2f}"
+        print(line)
+    if results:
+        slo = results[0]["summary"]["goodput"]["slo"]
+        print(f"(all latencies in ms; SLO: TTFT <= {slo['ttft_ms']:.0f}ms, TPOT <= {slo['tpot_ms']:.0f}ms)")
+
+
+def cmd_run(args):
+    floor = load_floor(args.floor) if args.floor else None
+    url = chat_url(args.url)
+
+    print(f"\n{'='*80}")
+    print("LOAD TEST")
+    print(f"{'='*80}")
+    print(f"Endpoint:    {url}")
+    print(f"Model:       {args.model}")
+    print(f"Concurrency: {args.concurrency}")
+    if floor:
+        print(f"Client floor: {floor['path']}")
+    print(f"{'='*80}\n")
+
+    results = asyncio.run(sweep(url, make_prompt_payload(args), args.concurrency, args.requests,
+                                warmup=args.warmup, timeout=args.timeout, slo=slo_from_args(args),
+                                poll_metrics=args.trace))
+    print_table(results, floor)
+    if args.trace:
+        save_trace(args.tag, [{"name": f"concurrency {level['concurrency']}", "records": level["records"],
+                               "samples": level.get("server_samples")} for level in results],
+                   tokens=args.trace_tokens)
+
+    save_results(args.tag, {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "loadgen",
+        "endpoint": url,
+        "model": args.model,
+        "max_tokens": args.max_tokens,
+        "client_floor": floor["path"] if floor else None,
+        "levels": results,
+    })
+    print(f"{'='*80}\n")
+
+
+def cmd_calibrate(args):
+    proc = None
+    url = args.url
+    if not url:
+        port = free_port()
+        print(f"Starting zero-latency mock server on port {port}...")
+        proc = start_zero_latency_server(port)
+        url = f"http://127.0.0.1:{port}"
+    url = chat_url(url)
+
+    print(f"\n{'='*80}")
+    print("CLIENT FLOOR CALIBRATION")
+    print(f"{'='*80}")
+    print(f"Endpoint:    {url}")
+    print(f"Client:      {args.client}")
+    if args.client == "requests":
+        print("Concurrency: 1 (sequential, like the test_*_only.py evals)")
+    else:
+        print(f"Concurrency: {args.concurrency}")
+    print(f"Max tokens:  {args.max_tokens}")
+    print("Anything measured here is client + loopback overhead, not model latency.")
+    print(f"{'='*80}\n")
+
+    try:
+        if args.client == "requests":
+            records, duration = requests_floor(url, make_prompt_payload(args, nonce=False), args.requests,
+                                               warmup=args.warmup, timeout=args.timeout)
+            results = [{"concurrency": 1, "summary": summarize(records, duration)}]
+        else:
+            results = asyncio.run(sweep(url, make_prompt_payload(args, nonce=False), args.concurrency, args.requests,
+                                        warmup=args.warmup, timeout=args.timeout))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    print_table(results)
+    # Kept apart from the aiohttp floor so `run --floor latest` never picks up the requests one
+    save_results("client_floor" if args.client == "aiohttp" else "requests_floor", {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "client_floor",
+        "client": args.client,
+        "endpoint": url,
+        "host": socket.gethostname(),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "max_tokens": args.max_tokens,
+        "levels": [{k: v for k, v in level.items() if k != "records"} for level in results],
+    })
+    print(f"{'='*80}\n")
+
+
+def cmd_capacity(args):
+    url = chat_url(args.url)
+    slo = slo_from_args(args)
+
+    print(f"\n{'='*80}")
+    print("MAX SUSTAINABLE RATE")
+    print(f"{'='*80}")
+    print(f"Endpoint:    {url}")
+    print(f"Model:       {args.model}")
+    print(f"SLO:         TTFT <= {slo['ttft_ms']:.0f}ms, TPOT <= {slo['tpot_ms']:.0f}ms, "
+          f"met by >= {args.target * 100:.0f}% of requests")
+    print(f"Search:      {args.min_rate}-{args.max_rate} req/s, {args.duration}s per probe")
+    print(f"{'='*80}\n")
+
+    best, probes = asyncio.run(find_max_rate(url, make_prompt_payload(args), slo, args.target, args.min_rate,
+                                             args.max_rate, args.duration, iterations=args.iterations,
+                                             timeout=args.timeout, seed=args.seed))
+    print(f"\n{'─'*80}")
+    if best is None:
+        print(f"❌ Even {args.min_rate} req/s misses the SLO target")
+    else:
+        at_best = max((p for p in probes if p["ok"]), key=lambda p: p["rate"])["summary"]["goodput"]
+        print(f"🏆 Max sustainable rate: {best:.2f} req/s "
+              f"(goodput {at_best['requests_per_second']:.2f} req/s, {at_best['tokens_per_second']:.1f} tok/s)")
+
+    save_results(args.tag, {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "capacity",
+        "endpoint": url,
+        "model": args.model,
+        "max_tokens": args.max_tokens,
+        "slo": slo,
+        "target_attainment": args.target,
+        "max_sustainable_rate": best,
+        "probes": [{"rate": p["rate"], "ok": p["ok"], "summary": p["summary"]} for p in probes],
+    })
+    print(f"{'='*80}\n")
+
+
+def parse_levels(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def add_slo_args(p):
+    p.add_argument("--slo-ttft-ms", type=float, default=DEFAULT_SLO["ttft_ms"], help="Goodput SLO: max TTFT (ms)")
+    p.add_argument("--slo-tpot-ms", type=float, default=DEFAULT_SLO["tpot_ms"], help="Goodput SLO: max mean TPOT (ms)")
+
+
+def slo_from_args(args):
+    return {"ttft_ms": args.slo_ttft_ms, "tpot_ms": args.slo_tpot_ms}
+
+
+def add_common_args(p):
+    p.add_argument("--model", default="Qwen3-235B-A22B-Instruct-FP8", help="Model name")
+    p.add_argument("--concurrency", type=parse_levels, default=[1, 8, 32, 128], help="Comma-separated levels")
+    p.add_argument("--requests", type=int, default=64, help="Requests per level (at least one per worker)")
+    p.add_argument("--max-tokens", type=int, default=128, help="Tokens to generate per request")
+    p.add_argument("--prompt", default=DEFAULT_PROMPT, help="User prompt")
+    p.add_argument("--prompt-chars", type=int, default=0, help="Pad the prompt to this many characters")
+    p.add_argument("--warmup", type=int, default=0, help="Unrecorded warmup requests per level")
+    p.add_argument("--timeout", type=int, default=120, help="Per-request timeout (s)")
+    add_slo_args(p)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Concurrent streaming load generator")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Sweep concurrency against a server")
+    run.add_argument("--url", default="http://localhost:8083", help="Server base URL")
+    run.add_argument("--floor", help="Client floor JSON from `calibrate` (or `latest`)")
+    run.add_argument("--tag", default="loadgen", help="Output file prefix (eval_<tag>_*.json)")
+    add_trace_args(run)
+    add_common_args(run)
+    run.set_defaults(func=cmd_run)
+
+    cal = sub.add_parser("calibrate", help="Measure the client's own TTFT/ITL floor")
+    cal.add_argument("--url", help="Zero-latency endpoint (default: spawn mock_server.py)")
+    cal.add_argument("--client", choices=["aiohttp", "requests"], default="aiohttp",
+                     help="aiohttp: this load generator; requests: the synchronous test_*_only.py evals")
+    add_common_args(cal)
+    cal.set_defaults(func=cmd_calibrate)
+
+    cap = sub.add_parser("capacity", help="Find the highest arrival rate that still meets the SLO")
+    cap.add_argument("--url", default="http://localhost:8083", help="Server base URL")
+    cap.add_argument("--tag", default="capacity", help="Output file prefix (eval_<tag>_*.json)")
+    cap.add_argument("--target", type=float, default=0.9, help="Required SLO attainment (0-1)")
+    cap.add_argument("--min-rate", type=float, default=0.5, help="Lowest arrival rate to probe (req/s)")
+    cap.add_argument("--max-rate", type=float, default=32.0, help="Highest arrival rate to probe (req/s)")
+    cap.add_argument("--duration", type=float, default=60.0, help="Seconds of arrivals per probe")
+    cap.add_argument("--iterations", type=int, default=6, help="Bisection steps between the bounds")
+    cap.add_argument("--seed", type=int, default=0, help="Arrival process seed")
+    add_common_args(cap)
+    cap.set_defaults(func=cmd_capacity)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
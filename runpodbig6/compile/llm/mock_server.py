@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+Deterministic mock OpenAI-compatible server for developing the benchmark tooling without a GPU.
+
+Serves /v1/models, /v1/chat/completions (streaming and non-streaming), /v1/embeddings,
+/v1/audio/speech (streamed 24kHz s16le PCM), /metrics (vLLM-style Prometheus names) and
+/health with a simple latency model:
+
+    TTFT = queue wait + ttft_base + uncached_prompt_tokens * prefill_per_token
+    ITL  = itl (+ seeded jitter) (+ one prefill chunk while another request prefills)
+
+Prompt tokens are estimated at ~4 chars per token; each image part counts as --image-tokens.
+Requests with tools stream a tool call (delta.tool_calls) for the first or named tool, and
+response_format json_schema/json_object streams matching JSON; both decode at
+--structured-itl-factor x the plain ITL. Plain answers run to max_tokens (finish_reason
+"length") unless --answer-tokens lets them end earlier with "stop" (ignore_eos always runs to
+max_tokens). --reasoning-tokens makes it behave like a thinking model, streaming
+delta.reasoning_content before the answer.
+Prefix caching is modelled with chained block hashes in an LRU, so repeated prefixes get cheap.
+--max-num-batched-tokens models chunked prefill interference: while any prompt is prefilling,
+every decode step also pays for one chunk of up to that many of its tokens.
+Runs on a single asyncio loop and can hold thousands of concurrent streams, which makes it
+useful for measuring the load generator's own ceiling (use --ttft-base-ms 0 --itl-ms 0).
+
+Usage: python mock_server.py [--port 8090] [--itl-ms 20] [--max-num-seqs 128]
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import struct
+import time
+import uuid
+from collections import OrderedDict
+
+from aiohttp import web
+
+WORDS = (
+    "the model server token cache prefill decode batch latency stream request vision "
+    "quantum attention layer expert router kernel memory queue prompt answer image "
+    "throughput context window scheduler block tensor parallel gpu node result"
+).split()
+
+
+AUDIO_SAMPLE_RATE = 24000  # Higgs Audio PCM: 24kHz mono s16le
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 chars per token for English text)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def stable_seed(*parts):
+    """Seed derived from content, stable across processes (unlike hash())."""
+    digest = hashlib.sha256("\x00".join(str(p) for p in parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+def sample_json(schema, rng, depth=0):
+    """A value matching a (simple) JSON schema: objects, arrays, enums and scalar types."""
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    kind = schema.get("type", "string")
+    if kind == "object":
+        properties = schema.get("properties") or ({} if depth else {"result": {"type": "string"}})
+        return {k: sample_json(v, rng, depth + 1) for k, v in properties.items()}
+    if kind == "array":
+        return [sample_json(schema.get("items") or {}, rng, depth + 1) for _ in range(rng.randint(1, 3))]
+    if kind == "integer":
+        return rng.randint(0, 100)
+    if kind == "number":
+        return round(rng.uniform(0, 100), 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+
+
+def split_pieces(text, size=4):
+    """Split generated text into ~token-sized pieces (~4 chars each)."""
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+class PrefixCache:
+    """LRU of chained block hashes, approximating vLLM/SGLang prefix caching."""
+
+    def __init__(self, capacity_blocks, block_chars):
+        self.capacity = capacity_blocks
+        self.block_chars = block_chars
+        self.blocks = OrderedDict()
+        self.queries = 0
+        self.hits = 0
+
+    def lookup_and_insert(self, text):
+        """Return the number of leading characters already cached, then cache the whole prompt."""
+        if self.capacity <= 0:
+            return 0
+        cached_chars = 0
+        prefix_hit = True
+        h = hashlib.sha256()
+        for i in range(0, len(text) - self.block_chars + 1, self.block_chars):
+            h.update(text[i:i + self.block_chars].encode("utf-8"))
+            key = h.digest()
+            self.queries += 1
+            if prefix_hit and key in self.blocks:
+                self.blocks.move_to_end(key)
+                self.hits += 1
+                cached_chars += self.block_chars
+            else:
+                prefix_hit = False
+                self.blocks[key] = True
+                if len(self.blocks) > self.capacity:
+                    self.blocks.popitem(last=False)
+        return cached_chars
+
+
+class MockServer:
+    """Holds the latency model, counters and aiohttp handlers."""
+
+    def __init__(self, args):
+        self.args = args
+        self.model = args.served_model_name
+        self.cache = PrefixCache(args.prefix_cache_blocks, args.block_chars)
+        self.slots = asyncio.Semaphore(args.max_num_seqs)
+        self.running = 0
+        self.waiting = 0
+        self.prefill_chunks = {}
+        self.counters = {
+            "prompt_tokens": 0,
+            "generation_tokens": 0,
+            "requests_success": 0,
+            "requests_aborted": 0,
+            "embedding_inputs": 0,
+        }
+
+    # ------------------------------------------------------------------ model
+
+    def prompt_text(self, messages):
+        """Flatten chat messages to text and count image parts."""
+        parts = []
+        images = 0
+        for m in messages:
+            content = m.get("content") or ""
+            if isinstance(content, list):
+                for item in content:
+                    if item.get("type") == "text":
+                        parts.append(item.get("text", ""))
+                    elif item.get("type") in ("image_url", "video_url", "input_audio"):
+                        images += 1
+                        url = (item.get(item["type"]) or {}).get("url", "")
+                        parts.append(hashlib.sha256(url.encode("utf-8")).hexdigest())
+            else:
+                parts.append(str(content))
+            parts.append(f"<|{m.get('role', 'user')}|>")
+        return "\n".join(parts), images
+
+    def prefill_delay(self, text, images):
+        """Seconds of simulated prefill and the resulting prompt/cached token counts."""
+        prompt_tokens = estimate_tokens(text) + images * self.args.image_tokens
+        cached_tokens = min(prompt_tokens, self.cache.lookup_and_insert(text) // 4)
+        uncached = prompt_tokens - cached_tokens
+        delay = (self.args.ttft_base_ms + uncached * self.args.prefill_us_per_token / 1000) / 1000
+        return delay, prompt_tokens, cached_tokens
+
+    def itl(self, rng):
+        if self.args.itl_jitter_ms > 0:
+            itl = max(0.0, self.args.itl_ms + rng.uniform(-1, 1) * self.args.itl_jitter_ms) / 1000
+        else:
+            itl = self.args.itl_ms / 1000
+        # Decode steps are batched with the largest prefill chunk currently in flight
+        return itl + max(self.prefill_chunks.values(), default=0.0)
+
+    def chunk_seconds(self, uncached_tokens):
+        """Cost of one chunked prefill step, or 0 when prefill does not interfere with decode."""
+        if self.args.max_num_batched_tokens <= 0:
+            return 0.0
+        return min(uncached_tokens, self.args.max_num_batched_tokens) * self.args.prefill_us_per_token / 1e6
+
+    async def acquire(self):
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+
+    def release(self):
+        self.running -= 1
+        self.slots.release()
+
+    # ------------------------------------------------------------------ handlers
+
+    async def handle_models(self, request):
+        return web.json_response({
+            "object": "list",
+            "data": [{"id": self.model, "object": "model", "created": int(time.time()), "owned_by": "mock"}],
+        })
+
+    async def handle_health(self, request):
+        return web.Response(text="OK")
+
+    def plan_completion(self, body, rng, max_tokens):
+        """
+        Pieces to stream (one per token) and how to deliver them: plain words, JSON content for
+        response_format, or tool-call arguments when tools are offered.
+        """
+        tools = body.get("tools") or []
+        tool_choice = body.get("tool_choice", "auto")
+        if tools and tool_choice != "none":
+            tool = tools[0]["function"]
+            if isinstance(tool_choice, dict):
+                name = tool_choice.get("function", {}).get("name")
+                tool = next((t["function"] for t in tools if t["function"]["name"] == name), tool)
+            arguments = json.dumps(sample_json(tool.get("parameters") or {"type": "object"}, rng))
+            return split_pieces(arguments), "tool", tool["name"]
+
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            schema = (response_format.get("json_schema") or {}).get("schema") or {"type": "object"}
+            return split_pieces(json.dumps(sample_json(schema, rng))), "json", None
+        if response_format.get("type") == "json_object":
+            return split_pieces(json.dumps({"answer": " ".join(rng.choice(WORDS) for _ in range(8))})), "json", None
+
+        length = max_tokens
+        if self.args.answer_tokens and not body.get("ignore_eos"):
+            length = min(max_tokens, self.args.answer_tokens)
+        return [rng.choice(WORDS) + " " for _ in range(length)], "text", None
+
+    async def handle_chat(self, request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        max_tokens = body.get("max_tokens") or body.get("max_completion_tokens") or self.args.default_max_tokens
+        stream = body.get("stream", False)
+        include_usage = stream and (body.get("stream_options") or {}).get("include_usage", False)
+
+        text, images = self.prompt_text(messages)
+        rng = random.Random(stable_seed(self.args.seed, text))
+        request_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        pieces, kind, tool_name = self.plan_completion(body, rng, max_tokens)
+        thinking = (body.get("chat_template_kwargs") or {}).get("enable_thinking", True)
+        reasoning = [rng.choice(WORDS) + " " for _ in range(self.args.reasoning_tokens if thinking else 0)]
+        finish_reason = {"text": "length" if len(pieces) >= max_tokens else "stop",
+                         "json": "stop", "tool": "tool_calls"}[kind]
+        # Guided decoding and tool parsing cost a little extra per token
+        itl_factor = 1.0 if kind == "text" else self.args.structured_itl_factor
+        tool_call_id = f"call_{uuid.uuid4().hex[:24]}"
+
+        await self.acquire()
+        try:
+            delay, prompt_tokens, cached_tokens = self.prefill_delay(text, images)
+            if delay > 0:
+                self.prefill_chunks[request_id] = self.chunk_seconds(prompt_tokens - cached_tokens)
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    self.prefill_chunks.pop(request_id, None)
+            self.counters["prompt_tokens"] += prompt_tokens
+            completion_tokens = len(reasoning) + len(pieces)
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            }
+            if reasoning:
+                usage["completion_tokens_details"] = {"reasoning_tokens": len(reasoning)}
+
+            if not stream:
+                self.counters["generation_tokens"] += completion_tokens
+                gen_delay = (sum(self.itl(rng) for _ in range(len(reasoning)))
+                             + sum(self.itl(rng) for _ in range(max(0, len(pieces) - 1))) * itl_factor)
+                if gen_delay > 0:
+                    await asyncio.sleep(gen_delay)
+                if kind == "tool":
+                    message = {"role": "assistant", "content": None, "tool_calls": [{
+                        "id": tool_call_id,
+                        "type": "function",
+                        "function": {"name": tool_name, "arguments": "".join(pieces)},
+                    }]}
+                else:
+                    message = {"role": "assistant", "content": "".join(pieces)}
+                if reasoning:
+                    message["reasoning_content"] = "".join(reasoning)
+                self.counters["requests_success"] += 1
+                return web.json_response({
+                    "id": request_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": self.model,
+                    "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                    "usage": usage,
+                })
+
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+            await response.prepare(request)
+
+            def chunk(delta, finish_reason=None):
+                return ("data: " + json.dumps({
+                    "id": request_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": self.model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }, separators=(",", ":")) + "\n\n").encode("utf-8")
+
+            def delta_for(i, piece):
+                if kind != "tool":
+                    return {"content": piece}
+                call = {"index": 0, "function": {"arguments": piece}}
+                if i == 0:
+                    call.update({"id": tool_call_id, "type": "function"})
+                    call["function"]["name"] = tool_name
+                return {"tool_calls": [call]}
+
+            try:
+                await response.write(chunk({"role": "assistant", "content": ""}))
+                for i, piece in enumerate(reasoning):
+                    if i > 0:
+                        delay = self.itl(rng)
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    await response.write(chunk({"reasoning_content": piece}))
+                    self.counters["generation_tokens"] += 1
+                for i, piece in enumerate(pieces):
+                    if i > 0 or reasoning:
+                        delay = self.itl(rng) * itl_factor
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    await response.write(chunk(delta_for(i, piece)))
+                    self.counters["generation_tokens"] += 1
+                await response.write(chunk({}, finish_reason))
+                if include_usage:
+                    await response.write(("data: " + json.dumps({
+                        "id": request_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": self.model,
+                        "choices": [],
+                        "usage": usage,
+                    }, separators=(",", ":")) + "\n\n").encode("utf-8"))
+                await response.write(b"data: [DONE]\n\n")
+                await response.write_eof()
+            except (ConnectionResetError, asyncio.CancelledError):
+                self.counters["requests_aborted"] += 1
+                raise
+            self.counters["requests_success"] += 1
+            return response
+        finally:
+            self.release()
+
+    async def handle_embeddings(self, request):
+        body = await request.json()
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        encoding_format = body.get("encoding_format", "float")
+        dim = body.get("dimensions") or self.args.embedding_dim
+
+        await self.acquire()
+        try:
+            prompt_tokens = sum(estimate_tokens(t) for t in inputs)
+            delay = (self.args.embed_base_ms + prompt_tokens * self.args.embed_us_per_token / 1000) / 1000
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            data = []
+            for i, text in enumerate(inputs):
+                rng = random.Random(stable_seed(self.args.seed, "embed", text))
+                vec = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+                norm = sum(v * v for v in vec) ** 0.5 or 1.0
+                vec = [v / norm for v in vec]
+                if encoding_format == "base64":
+                    vec = base64.b64encode(struct.pack(f"<{dim}f", *vec)).decode("ascii")
+                data.append({"object": "embedding", "index": i, "embedding": vec})
+
+            self.counters["prompt_tokens"] += prompt_tokens
+            self.counters["embedding_inputs"] += len(inputs)
+            self.counters["requests_success"] += 1
+            return web.json_response({
+                "object": "list",
+                "model": self.model,
+                "data": data,
+                "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+            })
+        finally:
+            self.release()
+
+    async def handle_speech(self, request):
+        """Stream random 24kHz s16le PCM at --audio-rtf x real time after --ttft-base-ms."""
+        body = await request.json()
+        text = body.get("input", "")
+        audio_s = max(0.5, len(text) / self.args.audio_chars_per_second)
+        total_bytes = int(audio_s * AUDIO_SAMPLE_RATE) * 2
+        chunk_bytes = AUDIO_SAMPLE_RATE * 2 // 10  # 100ms of audio
+        rng = random.Random(stable_seed(self.args.seed, "speech", text))
+
+        await self.acquire()
+        try:
+            if self.args.ttft_base_ms > 0:
+                await asyncio.sleep(self.args.ttft_base_ms / 1000)
+            response = web.StreamResponse(headers={"Content-Type": "audio/pcm"})
+            await response.prepare(request)
+            for offset in range(0, total_bytes, chunk_bytes):
+                n = min(chunk_bytes, total_bytes - offset)
+                await response.write(rng.randbytes(n))
+                if self.args.audio_rtf > 0:
+                    await asyncio.sleep(n / 2 / AUDIO_SAMPLE_RATE / self.args.audio_rtf)
+            await response.write_eof()
+            self.counters["requests_success"] += 1
+            return response
+        except (ConnectionResetError, asyncio.CancelledError):
+            self.counters["requests_aborted"] += 1
+            raise
+        finally:
+            self.release()
+
+    async def handle_metrics(self, request):
+        label = f'{{model_name="{self.model}"}}'
+        lines = [
+            f"vllm:num_requests_running{label} {self.running}",
+            f"vllm:num_requests_waiting{label} {self.waiting}",
+            f"vllm:kv_cache_usage_perc{label} {self.running / self.args.max_num_seqs:.4f}",
+            f"vllm:prompt_tokens_total{label} {self.counters['prompt_tokens']}",
+            f"vllm:generation_tokens_total{label} {self.counters['generation_tokens']}",
+            f"vllm:prefix_cache_queries_total{label} {self.cache.queries}",
+            f"vllm:prefix_cache_hits_total{label} {self.cache.hits}",
+            f'vllm:request_success_total{{model_name="{self.model}",finished_reason="length"}} '
+            f"{self.counters['requests_success']}",
+            f'vllm:request_success_total{{model_name="{self.model}",finished_reason="abort"}} '
+            f"{self.counters['requests_aborted']}",
+        ]
+        return web.Response(text="\n".join(lines) + "\n", content_type="text/plain")
+
+    def app(self):
+        app = web.Application(client_max_size=256 * 1024 * 1024)
+        app.router.add_get("/v1/models", self.handle_models)
+        app.router.add_get("/health", self.handle_health)
+        app.router.add_get("/metrics", self.handle_metrics)
+        app.router.add_post("/v1/chat/completions", self.handle_chat)
+        app.router.add_post("/v1/embeddings", self.handle_embeddings)
+        app.router.add_post("/v1/audio/speech", self.handle_speech)
+        return app
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Deterministic mock OpenAI-compatible server")
+    parser.add_argument("--host", default="0.0.0.0", help="Bind address")
+    parser.add_argument("--port", type=int, default=8090, help="Port to listen on")
+    parser.add_argument("--served-model-name", default="mock-model", help="Model name reported by the server")
+    parser.add_argument("--ttft-base-ms", type=float, default=30.0, help="Fixed TTFT overhead per request")
+    parser.add_argument("--prefill-us-per-token", type=float, default=50.0, help="Prefill cost per uncached prompt token (µs)")
+    parser.add_argument("--itl-ms", type=float, default=20.0, help="Inter-token latency")
+    parser.add_argument("--itl-jitter-ms", type=float, default=0.0, help="Uniform ITL jitter (seeded)")
+    parser.add_argument("--max-num-seqs", type=int, default=128, help="Concurrent requests before queueing")
+    parser.add_argument("--max-num-batched-tokens", type=int, default=0,
+                        help="Prefill chunk size; while a prompt prefills each decode step also pays for one chunk "
+                             "(0: prefill never stalls decode)")
+    parser.add_argument("--prefix-cache-blocks", type=int, default=65536, help="Prefix cache capacity in blocks (0 disables)")
+    parser.add_argument("--block-chars", type=int, default=64, help="Prefix cache block size in characters (~16 tokens)")
+    parser.add_argument("--image-tokens", type=int, default=256, help="Prompt tokens charged per image part")
+    parser.add_argument("--default-max-tokens", type=int, default=256, help="Completion length when max_tokens is unset")
+    parser.add_argument("--answer-tokens", type=int, default=0,
+                        help="Natural answer length: shorter answers end with finish_reason stop (0: run to max_tokens)")
+    parser.add_argument("--embedding-dim", type=int, default=1024, help="Embedding vector size")
+    parser.add_argument("--embed-base-ms", type=float, default=5.0, help="Fixed latency per embedding request")
+    parser.add_argument("--embed-us-per-token", type=float, default=2.0, help="Embedding cost per input token (µs)")
+    parser.add_argument("--reasoning-tokens", type=int, default=0,
+                        help="Stream this many delta.reasoning_content tokens before the answer "
+                             "(skipped when chat_template_kwargs.enable_thinking is false)")
+    parser.add_argument("--structured-itl-factor", type=float, default=1.2,
+                        help="ITL multiplier for tool calls and response_format output")
+    parser.add_argument("--audio-rtf", type=float, default=4.0, help="Speech synthesis speed (audio s per wall s, 0: instant)")
+    parser.add_argument("--audio-chars-per-second", type=float, default=15.0, help="Speech length per input character")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for generated text, vectors and jitter")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+
+    print(f"\n{'='*80}")
+    print("🧪 Mock OpenAI-compatible server")
+    print(f"{'='*80}")
+    print(f"Endpoint:      http://{args.host}:{args.port}/v1")
+    print(f"Model:         {args.served_model_name}")
+    print(f"TTFT model:    {args.ttft_base_ms}ms + {args.prefill_us_per_token}µs/uncached token")
+    print(f"ITL:           {args.itl_ms}ms ± {args.itl_jitter_ms}ms")
+    print(f"Max num seqs:  {args.max_num_seqs}")
+    if args.max_num_batched_tokens:
+        print(f"Prefill chunk: {args.max_num_batched_tokens} tokens (stalls decode while prefilling)")
+    print(f"Prefix cache:  {args.prefix_cache_blocks} blocks x {args.block_chars} chars")
+    print(f"{'='*80}\n")
+
+    web.run_app(MockServer(args).app(), host=args.host, port=args.port, access_log=None, backlog=4096)
+
+
+if __name__ == "__main__":
+    main()
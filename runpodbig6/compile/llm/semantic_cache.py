@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Semantic response cache proxy between clients and the chat server (port 8083), using the
+Qwen3-Embedding server (port 8007) to match prompts by meaning rather than exact text.
+
+For each cacheable /v1/chat/completions request only the last user turn is embedded (through
+EmbeddingBatcher) and looked up in a local vector index; the system prompt and earlier turns are
+hashed into an exact-match scope together with the model and output settings, so a long shared
+system prompt cannot make different questions look alike. If the best match within the same scope
+has cosine similarity >= --threshold, the stored completion is returned (streamed as SSE when
+the client asked for a stream) and the chat model is never called. Misses are forwarded
+upstream unchanged and the completion is stored on the way back.
+
+Index: brute-force matrix-vector product (BLAS) over all entries by default; --ivf N switches
+to an inverted-file index with N k-means lists (trained once enough entries exist, searching
+--nprobe lists), and --int8 stores vectors as per-row scaled int8 to cut memory 4x.
+Eviction: least recently used once --max-entries is reached, and entries older than --ttl.
+
+Output settings in the scope are max_tokens, temperature, stop, seed, ...; only completions that
+finished with "stop" are stored.
+Requests with tools, a structured response_format, n > 1, image/audio parts, or a
+"Cache-Control: no-cache" header bypass the cache, and so does every request while the embedding
+server is down, slow (--embed-timeout) or erroring. Responses carry
+X-Semantic-Cache: hit|miss|bypass (and X-Semantic-Cache-Similarity).
+
+Usage:
+    python semantic_cache.py [--port 8084] [--upstream http://localhost:8083] [--embed-url http://localhost:8007]
+    curl localhost:8084/cache/stats
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+
+from bench_embeddings import MODEL as EMBED_MODEL
+from embed_batcher import EmbeddingBatcher
+from loadgen import chat_url
+
+# Embedding server max-model-len is 8192 tokens; keep the tail of very long questions
+MAX_PROMPT_CHARS = 30000
+
+# Request headers that describe the proxy hop rather than the request itself
+HOP_HEADERS = {"host", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+# Request fields that shape the completion: an entry only matches requests that agree on all of them
+OUTPUT_PARAMS = ["max_tokens", "max_completion_tokens", "temperature", "top_p", "top_k", "stop", "seed",
+                 "presence_penalty", "frequency_penalty", "logit_bias"]
+
+
+class VectorIndex:
+    """Fixed-capacity cosine index over unit vectors, flat or IVF, float32 or int8."""
+
+    def __init__(self, dim, capacity, nlist=0, nprobe=8, int8=False):
+        self.dim = dim
+        self.capacity = capacity
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.int8 = int8
+        if int8:
+            self.codes = np.zeros((capacity, dim), dtype=np.int8)
+            self.scales = np.zeros(capacity, dtype=np.float32)
+        else:
+            self.codes = np.zeros((capacity, dim), dtype=np.float32)
+        self.valid = np.zeros(capacity, dtype=bool)
+        self.free = list(range(capacity - 1, -1, -1))
+        self.centroids = None
+        self.assignment = np.full(capacity, -1, dtype=np.int64)
+        self.lists = []
+
+    def __len__(self):
+        return self.capacity - len(self.free)
+
+    def _vectors(self, slots):
+        if self.int8:
+            return self.codes[slots].astype(np.float32) * self.scales[slots, None]
+        return self.codes[slots]
+
+    def add(self, vector):
+        """Store a unit vector and return its slot (caller evicts first when full)."""
+        slot = self.free.pop()
+        if self.int8:
+            scale = float(np.abs(vector).max()) / 127 or 1.0
+            self.codes[slot] = np.round(vector / scale).astype(np.int8)
+            self.scales[slot] = scale
+        else:
+            self.codes[slot] = vector
+        self.valid[slot] = True
+        if self.centroids is not None:
+            self._assign(slot, vector)
+        elif self.nlist and len(self) >= self.nlist * 32:
+            self.train()
+        return slot
+
+    def remove(self, slot):
+        if not self.valid[slot]:
+            return
+        self.valid[slot] = False
+        if self.assignment[slot] >= 0:
+            self.lists[self.assignment[slot]].discard(slot)
+            self.assignment[slot] = -1
+        self.free.append(slot)
+
+    def train(self, iterations=10, seed=0):
+        """k-means the current entries into `nlist` lists."""
+        slots = np.flatnonzero(self.valid)
+        data = self._vectors(slots)
+        rng = np.random.default_rng(seed)
+        centroids = data[rng.choice(len(data), self.nlist, replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            for c in range(self.nlist):
+                members = data[labels == c]
+                if len(members):
+                    mean = members.mean(axis=0)
+                    centroids[c] = mean / (np.linalg.norm(mean) or 1.0)
+        self.centroids = centroids
+        self.lists = [set() for _ in range(self.nlist)]
+        for slot, label in zip(slots, np.argmax(data @ centroids.T, axis=1)):
+            self.assignment[slot] = label
+            self.lists[label].add(int(slot))
+
+    def _assign(self, slot, vector):
+        label = int(np.argmax(self.centroids @ vector))
+        self.assignment[slot] = label
+        self.lists[label].add(slot)
+
+    def search(self, query, k=4, allowed=None):
+        """Top-k (slot, similarity) pairs for a unit query vector, among `allowed` slots if given."""
+        if self.centroids is not None:
+            probes = np.argsort(self.centroids @ query)[::-1][:self.nprobe]
+            slots = np.fromiter((s for p in probes for s in self.lists[p]), dtype=np.int64)
+        else:
+            slots = np.flatnonzero(self.valid)
+        if allowed is not None:
+            slots = slots[np.isin(slots, allowed)]
+        if len(slots) == 0:
+            return []
+        if self.int8:
+            scores = (self.codes[slots] @ query) * self.scales[slots]
+        else:
+            scores = self.codes[slots] @ query
+        top = np.argsort(scores)[::-1][:k] if len(scores) > k else np.argsort(scores)[::-1]
+        return [(int(slots[i]), float(scores[i])) for i in top]
+
+
+class SemanticCache:
+    """Completions keyed by an exact scope plus question embedding, with LRU size and TTL eviction."""
+
+    def __init__(self, dim, max_entries=100_000, ttl=86400.0, threshold=0.95, nlist=0, nprobe=8, int8=False):
+        self.index = VectorIndex(dim, max_entries, nlist=nlist, nprobe=nprobe, int8=int8)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.entries = {}
+        self.scopes = {}  # scope -> slots, so a lookup only ranks entries it could return
+        self.last_used = np.zeros(max_entries, dtype=np.float64)
+        self.evictions = 0
+        self.expirations = 0
+
+    def lookup(self, scope, vector):
+        """(entry, similarity) of the best live match above threshold within `scope` (model, output
+        params, context hash), else (None, best similarity)."""
+        slots = self.scopes.get(scope)
+        if not slots:
+            return None, None
+        now = time.time()
+        best = None
+        for slot, score in self.index.search(vector, allowed=np.fromiter(slots, dtype=np.int64)):
+            entry = self.entries.get(slot)
+            if entry is None:
+                continue
+            if now - entry["created"] > self.ttl:
+                self._drop(slot)
+                self.expirations += 1
+                continue
+            best = score if best is None else best
+            if score >= self.threshold:
+                entry["hits"] += 1
+                self.last_used[slot] = now
+                return entry, score
+        return None, best
+
+    def insert(self, scope, vector, response, upstream_s):
+        if len(self.index) >= self.index.capacity:
+            live = np.flatnonzero(self.index.valid)
+            self._drop(int(live[np.argmin(self.last_used[live])]))
+            self.evictions += 1
+        slot = self.index.add(vector)
+        now = time.time()
+        self.entries[slot] = {"scope": scope, "response": response, "created": now, "hits": 0,
+                              "upstream_s": upstream_s}
+        self.scopes.setdefault(scope, set()).add(slot)
+        self.last_used[slot] = now
+
+    def expire(self):
+        """Drop every entry older than the TTL."""
+        cutoff = time.time() - self.ttl
+        for slot in [s for s, e in self.entries.items() if e["created"] < cutoff]:
+            self._drop(slot)
+            self.expirations += 1
+
+    def _drop(self, slot):
+        entry = self.entries.pop(slot, None)
+        if entry is not None:
+            slots = self.scopes[entry["scope"]]
+            slots.discard(slot)
+            if not slots:
+                del self.scopes[entry["scope"]]
+        self.index.remove(slot)
+
+
+def message_text(message):
+    """Text of one chat message, or None if it contains non-text parts."""
+    content = message.get("content") or ""
+    if not isinstance(content, list):
+        return content
+    parts = []
+    for item in content:
+        if item.get("type") != "text":
+            return None
+        parts.append(item.get("text", ""))
+    return "\n".join(parts)
+
+
+def split_prompt(messages):
+    """
+    (question, context hash) for the last user turn and everything around it (system prompt,
+    earlier turns), or (None, None) if there is no user turn or any message has non-text parts.
+    """
+    texts = [message_text(m) for m in messages]
+    users = [i for i, m in enumerate(messages) if m.get("role", "user") == "user"]
+    if not users or any(t is None for t in texts):
+        return None, None
+    last = users[-1]
+    context = [[m.get("role", "user"), texts[i]] for i, m in enumerate(messages) if i != last]
+    digest = hashlib.sha256(json.dumps(context, separators=(",", ":")).encode("utf-8")).hexdigest()
+    return texts[last][-MAX_PROMPT_CHARS:], digest
+
+
+def output_params(body):
+    """The request's output-shaping fields (OUTPUT_PARAMS) in a comparable form."""
+    params = {k: body[k] for k in OUTPUT_PARAMS if body.get(k) is not None}
+    if isinstance(params.get("stop"), str):
+        params["stop"] = [params["stop"]]
+    return json.dumps(params, sort_keys=True)
+
+
+def sse_chunk(request_id, created, model, delta, finish_reason=None):
+    return ("data: " + json.dumps({
+        "id": request_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }, separators=(",", ":")) + "\n\n").encode("utf-8")
+
+
+class SemanticCacheProxy:
+    def __init__(self, args):
+        self.args = args
+        self.upstream = chat_url(args.upstream)
+        self.cache = SemanticCache(args.dim, max_entries=args.max_entries, ttl=args.ttl, threshold=args.threshold,
+                                   nlist=args.ivf, nprobe=args.nprobe, int8=args.int8)
+        self.batcher = EmbeddingBatcher(args.embed_url, args.embed_model, max_batch_size=64, max_wait_ms=2.0,
+                                        timeout=args.embed_timeout)
+        self.session = None
+        self.counters = {"hits": 0, "misses": 0, "bypass": 0, "upstream_errors": 0, "embed_errors": 0,
+                         "saved_upstream_s": 0.0,
+                         "embed_ms": 0.0}
+
+    async def on_startup(self, app):
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.args.timeout))
+        await self.batcher.start()
+        app["expiry"] = asyncio.get_running_loop().create_task(self._expire_loop())
+
+    async def on_cleanup(self, app):
+        app["expiry"].cancel()
+        await self.batcher.close()
+        await self.session.close()
+
+    async def _expire_loop(self):
+        while True:
+            await asyncio.sleep(min(60.0, self.args.ttl))
+            self.cache.expire()
+
+    # ------------------------------------------------------------------ handlers
+
+    async def handle_chat(self, request):
+        raw = await request.read()
+        try:
+            body = json.loads(raw)
+        except ValueError as e:
+            return web.json_response({"error": {"message": f"invalid JSON body: {e}"}}, status=400)
+        if not isinstance(body, dict):
+            return web.json_response({"error": {"message": "request body must be a JSON object"}}, status=400)
+        text, context = None, None
+        structured = (body.get("response_format") or {}).get("type", "text") != "text"
+        if not (body.get("tools") or structured or (body.get("n") or 1) > 1
+                or "no-cache" in request.headers.get("Cache-Control", "")):
+            text, context = split_prompt(body.get("messages", []))
+        if not text:
+            self.counters["bypass"] += 1
+            return await self.forward(request, raw, body, None, "bypass")
+
+        start = time.perf_counter()
+        try:
+            vector = await self.batcher.embed(text)
+        except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError, ValueError, KeyError):
+            # The embedding server is down, slow or erroring: serve the request uncached
+            self.counters["embed_errors"] += 1
+            self.counters["bypass"] += 1
+            return await self.forward(request, raw, body, None, "bypass")
+        self.counters["embed_ms"] += (time.perf_counter() - start) * 1000
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+
+        scope = (body.get("model", ""), output_params(body), context)
+        entry, similarity = self.cache.lookup(scope, vector)
+        if entry is not None:
+            self.counters["hits"] += 1
+            self.counters["saved_upstream_s"] += entry["upstream_s"]
+            return await self.replay(request, body, entry, similarity)
+        self.counters["misses"] += 1
+        return await self.forward(request, raw, body, (scope, vector), "miss", similarity)
+
+    async def replay(self, request, body, entry, similarity):
+        headers = {"X-Semantic-Cache": "hit", "X-Semantic-Cache-Similarity": f"{similarity:.4f}"}
+        response = entry["response"]
+        request_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        if not body.get("stream"):
+            return web.json_response({**response, "id": request_id, "created": created}, headers=headers)
+
+        message = response["choices"][0]["message"]
+        model = response.get("model", body.get("model", ""))
+        stream = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+                                             **headers})
+        await stream.prepare(request)
+        await stream.write(sse_chunk(request_id, created, model, {"role": "assistant", "content": ""}))
+        await stream.write(sse_chunk(request_id, created, model, {"content": message.get("content") or ""}))
+        await stream.write(sse_chunk(request_id, created, model, {}, response["choices"][0].get("finish_reason")))
+        if (body.get("stream_options") or {}).get("include_usage") and response.get("usage"):
+            await stream.write(("data: " + json.dumps({
+                "id": request_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [], "usage": response["usage"],
+            }, separators=(",", ":")) + "\n\n").encode("utf-8"))
+        await stream.write(b"data: [DONE]\n\n")
+        await stream.write_eof()
+        return stream
+
+    async def forward(self, request, raw, body, key, status, similarity=None):
+        """Relay the request upstream; when `key` is set, store the completion it produced."""
+        headers = {"X-Semantic-Cache": status}
+        if similarity is not None:
+            headers["X-Semantic-Cache-Similarity"] = f"{similarity:.4f}"
+        start = time.perf_counter()
+        try:
+            upstream = await self.session.post(self.upstream, data=raw, headers={"Content-Type": "application/json"})
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.counters["upstream_errors"] += 1
+            return web.json_response({"error": {"message": f"upstream: {e}"}}, status=502, headers=headers)
+
+        async with upstream:
+            if upstream.status != 200 or not body.get("stream"):
+                data = await upstream.read()
+                if key and upstream.status == 200:
+                    try:
+                        self.store(key, json.loads(data), time.perf_counter() - start)
+                    except ValueError:
+                        pass
+                return web.Response(body=data, status=upstream.status, headers=headers,
+                                    content_type=upstream.content_type)
+
+            stream = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+                                                 **headers})
+            await stream.prepare(request)
+            content, finish_reason, usage, model = [], None, None, body.get("model", "")
+            async for line in upstream.content:
+                await stream.write(line)
+                if not key or not line.startswith(b"data: ") or line.startswith(b"data: [DONE]"):
+                    continue
+                try:
+                    chunk = json.loads(line[6:])
+                except json.JSONDecodeError:
+                    continue
+                model = chunk.get("model", model)
+                usage = chunk.get("usage") or usage
+                for choice in chunk.get("choices", []):
+                    content.append(choice.get("delta", {}).get("content") or "")
+                    finish_reason = choice.get("finish_reason") or finish_reason
+            await stream.write_eof()
+
+        if key:
+            self.store(key, {
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(content)},
+                             "finish_reason": finish_reason}],
+                "usage": usage,
+            }, time.perf_counter() - start)
+        return stream
+
+    def store(self, key, response, upstream_s):
+        """Cache single-choice text completions that ended naturally (truncated ones are never reused)."""
+        choices = response.get("choices") or []
+        if len(choices) != 1 or choices[0].get("finish_reason") != "stop" \
+                or choices[0].get("message", {}).get("tool_calls"):
+            return
+        scope, vector = key
+        self.cache.insert(scope, vector, response, upstream_s)
+
+    async def handle_passthrough(self, request):
+        url = self.upstream.split("/v1/")[0] + request.path_qs
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+        async with self.session.request(request.method, url, data=await request.read(),
+                                        headers=headers) as upstream:
+            return web.Response(body=await upstream.read(), status=upstream.status,
+                                content_type=upstream.content_type)
+
+    async def handle_stats(self, request):
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return web.json_response({
+            **self.counters,
+            "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+            "mean_embed_ms": self.counters["embed_ms"] / lookups if lookups else 0.0,
+            "entries": len(self.cache.index),
+            "max_entries": self.cache.index.capacity,
+            "evictions": self.cache.evictions,
+            "expirations": self.cache.expirations,
+            "index": "ivf" if self.cache.index.centroids is not None else "flat",
+            "threshold": self.cache.threshold,
+        })
+
+    def app(self):
+        app = web.Application(client_max_size=256 * 1024 * 1024)
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        app.router.add_post("/v1/chat/completions", self.handle_chat)
+        app.router.add_get("/cache/stats", self.handle_stats)
+        app.router.add_route("*", "/{tail:.*}", self.handle_passthrough)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantic response cache proxy")
+    parser.add_argument("--host", default="0.0.0.0", help="Bind address")
+    parser.add_argument("--port", type=int, default=8084, help="Port to listen on")
+    parser.add_argument("--upstream", default="http://localhost:8083", help="Chat server URL")
+    parser.add_argument("--embed-url", default="http://localhost:8007", help="Embedding server URL")
+    parser.add_argument("--embed-model", default=EMBED_MODEL, help="Embedding model name")
+    parser.add_argument("--dim", type=int, default=1024, help="Embedding vector size")
+    parser.add_argument("--threshold", type=float, default=0.95, help="Min cosine similarity for a hit")
+    parser.add_argument("--max-entries", type=int, default=100_000, help="LRU eviction above this many entries")
+    parser.add_argument("--ttl", type=float, default=86400.0, help="Entry max age (s)")
+    parser.add_argument("--ivf", type=int, default=0, help="IVF lists (0: brute force)")
+    parser.add_argument("--nprobe", type=int, default=8, help="IVF lists searched per lookup")
+    parser.add_argument("--int8", action="store_true", help="Store vectors as scaled int8")
+    parser.add_argument("--timeout", type=int, default=600, help="Upstream request timeout (s)")
+    parser.add_argument("--embed-timeout", type=float, default=5.0,
+                        help="Embedding request timeout (s); slower lookups bypass the cache")
+    args = parser.parse_args()
+
+    print(f"\n{'='*80}")
+    print("🧠 Semantic Cache Proxy")
+    print(f"{'='*80}")
+    print(f"Listening:  http://{args.host}:{args.port}/v1/chat/completions")
+    print(f"Upstream:   {args.upstream}")
+    print(f"Embeddings: {args.embed_url} ({args.embed_model})")
+    print(f"Index:      {'IVF ' + str(args.ivf) + ' lists' if args.ivf else 'flat'}"
+          f"{', int8' if args.int8 else ''}, {args.max_entries} entries, TTL {args.ttl:.0f}s")
+    print(f"Threshold:  {args.threshold}")
+    print(f"{'='*80}\n")
+    web.run_app(SemanticCacheProxy(args).app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
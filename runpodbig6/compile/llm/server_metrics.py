@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Scrape Prometheus /metrics from vLLM or SGLang servers while a benchmark runs.
+
+Normalizes the handful of gauges the benchmarks care about across both engines:
+    running   vllm:num_requests_running     | sglang:num_running_reqs
+    waiting   vllm:num_requests_waiting     | sglang:num_queue_reqs
+    kv_usage  vllm:kv_cache_usage_perc      | sglang:token_usage   (0..1)
+
+SGLang only exposes /metrics when started with --enable-metrics.
+
+Usage:
+    poller = MetricsPoller("http://localhost:8083", interval=0.5)
+    poller.start()            # inside a running event loop
+    ...
+    await poller.stop()
+    poller.samples, poller.peak("waiting")
+
+    python server_metrics.py http://localhost:8083     # print one normalized scrape
+"""
+
+import asyncio
+import re
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+# Normalized name -> engine metric names, first match wins
+GAUGES = {
+    "running": ["vllm:num_requests_running", "sglang:num_running_reqs"],
+    "waiting": ["vllm:num_requests_waiting", "sglang:num_queue_reqs"],
+    "kv_usage": ["vllm:kv_cache_usage_perc", "vllm:gpu_cache_usage_perc", "sglang:token_usage"],
+}
+
+_SAMPLE_RE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s+([-+0-9.eEinfNa]+)")
+
+
+def parse_prometheus(text):
+    """Sum every sample of each metric across label sets: {name: value}."""
+    values = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = _SAMPLE_RE.match(line)
+        if not match:
+            continue
+        try:
+            value = float(match.group(3))
+        except ValueError:
+            continue
+        values[match.group(1)] = values.get(match.group(1), 0.0) + value
+    return values
+
+
+def normalize(raw):
+    """Pick the engine-independent gauges out of a parsed scrape."""
+    out = {}
+    for key, names in GAUGES.items():
+        for name in names:
+            if name in raw:
+                out[key] = raw[name]
+                break
+    return out
+
+
+def base_url(url):
+    """Strip /v1/... from an endpoint so /metrics can be appended."""
+    return url.split("/v1")[0].rstrip("/")
+
+
+async def scrape(session, url):
+    """One normalized scrape of `url`/metrics, plus the raw values."""
+    async with session.get(f"{base_url(url)}/metrics") as response:
+        if response.status != 200:
+            return None
+        raw = parse_prometheus(await response.text())
+    return {**normalize(raw), "raw": raw}
+
+
+def gpu_memory_used_mb(gpu_index=None):
+    """Used GPU memory per device from nvidia-smi (empty list if unavailable)."""
+    cmd = ["nvidia-smi", "--query-gpu=memory.used", "--format=csv,noheader,nounits"]
+    if gpu_index is not None:
+        cmd.append(f"--id={gpu_index}")
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, timeout=5).stdout
+        return [float(v) for v in out.split()]
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return []
+
+
+class MetricsPoller:
+    """Background task that scrapes /metrics at a fixed interval."""
+
+    def __init__(self, url, interval=0.5, keep_raw=False):
+        self.url = url
+        self.interval = interval
+        self.keep_raw = keep_raw
+        self.samples = []
+        self.errors = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        return self.samples
+
+    async def _run(self):
+        timeout = aiohttp.ClientTimeout(total=max(1.0, self.interval * 4))
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while True:
+                started = time.time()
+                try:
+                    sample = await scrape(session, self.url)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    sample = None
+                if sample is None:
+                    self.errors += 1
+                else:
+                    if not self.keep_raw:
+                        sample.pop("raw", None)
+                    sample["t"] = started
+                    self.samples.append(sample)
+                await asyncio.sleep(max(0.0, self.interval - (time.time() - started)))
+
+    def series(self, key):
+        """[(t, value)] for one normalized gauge."""
+        return [(s["t"], s[key]) for s in self.samples if key in s]
+
+    def peak(self, key):
+        values = [v for _, v in self.series(key)]
+        return max(values) if values else None
+
+    def mean(self, key):
+        values = [v for _, v in self.series(key)]
+        return sum(values) / len(values) if values else None
+
+
+async def _print_once(url):
+    async with aiohttp.ClientSession() as session:
+        sample = await scrape(session, url)
+    if sample is None:
+        print(f"❌ No /metrics at {base_url(url)}")
+        return 1
+    for key in GAUGES:
+        print(f"{key:<10} {sample.get(key, 'n/a')}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(asyncio.run(_print_once(sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8083")))
@@ -7,6 +7,8 @@ import sys
 import json
 from datetime import datetime
 
+from http_phases import TimedBody, format_phases, phases_ms
+
 # Three different ~1500 token system prompts for each request
 # Each prompt shares 50% common prefix, then 50% unique content
 SYSTEM_PROMPTS = [
@@ -117,6 +119,10 @@ MODEL = "Qwen3-235B-A22B-Instruct-FP8"
 MAX_TOKENS = 256
 NUM_REQUESTS = 3
 
+# Goodput SLO: a request counts as "good" if its first answer token and mean time per output token are within these
+SLO_TTFT = 2.0      # seconds
+SLO_TPOT_MS = 80.0  # milliseconds
+
 # Short user queries - different for each request
 USER_QUERIES = [
     "Summarize quantum entanglement in 10-15 words.",
@@ -152,15 +158,27 @@ try:
             ],
             "max_tokens": MAX_TOKENS,
             "temperature": 0.7,
-            "stream": True
+            "stream": True,
+            "stream_options": {"include_usage": True}
         }
         
+        # Send a pre-serialized body that timestamps its own upload, so TTFT can be split into
+        # connect / upload / server / first chunk / first token (see http_phases.py)
+        body = TimedBody(json.dumps(payload_stream).encode("utf-8"))
         start_time = time.time()
+        first_chunk_time = None
         first_token_time = None
+        first_reasoning_time = None
         full_response = ""
+        full_reasoning = ""
+        answer_chunks = 0
+        reasoning_chunks = 0
         tokens_generated = 0
+        reasoning_tokens = None
         
-        response = requests.post(URL, json=payload_stream, stream=True, timeout=120)
+        response = requests.post(URL, data=body, headers={"Content-Type": "application/json"},
+                                 stream=True, timeout=120)
+        headers_time = time.time()
         
         if response.status_code != 200:
             print(f"❌ Error: HTTP {response.status_code}")
@@ -168,6 +186,8 @@ try:
             sys.exit(1)
         
         # Stream response to measure TTFT
+        # Reasoning models (Qwen3 thinking, GLM-4.6) stream their thoughts in delta.reasoning_content
+        # (newer vLLM: delta.reasoning) before the answer in delta.content; time both separately
         for line in response.iter_lines():
             if line:
                 line = line.decode('utf-8')
@@ -175,48 +195,91 @@ try:
                     data = line[6:]
                     if data == '[DONE]':
                         break
+                    if first_chunk_time is None:
+                        first_chunk_time = time.time()
                     try:
                         chunk = json.loads(data)
-                        if first_token_time is None and 'choices' in chunk and len(chunk['choices']) > 0:
-                            choice = chunk['choices'][0]
-                            delta = choice.get('delta') if choice else None
-                            if delta and delta.get('content') and len(delta.get('content', '').strip()) > 0:
-                                first_token_time = time.time()
-                        
                         if 'choices' in chunk and len(chunk['choices']) > 0:
                             choice = chunk['choices'][0]
                             delta = choice.get('delta') if choice else None
                             if delta:
+                                reasoning = delta.get('reasoning_content') or delta.get('reasoning') or ''
+                                if reasoning:
+                                    if first_reasoning_time is None and reasoning.strip():
+                                        first_reasoning_time = time.time()
+                                    full_reasoning += reasoning
+                                    reasoning_chunks += 1
+                                
                                 content = delta.get('content', '')
                                 if content:
+                                    if first_token_time is None and content.strip():
+                                        first_token_time = time.time()
                                     full_response += content
+                                    answer_chunks += 1
                         
                         if 'usage' in chunk and chunk['usage']:
                             tokens_generated = chunk['usage'].get('completion_tokens', 0)
+                            details = chunk['usage'].get('completion_tokens_details') or {}
+                            reasoning_tokens = details.get('reasoning_tokens', reasoning_tokens)
                     except (json.JSONDecodeError, AttributeError, KeyError, TypeError) as e:
                         pass
         
         end_time = time.time()
         total_time = end_time - start_time
         ttft = (first_token_time - start_time) if first_token_time else 0
+        ttfr = (first_reasoning_time - start_time) if first_reasoning_time else None
+        marks = dict(body.marks(start_time), response_headers=headers_time - start_time)
+        phases = phases_ms(marks,
+                           first_chunk_time - start_time if first_chunk_time else None,
+                           ttft if first_token_time else None)
         
         # If tokens_generated is 0, estimate from response length
         # Rough approximation: ~4 chars per token for English text
-        if tokens_generated == 0 and full_response:
-            tokens_generated = max(1, len(full_response) // 4)
+        if tokens_generated == 0 and (full_response or full_reasoning):
+            tokens_generated = max(1, len(full_response + full_reasoning) // 4)
+        
+        # Split the completion between thinking and answer: server-reported reasoning tokens if
+        # available, otherwise in proportion to streamed chunks (one token per chunk when streaming)
+        if reasoning_tokens is None:
+            total_chunks = reasoning_chunks + answer_chunks
+            reasoning_tokens = round(tokens_generated * reasoning_chunks / total_chunks) if total_chunks else 0
+        answer_tokens = tokens_generated - reasoning_tokens
+        
+        # Thinking runs from the first thought to the first answer token; answering from there to the end
+        thinking_time = (first_token_time or end_time) - first_reasoning_time if first_reasoning_time else 0
+        answer_time = end_time - first_token_time if first_token_time else 0
         
         tokens_per_second = tokens_generated / total_time if total_time > 0 else 0
         
+        # Time per output token after the first streamed token (thought or answer)
+        first_output_time = min(t for t in (first_reasoning_time, first_token_time, end_time) if t is not None)
+        tpot_ms = (end_time - first_output_time) * 1000 / (tokens_generated - 1) if tokens_generated > 1 else 0
+        met_slo = first_token_time is not None and ttft <= SLO_TTFT and tpot_ms <= SLO_TPOT_MS
+        
         results.append({
             "time": total_time,
             "ttft": ttft,
+            "ttfr": ttfr,
             "tokens": tokens_generated,
             "tps": tokens_per_second,
+            "tpot_ms": tpot_ms,
+            "met_slo": met_slo,
+            "phases_ms": phases,
+            "reasoning_tokens": reasoning_tokens,
+            "answer_tokens": answer_tokens,
+            "thinking_time": thinking_time,
+            "reasoning_tps": reasoning_tokens / thinking_time if thinking_time > 0 else 0,
+            "answer_tps": answer_tokens / answer_time if answer_time > 0 else 0,
             "response": full_response,
+            "reasoning": full_reasoning,
             "query": user_query
         })
         
-        print(f"✅ {total_time:.2f}s | TTFT: {ttft:.3f}s | {tokens_per_second:.2f} tok/s")
+        if ttfr is not None:
+            print(f"✅ {total_time:.2f}s | first thought: {ttfr:.3f}s | first answer: {ttft:.3f}s | "
+                  f"{reasoning_tokens} thinking + {answer_tokens} answer tokens | {tokens_per_second:.2f} tok/s")
+        else:
+            print(f"✅ {total_time:.2f}s | TTFT: {ttft:.3f}s | {tokens_per_second:.2f} tok/s")
     
     # Show detailed results
     print(f"\n{'─'*80}")
@@ -225,6 +288,10 @@ try:
     for i, r in enumerate(results, 1):
         label = "🥶 COLD START" if i == 1 else "🔥 WARM"
         print(f"{i}. {label:12} | Time: {r['time']:6.2f}s | TTFT: {r['ttft']:6.3f}s | Tokens/s: {r['tps']:6.2f} | Tokens: {r['tokens']}")
+        if r['ttfr'] is not None:
+            print(f"   Thinking: first thought {r['ttfr']:.3f}s | {r['reasoning_tokens']} tokens in {r['thinking_time']:.2f}s "
+                  f"({r['reasoning_tps']:.2f} tok/s) | answer {r['answer_tokens']} tokens ({r['answer_tps']:.2f} tok/s)")
+        print(f"   TTFT breakdown: {format_phases(r['phases_ms'])}")
         print(f"   Query: {r['query']}")
         print(f"   Response: {r['response']}")
     
@@ -241,6 +308,37 @@ try:
     avg_ttft_all = sum(r['ttft'] for r in results) / len(results)
     avg_ttft_warm = sum(r['ttft'] for r in results[1:]) / len(results[1:])
     
+    # Where the warm TTFT goes: average of each client-observed phase
+    phase_names = {name for r in results[1:] for name in r['phases_ms']}
+    avg_phases_warm = {name: sum(r['phases_ms'][name] for r in results[1:] if name in r['phases_ms'])
+                             / sum(1 for r in results[1:] if name in r['phases_ms'])
+                       for name in sorted(phase_names)}
+    
+    # Goodput: requests and tokens per second that met the SLO (requests run back to back,
+    # so the wall time is the sum of request times)
+    warm = results[1:]
+    warm_time = sum(r['time'] for r in warm)
+    goodput_stats = {
+        "slo": {"ttft_ms": SLO_TTFT * 1000, "tpot_ms": SLO_TPOT_MS},
+        "attainment": sum(1 for r in warm if r['met_slo']) / len(warm),
+        "requests_per_second": sum(1 for r in warm if r['met_slo']) / warm_time if warm_time > 0 else 0,
+        "tokens_per_second": sum(r['tokens'] for r in warm if r['met_slo']) / warm_time if warm_time > 0 else 0,
+    }
+    
+    # Thinking-mode cost (only when the model streamed reasoning_content)
+    thinking = [r for r in results[1:] if r['ttfr'] is not None]
+    reasoning_stats = None
+    if thinking:
+        reasoning_stats = {
+            "avg_ttfr": sum(r['ttfr'] for r in thinking) / len(thinking),
+            "avg_ttft": sum(r['ttft'] for r in thinking) / len(thinking),
+            "avg_thinking_time": sum(r['thinking_time'] for r in thinking) / len(thinking),
+            "avg_reasoning_tokens": sum(r['reasoning_tokens'] for r in thinking) / len(thinking),
+            "avg_answer_tokens": sum(r['answer_tokens'] for r in thinking) / len(thinking),
+            "avg_reasoning_tps": sum(r['reasoning_tps'] for r in thinking) / len(thinking),
+            "avg_answer_tps": sum(r['answer_tps'] for r in thinking) / len(thinking),
+        }
+    
     print(f"  All requests (including cold start):")
     print(f"    Average time:     {avg_time_all:.2f}s")
     print(f"    Average TTFT:     {avg_ttft_all:.3f}s")
@@ -248,7 +346,16 @@ try:
     print(f"\n  Warm requests only (excluding cold start):")
     print(f"    Average time:     {avg_time_warm:.2f}s")
     print(f"    Average TTFT:     {avg_ttft_warm:.3f}s")
+    print(f"      breakdown:      {format_phases(avg_phases_warm)}")
     print(f"    Average tokens/s: {avg_tps_warm:.2f}")
+    print(f"    Goodput:          {goodput_stats['tokens_per_second']:.2f} tokens/s "
+          f"({goodput_stats['attainment'] * 100:.0f}% met TTFT <= {SLO_TTFT}s, TPOT <= {SLO_TPOT_MS:.0f}ms)")
+    if reasoning_stats:
+        print(f"\n  Thinking mode (warm requests):")
+        print(f"    First thought:    {reasoning_stats['avg_ttfr']:.3f}s")
+        print(f"    First answer:     {reasoning_stats['avg_ttft']:.3f}s ({reasoning_stats['avg_thinking_time']:.2f}s thinking)")
+        print(f"    Thinking tokens:  {reasoning_stats['avg_reasoning_tokens']:.0f} at {reasoning_stats['avg_reasoning_tps']:.2f} tok/s")
+        print(f"    Answer tokens:    {reasoning_stats['avg_answer_tokens']:.0f} at {reasoning_stats['avg_answer_tps']:.2f} tok/s")
     
     # Show sample response
     print(f"\n{'─'*80}")
@@ -275,8 +382,11 @@ try:
             "warm_requests": {
                 "avg_time": avg_time_warm,
                 "avg_ttft": avg_ttft_warm,
-                "avg_tokens_per_second": avg_tps_warm
-            }
+                "avg_tokens_per_second": avg_tps_warm,
+                "avg_phases_ms": avg_phases_warm
+            },
+            "goodput": goodput_stats,
+            "reasoning": reasoning_stats
         }
     }
     
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Export benchmark runs as a Chrome trace / Perfetto timeline.
+
+Every request becomes a "request" span with nested phase spans:
+
+    connect | upload | wait (headers) | queue + prefill | first token | decode
+
+(the client-side phases of http_phases; records without HTTP marks get a single "wait" span up to
+the first token). Requests are packed into lanes: a lane is reused as soon as its previous request
+has finished, so the number of rows is the peak concurrency and thousands of requests fit on one
+timeline. Optional per-token instant events mark every streamed chunk, and counter tracks show the
+client's in-flight requests plus scraped server gauges (running/waiting requests, KV cache usage)
+from MetricsPoller samples. Each run (concurrency level, control/cancel, ...) is its own process.
+
+Open the file in https://ui.perfetto.dev or chrome://tracing.
+
+Usage:
+    from trace_export import save_trace
+    save_trace("loadgen", [{"name": "concurrency 32", "records": records, "samples": poller.samples}])
+
+    python trace_export.py eval_loadgen_20250101_120000.json [--tokens]    # convert saved records
+"""
+
+import argparse
+import heapq
+import json
+from datetime import datetime
+from pathlib import Path
+
+from http_phases import PHASES
+
+RESULTS_DIR = Path(__file__).resolve().parent
+
+SPAN_NAMES = {
+    "connect": "connect",
+    "upload": "upload",
+    "wait_headers": "wait (headers)",
+    "wait_first_chunk": "queue + prefill",
+    "first_token": "first token",
+}
+
+# Server gauges grouped into counter tracks that share a scale
+COUNTERS = {
+    "server requests": ["running", "waiting"],
+    "KV cache usage": ["kv_usage"],
+}
+
+
+def _us(t, t0):
+    return round((t - t0) * 1e6, 1)
+
+
+def assign_lanes(records):
+    """Lane index per record (same order), reusing a lane once its previous request has ended."""
+    lanes = [0] * len(records)
+    free, busy = [], []  # free lane ids, (end, lane) of running requests
+    order = sorted(range(len(records)), key=lambda i: records[i]["start_ts"])
+    for i in order:
+        r = records[i]
+        while busy and busy[0][0] <= r["start_ts"]:
+            heapq.heappush(free, heapq.heappop(busy)[1])
+        lane = heapq.heappop(free) if free else len(busy)
+        lanes[i] = lane
+        heapq.heappush(busy, (r["start_ts"] + (r["time"] or 0.0), lane))
+    return lanes
+
+
+def first_output(record):
+    starts = [t for t in (record.get("first_reasoning"), record.get("ttft"), record.get("first_tool_call"))
+              if t is not None]
+    return min(starts) if starts else None
+
+
+def phase_spans(record):
+    """[(name, start, end)] in seconds since the request start, back to back up to the end of the request."""
+    marks = dict(record.get("http") or {}, start=0.0, first_chunk=record.get("first_chunk"),
+                 first_token=record.get("ttft"))
+    spans = []
+    if marks.get("upload_start") is not None:
+        for name, a, b in PHASES:
+            if marks.get(a) is not None and marks.get(b) is not None:
+                spans.append((SPAN_NAMES[name], marks[a], marks[b]))
+    first = first_output(record)
+    if not spans and first is not None:
+        spans.append(("wait", 0.0, first))
+    if first is not None and record["time"] is not None:
+        spans.append(("decode", spans[-1][2] if spans else first, record["time"]))
+    return spans
+
+
+def request_args(record):
+    """Scalar record fields (id, tokens, errors, benchmark tags like tenant or turn) for the span details."""
+    args = {k: v for k, v in record.items()
+            if k not in ("start_ts", "text", "reasoning_text") and (v is None or isinstance(v, (str, int, float, bool)))}
+    for key in ("phases_ms", "http"):
+        if record.get(key):
+            args[key] = record[key]
+    return args
+
+
+def run_events(run, pid, t0, tokens=False):
+    """Trace events for one run: {"name", "records", optional "samples" (MetricsPoller)}."""
+    records = [r for r in run["records"] if r.get("start_ts") is not None]
+    events = [{"ph": "M", "name": "process_name", "pid": pid, "args": {"name": run["name"]}},
+              {"ph": "M", "name": "process_sort_index", "pid": pid, "args": {"sort_index": pid}}]
+    lanes = assign_lanes(records)
+    for lane in range(max(lanes, default=-1) + 1):
+        events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": lane + 1,
+                       "args": {"name": f"lane {lane + 1:04d}"}})
+
+    for r, lane in zip(records, lanes):
+        tid = lane + 1
+        start = r["start_ts"]
+        span = {"ph": "X", "name": "request", "cat": "request", "pid": pid, "tid": tid,
+                "ts": _us(start, t0), "dur": round((r["time"] or 0.0) * 1e6, 1), "args": request_args(r)}
+        if r.get("error"):
+            span.update(name="request (error)", cname="terrible")
+        elif r.get("aborted"):
+            span.update(name="request (aborted)", cname="bad")
+        events.append(span)
+        for name, a, b in phase_spans(r):
+            events.append({"ph": "X", "name": name, "cat": "phase", "pid": pid, "tid": tid,
+                           "ts": _us(start + a, t0), "dur": round(max(0.0, b - a) * 1e6, 1)})
+        if tokens:
+            for key, name in [("reasoning_ts", "thought"), ("chunk_ts", "token"), ("tool_call_ts", "tool call")]:
+                for t in r.get(key) or []:
+                    events.append({"ph": "i", "s": "t", "name": name, "cat": "token", "pid": pid, "tid": tid,
+                                   "ts": _us(start + t, t0)})
+
+    # Client-side concurrency: +1 at each request start, -1 at its end
+    edges = sorted([(r["start_ts"], 1) for r in records] +
+                   [(r["start_ts"] + (r["time"] or 0.0), -1) for r in records])
+    in_flight = 0
+    for t, step in edges:
+        in_flight += step
+        events.append({"ph": "C", "name": "client in-flight", "pid": pid, "ts": _us(t, t0),
+                       "args": {"requests": in_flight}})
+
+    for s in run.get("samples") or []:
+        for track, keys in COUNTERS.items():
+            values = {k: s[k] for k in keys if k in s}
+            if values:
+                events.append({"ph": "C", "name": track, "pid": pid, "ts": _us(s["t"], t0), "args": values})
+    return events
+
+
+def build_trace(runs, tokens=False):
+    """Chrome trace JSON object for a list of runs, on a shared clock starting at the first request."""
+    starts = [r["start_ts"] for run in runs for r in run["records"] if r.get("start_ts") is not None]
+    starts += [s["t"] for run in runs for s in run.get("samples") or []]
+    t0 = min(starts, default=0.0)
+    events = []
+    for pid, run in enumerate(runs, 1):
+        events.extend(run_events(run, pid, t0, tokens))
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {"start": datetime.fromtimestamp(t0).isoformat() if t0 else None},
+    }
+
+
+def save_trace(prefix, runs, tokens=False):
+    output_file = RESULTS_DIR / f"trace_{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    trace = build_trace(runs, tokens)
+    with open(output_file, "w") as f:
+        json.dump(trace, f, separators=(",", ":"))
+    print(f"🧭 Trace saved to: {output_file} ({len(trace['traceEvents'])} events; "
+          f"open in https://ui.perfetto.dev or chrome://tracing)")
+    return output_file
+
+
+def add_trace_args(p):
+    p.add_argument("--trace", action="store_true", help="Also save a Chrome/Perfetto timeline (trace_*.json)")
+    p.add_argument("--trace-tokens", action="store_true", help="Add an instant event per streamed token to the trace")
+
+
+def runs_from_results(data):
+    """Runs with per-request records from a saved eval_*.json (loadgen levels, or top-level records)."""
+    if data.get("levels"):
+        return [{"name": f"concurrency {level['concurrency']}", "records": level["records"]}
+                for level in data["levels"] if level.get("records")]
+    if data.get("records"):
+        return [{"name": data.get("test_type", "run"), "records": data["records"]}]
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert saved benchmark records to a Chrome/Perfetto trace")
+    parser.add_argument("results", help="eval_*.json with per-request records (e.g. loadgen run, bench_multiturn)")
+    parser.add_argument("--tokens", action="store_true", help="Add an instant event per streamed token")
+    parser.add_argument("-o", "--output", help="Output file (default: trace_<results name>.json next to it)")
+    args = parser.parse_args()
+
+    with open(args.results, "r") as f:
+        runs = runs_from_results(json.load(f))
+    if not runs:
+        print(f"❌ No per-request records in {args.results}")
+        return 1
+
+    output = Path(args.output) if args.output else Path(args.results).with_name(
+        "trace_" + Path(args.results).name.removeprefix("eval_"))
+    trace = build_trace(runs, args.tokens)
+    with open(output, "w") as f:
+        json.dump(trace, f, separators=(",", ":"))
+    print(f"🧭 {sum(len(r['records']) for r in runs)} requests in {len(runs)} run(s) -> {output} "
+          f"({len(trace['traceEvents'])} events)")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
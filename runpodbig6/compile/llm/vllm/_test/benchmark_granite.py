@@ -1,101 +1,122 @@
 #!/usr/bin/env python3
-"""Benchmark Granite 4.0 H Micro for real token/s performance"""
+"""
+Benchmark Granite 4.0 H Micro for real token/s performance.
 
-import requests
+Streams every request so prefill (time to first token) and decode (tokens/s after the first
+token, inter-token latency) are measured separately instead of folding prompt processing,
+queueing and network time into one completion_tokens / elapsed number. Each prompt starts with a
+unique nonce so prefix caching cannot hide the prefill cost.
+
+Usage: python benchmark_granite.py [--lengths 50,100,200] [--concurrency 1,8,32] [--requests 8]
+"""
+
+import argparse
+import asyncio
 import json
-import time
+import sys
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from loadgen import add_slo_args, build_payload, chat_url, phase_metrics, run_level, slo_from_args
 
+RESULTS_DIR = Path(__file__).resolve().parent
 ENDPOINT = "http://localhost:8080/v1"
+PROMPT = "Write a detailed explanation of how neural networks work. Include multiple paragraphs."
 
-def benchmark(num_tokens=100):
-    """Benchmark with longer generation to see sustained speed"""
-    
-    print(f"🚀 Benchmarking Granite 4.0 H Micro")
-    print(f"📊 Generating {num_tokens} tokens...\n")
-    
-    payload = {
-        "model": "granite-micro",
-        "messages": [
-            {"role": "user", "content": "Write a detailed explanation of how neural networks work. Include multiple paragraphs."}
-        ],
-        "max_tokens": num_tokens,
-        "temperature": 0.7
-    }
-    
-    try:
-        start = time.time()
-        response = requests.post(
-            f"{ENDPOINT}/chat/completions",
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=60
-        )
-        elapsed = time.time() - start
-        
-        result = response.json()
-        
-        if "choices" in result and len(result["choices"]) > 0:
-            content = result["choices"][0]["message"]["content"]
-            usage = result.get("usage", {})
-            
-            prompt_tokens = usage.get("prompt_tokens", 0)
-            completion_tokens = usage.get("completion_tokens", 0)
-            total_tokens = usage.get("total_tokens", 0)
-            
-            print(f"✅ Generation complete!")
-            print(f"\n📝 Response preview:")
-            print(f"{content[:200]}...\n")
-            
-            print(f"📊 Stats:")
-            print(f"  Prompt tokens: {prompt_tokens}")
-            print(f"  Completion tokens: {completion_tokens}")
-            print(f"  Total tokens: {total_tokens}")
-            print(f"  Time: {elapsed:.2f}s")
-            print(f"\n🚀 Speed: {completion_tokens/elapsed:.1f} tokens/sec")
-            
-            # Calculate time per token
-            time_per_token = (elapsed / completion_tokens) * 1000 if completion_tokens > 0 else 0
-            print(f"⏱️  Time per token: {time_per_token:.1f}ms")
-            
-            return completion_tokens / elapsed
-        else:
-            print(f"❌ Error: {result}")
-            return 0
-            
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        return 0
 
-if __name__ == "__main__":
+async def benchmark(args, num_tokens, concurrency):
+    """One output length at one concurrency level."""
+    def make_payload(i):
+        # Unique per request so prefix caching cannot turn the prefill column into a cache hit
+        prompt = f"[{uuid.uuid4().hex[:12]}] {PROMPT}"
+        return build_payload(args.model, [{"role": "user", "content": prompt}], num_tokens, ignore_eos=True)
+
+    num_requests = max(args.requests, concurrency * 2)
+    records, duration = await run_level(chat_url(args.url), make_payload, concurrency, num_requests,
+                                        warmup=1, timeout=args.timeout)
+    metrics = phase_metrics(records, duration, slo_from_args(args))
+    metrics.pop("samples")
+    metrics["max_tokens"] = num_tokens
+    metrics["concurrency"] = concurrency
+    metrics["preview"] = next((r["text"][:200] for r in records if not r["error"]), "")
+    metrics["first_error"] = next((r["error"] for r in records if r["error"]), None)
+    return metrics
+
+
+async def run(args):
+    results = []
+    for concurrency in args.concurrency:
+        for num_tokens in args.lengths:
+            print(f"Test: {num_tokens} tokens @ concurrency {concurrency}")
+            print("-" * 60)
+            m = await benchmark(args, num_tokens, concurrency)
+            results.append(m)
+            if m["num_errors"] == m["num_requests"]:
+                print(f"❌ Error: {m['first_error']}\n")
+                continue
+            if m is results[0]:
+                print(f"📝 Response preview:\n{m['preview']}...\n")
+            print(f"📊 Stats ({m['num_requests'] - m['num_errors']}/{m['num_requests']} ok):")
+            print(f"  Prompt tokens:  {m['avg_prompt_tokens'] or 0:.0f}")
+            print(f"  Prefill (TTFT): p50 {m['ttft_ms']['p50']:.1f}ms | p99 {m['ttft_ms']['p99']:.1f}ms")
+            print(f"  ITL:            p50 {m['itl_ms'].get('p50', 0):.2f}ms | p99 {m['itl_ms'].get('p99', 0):.2f}ms")
+            print(f"  Decode speed:   {m['decode_tok_per_s_per_stream'] or 0:.1f} tokens/sec per stream")
+            print(f"  Aggregate:      {m['tokens_per_second']:.1f} tokens/sec across {concurrency} streams")
+            print(f"  Goodput:        {m['goodput']['tokens_per_second'] or 0:.1f} tokens/sec within SLO "
+                  f"({(m['goodput']['attainment'] or 0) * 100:.0f}% of requests)\n")
+    return results
+
+
+def parse_levels(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Granite streaming prefill/decode benchmark")
+    parser.add_argument("--url", default=ENDPOINT, help="Server URL")
+    parser.add_argument("--model", default="granite-micro", help="Served model name")
+    parser.add_argument("--lengths", type=parse_levels, default=[50, 100, 200], help="Output lengths (ignore_eos)")
+    parser.add_argument("--concurrency", type=parse_levels, default=[1], help="Concurrency levels, e.g. 1,8,32")
+    parser.add_argument("--requests", type=int, default=8, help="Requests per test (at least 2x concurrency)")
+    parser.add_argument("--timeout", type=int, default=120, help="Per-request timeout (s)")
+    add_slo_args(parser)
+    args = parser.parse_args()
+
     print("=" * 60)
-    print("Testing sustained generation speed...")
+    print("🚀 Benchmarking Granite 4.0 H Micro (streaming)")
+    print(f"Endpoint: {args.url} ({args.model})")
     print("=" * 60)
     print()
-    
-    speeds = []
-    
-    # Test 1: 50 tokens
-    print("Test 1: 50 tokens")
-    print("-" * 60)
-    speed = benchmark(50)
-    speeds.append(speed)
-    print()
-    
-    # Test 2: 100 tokens  
-    print("Test 2: 100 tokens")
-    print("-" * 60)
-    speed = benchmark(100)
-    speeds.append(speed)
-    print()
-    
-    # Test 3: 200 tokens
-    print("Test 3: 200 tokens")
-    print("-" * 60)
-    speed = benchmark(200)
-    speeds.append(speed)
-    print()
-    
+
+    results = asyncio.run(run(args))
+
     print("=" * 60)
-    print(f"Average speed: {sum(speeds)/len(speeds):.1f} tokens/sec")
+    for concurrency in args.concurrency:
+        ok = [r for r in results if r["concurrency"] == concurrency and r["decode_tok_per_s_per_stream"]]
+        if not ok:
+            continue
+        decode = sum(r["decode_tok_per_s_per_stream"] for r in ok) / len(ok)
+        total = sum(r["tokens_per_second"] for r in ok) / len(ok)
+        ttft = sum(r["ttft_ms"]["p50"] for r in ok) / len(ok)
+        print(f"Concurrency {concurrency:>3}: average decode {decode:.1f} tokens/sec per stream | "
+              f"{total:.1f} tokens/sec aggregate | prefill {ttft:.1f}ms")
     print("=" * 60)
 
+    output_data = {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "granite_benchmark",
+        "endpoint": args.url,
+        "model": args.model,
+        "prompt": PROMPT,
+        "results": results,
+    }
+    output_file = RESULTS_DIR / f"eval_granite_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(output_data, f, indent=2)
+    print(f"💾 Results saved to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,121 +1,220 @@
 #!/usr/bin/env python3
-"""Compare Granite 4.0 Micro versions: Hybrid Mamba2 vs Pure Transformer"""
+"""
+Compare Granite 4.0 Micro versions: Hybrid Mamba2 vs Pure Transformer.
 
-import requests
+Runs a context length x concurrency matrix against both servers and reports prefill
+(TTFT, prompt tok/s) and decode (ITL, per-stream and aggregate tok/s) separately. Every prompt
+starts with a unique nonce so prefix caching cannot hide prefill cost, decode length is fixed
+with ignore_eos, and the two endpoints run back to back per cell (they share GPU 4, so never
+at the same time). A version is only called faster in a cell when the bootstrap 95% interval
+of the median ratio excludes 1.0.
+
+Usage: python compare_granite_versions.py [--contexts 512,2048,6000] [--concurrency 1,8,32] [--requests 32]
+"""
+
+import argparse
+import asyncio
 import json
-import time
-
-HYBRID_ENDPOINT = "http://localhost:8080/v1"  # H-Micro (Mamba2)
-DENSE_ENDPOINT = "http://localhost:8081/v1"   # Micro Dense (Transformer)
-
-def test_speed(endpoint, model_name, version_name):
-    """Test generation speed for a specific endpoint"""
-    
-    print(f"\n{'='*70}")
-    print(f"Testing {version_name}")
-    print(f"Endpoint: {endpoint}")
-    print(f"{'='*70}\n")
-    
-    payload = {
-        "model": model_name,
-        "messages": [
-            {"role": "user", "content": "Write a detailed explanation of quantum computing. Include multiple paragraphs with technical details."}
-        ],
-        "max_tokens": 150,
-        "temperature": 0.7
-    }
-    
+import random
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import aiohttp
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from loadgen import add_slo_args, build_payload, chat_url, phase_metrics, run_level, slo_from_args
+
+RESULTS_DIR = Path(__file__).resolve().parent
+
+ENDPOINTS = [
+    {"name": "hybrid", "label": "H-Micro (4 Attention + 36 Mamba2)", "url": "http://localhost:8080/v1",
+     "model": "granite-micro", "script": "./run_granite_micro.sh"},
+    {"name": "dense", "label": "Micro Dense (40 Attention Layers)", "url": "http://localhost:8081/v1",
+     "model": "granite-micro-dense", "script": "./run_granite_micro_dense.sh"},
+]
+
+FILLER = (
+    "Quantum computers store information in qubits that can hold a superposition of states. "
+    "Entanglement links qubits so that measuring one constrains the others, and interference "
+    "lets algorithms amplify correct answers while cancelling wrong ones. Error correction "
+    "spreads one logical qubit across many physical qubits to survive noise. "
+)
+QUESTION = "\n\nSummarize the text above in detail."
+
+
+def make_prompt(context_tokens, nonce):
+    """~context_tokens tokens (~4 chars each) of filler, led by a nonce that defeats prefix caching."""
+    head = f"[{nonce}] "
+    body = (FILLER * (context_tokens * 4 // len(FILLER) + 1))[:max(0, context_tokens * 4 - len(head))]
+    return head + body + QUESTION
+
+
+async def server_alive(endpoint):
     try:
-        # Check if server is alive
-        try:
-            models_resp = requests.get(f"{endpoint}/models", timeout=5)
-            if models_resp.status_code != 200:
-                print(f"❌ Server not responding on {endpoint}")
-                return None
-        except:
-            print(f"❌ Cannot connect to {endpoint}")
-            print(f"   Make sure the server is running!")
-            return None
-        
-        # Run speed test
-        start = time.time()
-        response = requests.post(
-            f"{endpoint}/chat/completions",
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=60
-        )
-        elapsed = time.time() - start
-        
-        result = response.json()
-        
-        if "choices" in result and len(result["choices"]) > 0:
-            content = result["choices"][0]["message"]["content"]
-            usage = result.get("usage", {})
-            
-            prompt_tokens = usage.get("prompt_tokens", 0)
-            completion_tokens = usage.get("completion_tokens", 0)
-            
-            print(f"✅ Generation complete!")
-            print(f"\n📝 Response preview:")
-            print(f"{content[:150]}...\n")
-            
-            print(f"📊 Performance:")
-            print(f"  Total time: {elapsed:.2f}s")
-            print(f"  Completion tokens: {completion_tokens}")
-            print(f"  Speed: {completion_tokens/elapsed:.1f} tokens/sec")
-            print(f"  Time per token: {(elapsed/completion_tokens)*1000:.1f}ms")
-            
-            return {
-                "version": version_name,
-                "time": elapsed,
-                "tokens": completion_tokens,
-                "speed": completion_tokens / elapsed
-            }
-        else:
-            print(f"❌ Error: {result}")
-            return None
-            
-    except Exception as e:
-        print(f"❌ Error: {e}")
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+            async with session.get(f"{endpoint['url']}/models") as response:
+                return response.status == 200
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return False
+
+
+def median(values):
+    if not values:
         return None
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    return ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+
+def bootstrap_ratio(a, b, iterations=2000, seed=0):
+    """Median(a) / median(b) with a bootstrap 95% interval, or None if either side is empty."""
+    if not a or not b:
+        return None
+    rng = random.Random(seed)
+    ratios = []
+    for _ in range(iterations):
+        ma = median([rng.choice(a) for _ in a])
+        mb = median([rng.choice(b) for _ in b])
+        if mb:
+            ratios.append(ma / mb)
+    ratios.sort()
+    return {
+        "ratio": median(a) / median(b) if median(b) else None,
+        "ci_low": ratios[int(0.025 * len(ratios))],
+        "ci_high": ratios[int(0.975 * len(ratios)) - 1],
+    }
+
+
+def verdict(comparison, lower_is_better):
+    """'hybrid', 'dense' or 'tie' for a hybrid/dense ratio and its interval."""
+    if comparison is None:
+        return "n/a"
+    if comparison["ci_high"] < 1.0:
+        return "hybrid" if lower_is_better else "dense"
+    if comparison["ci_low"] > 1.0:
+        return "dense" if lower_is_better else "hybrid"
+    return "tie"
+
+
+async def run_matrix(args, endpoints):
+    cells = []
+    for context in args.contexts:
+        for concurrency in args.concurrency:
+            num_requests = max(args.requests, concurrency * 4)
+            cell = {"context_tokens": context, "concurrency": concurrency, "num_requests": num_requests}
+            for endpoint in endpoints:
+                def make_payload(i, model=endpoint["model"], context=context):
+                    prompt = make_prompt(context, f"{context}-{concurrency}-{i}-{random.getrandbits(32):08x}")
+                    return build_payload(model, [{"role": "user", "content": prompt}], args.max_tokens,
+                                         temperature=0.0, ignore_eos=True)
+
+                print(f"  ctx {context:>6} conc {concurrency:>3} {endpoint['name']:<7}...", end=" ", flush=True)
+                records, duration = await run_level(chat_url(endpoint["url"]), make_payload, concurrency,
+                                                    num_requests, warmup=min(concurrency, 4), timeout=args.timeout)
+                metrics = phase_metrics(records, duration, slo_from_args(args))
+                cell[endpoint["name"]] = metrics
+                if metrics["num_errors"] == metrics["num_requests"]:
+                    error = next((r["error"] for r in records if r["error"]), "no tokens")
+                    print(f"❌ {error}")
+                    continue
+                print(f"✅ TTFT p50 {metrics['ttft_ms']['p50']:8.1f}ms | "
+                      f"prefill {metrics['prefill_tok_per_s_aggregate'] or 0:8.0f} tok/s | "
+                      f"ITL p50 {metrics['itl_ms'].get('p50', 0):6.2f}ms | "
+                      f"decode {metrics['decode_tok_per_s_per_stream'] or 0:6.1f} tok/s/stream, "
+                      f"{metrics['tokens_per_second']:7.1f} tok/s total, "
+                      f"{metrics['goodput']['tokens_per_second'] or 0:7.1f} within SLO")
+
+            if all(e["name"] in cell for e in ENDPOINTS):
+                h, d = cell["hybrid"]["samples"], cell["dense"]["samples"]
+                cell["comparison"] = {
+                    "ttft": bootstrap_ratio(h["ttft_ms"], d["ttft_ms"]),
+                    "decode": bootstrap_ratio(h["decode_tok_per_s"], d["decode_tok_per_s"]),
+                }
+                cell["comparison"]["ttft_winner"] = verdict(cell["comparison"]["ttft"], lower_is_better=True)
+                cell["comparison"]["decode_winner"] = verdict(cell["comparison"]["decode"], lower_is_better=False)
+            cells.append(cell)
+    return cells
+
+
+def print_matrix(cells):
+    print(f"\n{'─'*80}")
+    print("HYBRID / DENSE (median ratio, 95% CI)")
+    print(f"{'─'*80}")
+    print(f"{'ctx':>6} {'conc':>5} {'TTFT ratio':>24} {'faster prefill':>15} {'decode ratio':>24} {'faster decode':>14}")
+    for cell in cells:
+        comparison = cell.get("comparison")
+        if not comparison:
+            continue
+
+        def fmt(c):
+            return f"{c['ratio']:.2f} [{c['ci_low']:.2f}, {c['ci_high']:.2f}]" if c and c["ratio"] else "n/a"
+
+        print(f"{cell['context_tokens']:>6} {cell['concurrency']:>5} {fmt(comparison['ttft']):>24} "
+              f"{comparison['ttft_winner']:>15} {fmt(comparison['decode']):>24} {comparison['decode_winner']:>14}")
+
+
+def parse_levels(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Granite hybrid vs dense: context x concurrency matrix")
+    parser.add_argument("--contexts", type=parse_levels, default=[512, 2048, 6000],
+                        help="Prompt lengths in tokens (dense server: --max-model-len 8192)")
+    parser.add_argument("--concurrency", type=parse_levels, default=[1, 8, 32], help="Concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per cell and endpoint (at least 4x concurrency)")
+    parser.add_argument("--max-tokens", type=int, default=128, help="Decode length (ignore_eos)")
+    parser.add_argument("--hybrid-url", default=ENDPOINTS[0]["url"], help="H-Micro server")
+    parser.add_argument("--dense-url", default=ENDPOINTS[1]["url"], help="Micro Dense server")
+    parser.add_argument("--timeout", type=int, default=600, help="Per-request timeout (s)")
+    add_slo_args(parser)
+    args = parser.parse_args()
+    ENDPOINTS[0]["url"], ENDPOINTS[1]["url"] = args.hybrid_url, args.dense_url
 
-if __name__ == "__main__":
     print("\n" + "="*70)
     print("GRANITE 4.0 MICRO VERSION COMPARISON")
     print("="*70)
-    
-    results = []
-    
-    # Test Hybrid Mamba2 version (H-Micro)
-    result = test_speed(HYBRID_ENDPOINT, "granite-micro", "H-Micro (4 Attention + 36 Mamba2)")
-    if result:
-        results.append(result)
-    
-    # Test Pure Transformer version (Dense)
-    result = test_speed(DENSE_ENDPOINT, "granite-micro-dense", "Micro Dense (40 Attention Layers)")
-    if result:
-        results.append(result)
-    
-    # Summary
-    if len(results) >= 2:
-        print("\n" + "="*70)
-        print("COMPARISON SUMMARY")
-        print("="*70)
-        
-        for r in results:
-            print(f"\n{r['version']}:")
-            print(f"  Speed: {r['speed']:.1f} tok/s")
-            print(f"  Time: {r['time']:.2f}s")
-        
-        speedup = results[1]['speed'] / results[0]['speed']
-        print(f"\n🚀 Speedup: {speedup:.2f}x faster with pure transformer!")
-        print("="*70)
-    elif len(results) == 1:
-        print(f"\n⚠️  Only tested one version. Start both servers to compare!")
-    else:
+
+    endpoints = []
+    for endpoint in ENDPOINTS:
+        if asyncio.run(server_alive(endpoint)):
+            print(f"✅ {endpoint['label']}: {endpoint['url']}")
+            endpoints.append(endpoint)
+        else:
+            print(f"❌ {endpoint['label']}: not responding at {endpoint['url']} (start with {endpoint['script']})")
+    if not endpoints:
         print(f"\n❌ No servers running. Start at least one server to test!")
-        print(f"\nTo start servers:")
-        print(f"  H-Micro (Mamba2):    ./run_granite_micro.sh")
-        print(f"  Micro Dense (Trans): ./run_granite_micro_dense.sh")
+        return 1
+    print(f"Contexts:    {args.contexts} tokens")
+    print(f"Concurrency: {args.concurrency}")
+    print(f"Decode:      {args.max_tokens} tokens per request")
+    print("="*70 + "\n")
+
+    cells = asyncio.run(run_matrix(args, endpoints))
+    if len(endpoints) == 2:
+        print_matrix(cells)
+    else:
+        print(f"\n⚠️  Only tested one version. Start both servers to compare!")
 
+    for cell in cells:
+        for endpoint in endpoints:
+            cell.get(endpoint["name"], {}).pop("samples", None)
+    output_data = {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "granite_hybrid_vs_dense",
+        "endpoints": endpoints,
+        "max_tokens": args.max_tokens,
+        "cells": cells,
+    }
+    output_file = RESULTS_DIR / f"eval_granite_matrix_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(output_data, f, indent=2)
+
+    print(f"\n💾 Results saved to: {output_file}")
+    print("="*70)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Streaming TTS benchmark for the Higgs Audio v2 server (run_vllm_higgs_audio.sh).
+
+Streams /v1/audio/speech with response_format=pcm (24kHz mono s16le) and derives everything
+from byte counts and arrival times, no ffmpeg needed:
+    TTFAB      time to first audio byte
+    RTF        audio seconds / wall seconds (> 1 is faster than real time)
+    underrun   how long a player that starts at the first byte would stall waiting for audio
+Sweeps input text length x concurrency.
+
+Usage:
+    python bench_higgs_audio.py [--url http://localhost:8007] [--text-words 10,50,200] [--concurrency 1,4,8]
+    python bench_higgs_audio.py --save-samples samples/     # keep one .wav per cell for listening
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import wave
+from datetime import datetime
+from pathlib import Path
+
+import aiohttp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from loadgen import new_session, now, percentiles
+
+RESULTS_DIR = Path(__file__).resolve().parent
+MODEL = "higgs-audio-v2-generation-3B-base"
+SAMPLE_RATE = 24000
+BYTES_PER_SECOND = SAMPLE_RATE * 2  # mono s16le
+
+PASSAGE = (
+    "Today is a wonderful day to build something people love. The morning light spills across the "
+    "workshop bench, where half finished prototypes wait beside cold cups of coffee. Every design "
+    "starts as a rough sketch and a question nobody has answered yet. We test it, break it, and try "
+    "again, learning a little more each time about what actually matters to the people who will use "
+    "it. Some ideas survive the first week, most do not, and that is exactly how it should be. By "
+    "evening the room is quieter, the whiteboard is covered in arrows and crossed out words, and "
+    "there is one small thing that works better than it did this morning."
+).split()
+
+
+def make_text(words, offset=0):
+    """`words` words of natural prose, rotated by `offset` so requests differ."""
+    return " ".join(PASSAGE[(offset + i) % len(PASSAGE)] for i in range(words))
+
+
+def underrun(arrivals, first_byte):
+    """Total stall (s) for a player starting at the first byte: [(t, cumulative_bytes)]."""
+    stall = 0.0
+    for t, received_before in arrivals:
+        # Audio received before this chunk runs out at first_byte + its duration + earlier stalls
+        deadline = first_byte + stall + received_before / BYTES_PER_SECOND
+        if t > deadline:
+            stall += t - deadline
+    return stall
+
+
+async def synthesize(session, url, body, sample_path=None):
+    start = now()
+    record = {"start_ts": start, "ttfab": None, "time": None, "bytes": 0, "audio_s": 0.0, "rtf": None,
+              "underrun_s": None, "error": None}
+    arrivals = []
+    pcm = bytearray() if sample_path else None
+    try:
+        async with session.post(url, data=body, headers={"Content-Type": "application/json"}) as response:
+            if response.status != 200:
+                record["error"] = f"HTTP {response.status}: {(await response.text())[:200]}"
+                return record
+            async for chunk in response.content.iter_any():
+                if not chunk:
+                    continue
+                t = now()
+                if record["ttfab"] is None:
+                    record["ttfab"] = t - start
+                arrivals.append((t, record["bytes"]))
+                record["bytes"] += len(chunk)
+                if pcm is not None:
+                    pcm.extend(chunk)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        record["error"] = str(e) or type(e).__name__
+        return record
+
+    record["time"] = now() - start
+    if not record["bytes"]:
+        record["error"] = "empty audio"
+        return record
+    record["audio_s"] = record["bytes"] / BYTES_PER_SECOND
+    record["rtf"] = record["audio_s"] / record["time"]
+    record["underrun_s"] = underrun(arrivals, start + record["ttfab"])
+    if sample_path:
+        with wave.open(str(sample_path), "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(SAMPLE_RATE)
+            f.writeframes(bytes(pcm[:len(pcm) // 2 * 2]))
+    return record
+
+
+async def run_cell(args, url, words, concurrency):
+    num_requests = max(args.requests, concurrency * 2)
+    bodies = [json.dumps({"model": args.model, "voice": args.voice, "input": make_text(words, offset=i * 7),
+                          "response_format": "pcm"}).encode("utf-8") for i in range(num_requests)]
+    sample_path = None
+    if args.save_samples:
+        Path(args.save_samples).mkdir(parents=True, exist_ok=True)
+        sample_path = Path(args.save_samples) / f"higgs_{words}w_c{concurrency}.wav"
+
+    records = []
+    pending = list(range(num_requests))
+
+    async def worker(session):
+        while pending:
+            i = pending.pop()
+            records.append(await synthesize(session, url, bodies[i], sample_path if i == 0 else None))
+
+    async with new_session(args.timeout) as session:
+        await synthesize(session, url, bodies[-1])  # warmup
+        start = now()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        duration = now() - start
+
+    ok = [r for r in records if not r["error"]]
+    errors = [r["error"] for r in records if r["error"]]
+    audio_s = sum(r["audio_s"] for r in ok)
+    return {
+        "text_words": words,
+        "concurrency": concurrency,
+        "num_requests": num_requests,
+        "num_errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "duration_s": duration,
+        "ttfab_ms": percentiles([r["ttfab"] * 1000 for r in ok]),
+        "e2e_s": percentiles([r["time"] for r in ok]),
+        "audio_s": percentiles([r["audio_s"] for r in ok]),
+        "rtf": percentiles([r["rtf"] for r in ok]),
+        "rtf_min": min((r["rtf"] for r in ok), default=None),
+        "underrun_ms": percentiles([r["underrun_s"] * 1000 for r in ok]),
+        "realtime_fraction": sum(1 for r in ok if r["underrun_s"] == 0) / len(ok) if ok else 0.0,
+        # Aggregate: audio seconds produced per wall second across all streams
+        "aggregate_rtf": audio_s / duration if duration > 0 else 0.0,
+        "sample": str(sample_path) if sample_path else None,
+    }
+
+
+async def run(args):
+    url = f"{args.url.rstrip('/')}/v1/audio/speech"
+    cells = []
+    for words in args.text_words:
+        for concurrency in args.concurrency:
+            print(f"  {words:>4} words @ conc {concurrency:>3}...", end=" ", flush=True)
+            cell = await run_cell(args, url, words, concurrency)
+            cells.append(cell)
+            if cell["num_errors"] == cell["num_requests"]:
+                print(f"❌ {cell['first_error']}")
+                continue
+            print(f"✅ TTFAB p50 {cell['ttfab_ms']['p50']:7.1f}ms p99 {cell['ttfab_ms']['p99']:7.1f}ms | "
+                  f"RTF p50 {cell['rtf']['p50']:5.2f} min {cell['rtf_min']:5.2f} | "
+                  f"aggregate {cell['aggregate_rtf']:6.2f}x | "
+                  f"underrun p99 {cell['underrun_ms']['p99']:7.1f}ms | audio {cell['audio_s']['mean']:.1f}s")
+    return cells
+
+
+def parse_levels(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Higgs Audio streaming TTS benchmark")
+    parser.add_argument("--url", default="http://localhost:8007", help="Higgs Audio server URL")
+    parser.add_argument("--model", default=MODEL, help="Served model name")
+    parser.add_argument("--voice", default="en_woman", help="Voice preset (en_woman, en_man, belinda, ...)")
+    parser.add_argument("--text-words", type=parse_levels, default=[10, 50, 200], help="Input lengths in words")
+    parser.add_argument("--concurrency", type=parse_levels, default=[1, 4, 8], help="Concurrent syntheses")
+    parser.add_argument("--requests", type=int, default=8, help="Requests per cell (at least 2x concurrency)")
+    parser.add_argument("--save-samples", help="Directory to write one .wav per cell")
+    parser.add_argument("--timeout", type=int, default=600, help="Per-request timeout (s)")
+    args = parser.parse_args()
+
+    print(f"\n{'='*80}")
+    print("🔊 Higgs Audio Streaming TTS Benchmark")
+    print(f"{'='*80}")
+    print(f"Endpoint:    {args.url}/v1/audio/speech ({args.model}, voice {args.voice})")
+    print(f"Format:      pcm {SAMPLE_RATE}Hz mono s16le")
+    print(f"Text words:  {args.text_words}")
+    print(f"Concurrency: {args.concurrency}")
+    print(f"{'='*80}\n")
+
+    cells = asyncio.run(run(args))
+    ok = [c for c in cells if c["num_errors"] < c["num_requests"]]
+
+    if ok:
+        print(f"\n{'─'*80}")
+        print("REAL-TIME CAPACITY:")
+        print(f"{'─'*80}")
+        for words in args.text_words:
+            realtime = [c["concurrency"] for c in ok if c["text_words"] == words and c["realtime_fraction"] == 1.0]
+            if realtime:
+                print(f"  {words:>4} words: every stream played without underrun up to concurrency {max(realtime)}")
+            else:
+                print(f"  {words:>4} words: streams underran at every tested concurrency")
+
+    output_data = {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "higgs_audio_tts",
+        "endpoint": args.url,
+        "model": args.model,
+        "voice": args.voice,
+        "sample_rate": SAMPLE_RATE,
+        "cells": cells,
+    }
+    output_file = RESULTS_DIR / f"eval_higgs_audio_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(output_data, f, indent=2)
+
+    print(f"\n💾 Results saved to: {output_file}")
+    print(f"{'='*80}\n")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of base64 image payloads, with optional pre-resize to the
+resolution the Qwen3-VL processor would use anyway. Images already within the pixel budget are
+sent unchanged (no JPEG re-encode); only images the server would downscale are resized.
+
+Encoding happens once per (image content, resize setting); repeated benchmark runs reuse
+the cached data URL from memory or from disk, so client-side encoding never lands inside
+the measured latency.
+
+Usage:
+    from image_payload import ImagePayloadCache
+
+    cache = ImagePayloadCache()
+    payload = cache.get("/compile/image.jpg", max_pixels=PRE_RESIZE_MAX_PIXELS)
+    payload["data_url"], payload["payload_bytes"], payload["sent_size"]
+"""
+
+import base64
+import hashlib
+import io
+import math
+import os
+import time
+from pathlib import Path
+
+# Qwen3-VL: 16px patches merged 2x2, so image dimensions snap to multiples of 32
+QWEN3_VL_FACTOR = 32
+QWEN3_VL_MIN_PIXELS = 65536
+QWEN3_VL_MAX_PIXELS = 16777216  # preprocessor_config.json "longest_edge"
+# Typical serving budget (mm_processor_kwargs max_pixels); the processor ceiling above almost never
+# shrinks an image, so it is useless as a pre-resize default. Match the server's setting.
+PRE_RESIZE_MAX_PIXELS = 1280 * 28 * 28
+
+DEFAULT_CACHE_DIR = Path(os.environ.get("VLM_PAYLOAD_CACHE", Path.home() / ".cache" / "vlm_bench" / "payloads"))
+
+
+def detect_mime(data: bytes) -> str:
+    """MIME type from magic bytes (defaults to JPEG)."""
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:3] == b"GIF":
+        return "image/gif"
+    return "image/jpeg"
+
+
+def smart_resize(width: int, height: int, factor: int = QWEN3_VL_FACTOR,
+                 min_pixels: int = QWEN3_VL_MIN_PIXELS, max_pixels: int = QWEN3_VL_MAX_PIXELS):
+    """Target (width, height) the Qwen-VL processor resizes to: multiples of `factor` within the pixel budget."""
+    h_bar = max(factor, round(height / factor) * factor)
+    w_bar = max(factor, round(width / factor) * factor)
+    if h_bar * w_bar > max_pixels:
+        beta = math.sqrt((height * width) / max_pixels)
+        h_bar = max(factor, math.floor(height / beta / factor) * factor)
+        w_bar = max(factor, math.floor(width / beta / factor) * factor)
+    elif h_bar * w_bar < min_pixels:
+        beta = math.sqrt(min_pixels / (height * width))
+        h_bar = math.ceil(height * beta / factor) * factor
+        w_bar = math.ceil(width * beta / factor) * factor
+    return w_bar, h_bar
+
+
+def image_tokens(width: int, height: int, factor: int = QWEN3_VL_FACTOR) -> int:
+    """Vision tokens for an image already at processor resolution (one token per factor x factor tile)."""
+    return (width // factor) * (height // factor)
+
+
+def resize_bytes(data: bytes, max_pixels: int, factor: int = QWEN3_VL_FACTOR, quality: int = 90):
+    """
+    Downscale encoded image bytes to the processor target. Returns (bytes, mime, (w, h), (orig_w, orig_h)).
+    Images the processor would not shrink are returned as is: re-encoding them only changes the bytes.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        orig_size = img.size
+        if orig_size[0] * orig_size[1] <= max_pixels:
+            return data, detect_mime(data), orig_size, orig_size
+        target = smart_resize(*orig_size, factor=factor, max_pixels=max_pixels)
+
+        out = io.BytesIO()
+        resized = img.convert("RGB").resize(target, Image.BICUBIC)
+        resized.save(out, format="JPEG", quality=quality)
+        return out.getvalue(), "image/jpeg", target, orig_size
+
+
+class ImagePayloadCache:
+    """Memory + disk cache of data URLs keyed by sha256(image bytes) and resize settings."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, use_disk=True):
+        self.cache_dir = Path(cache_dir)
+        self.use_disk = use_disk
+        self.memory = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, content_hash: str, max_pixels):
+        # "_ds": downscale-only payloads, so entries re-encoded by the old always-re-encode policy are not reused
+        return f"{content_hash}_{max_pixels}_ds" if max_pixels else f"{content_hash}_orig"
+
+    def get(self, image_path, max_pixels=None):
+        """Return a payload dict for `image_path`, optionally pre-resized to `max_pixels`."""
+        with open(image_path, "rb") as f:
+            raw = f.read()
+        return self.get_bytes(raw, max_pixels)
+
+    def get_bytes(self, raw: bytes, max_pixels=None):
+        """Same as get() for image bytes already in memory."""
+        key = self._key(hashlib.sha256(raw).hexdigest(), max_pixels)
+        if key in self.memory:
+            self.hits += 1
+            return self.memory[key]
+
+        disk_path = self.cache_dir / f"{key}.b64"
+        meta_path = self.cache_dir / f"{key}.meta"
+        start = time.perf_counter()
+        if self.use_disk and disk_path.exists() and meta_path.exists():
+            self.hits += 1
+            data_url = disk_path.read_text()
+            mime, w, h, ow, oh = meta_path.read_text().split()
+            sent_size, orig_size = (int(w), int(h)), (int(ow), int(oh))
+            cached = True
+        else:
+            self.misses += 1
+            if max_pixels:
+                encoded, mime, sent_size, orig_size = resize_bytes(raw, max_pixels)
+            else:
+                encoded, mime = raw, detect_mime(raw)
+                sent_size = orig_size = None
+            data_url = f"data:{mime};base64,{base64.b64encode(encoded).decode('ascii')}"
+            if sent_size is None:
+                sent_size = orig_size = _image_size(raw)
+            if self.use_disk:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                disk_path.write_text(data_url)
+                meta_path.write_text(f"{mime} {sent_size[0]} {sent_size[1]} {orig_size[0]} {orig_size[1]}")
+            cached = False
+
+        payload = {
+            "data_url": data_url,
+            "original_bytes": len(raw),
+            "payload_bytes": len(data_url),
+            "orig_size": orig_size,
+            "sent_size": sent_size,
+            "encode_ms": (time.perf_counter() - start) * 1000,
+            "from_disk": cached,
+        }
+        self.memory[key] = payload
+        return payload
+
+
+def _image_size(data: bytes):
+    """(width, height) of encoded image bytes, or (0, 0) if PIL is unavailable."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return (0, 0)
+    with Image.open(io.BytesIO(data)) as img:
+        return img.size
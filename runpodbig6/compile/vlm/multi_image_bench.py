@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Multi-image / video-frame batch benchmark for Qwen3-VL.
+
+Sends K images per request (a local image pool, or frames sampled from a directory of
+extracted video frames) and sweeps K against concurrency. For every cell it records TTFT,
+throughput, SLO goodput (--slo-ttft-ms / --slo-tpot-ms), server-reported prompt tokens and server
+memory pressure (KV cache usage and queue depth from /metrics, optionally GPU memory from
+nvidia-smi), so --limit-mm-per-prompt and client-side frame sampling can be set from data.
+
+No request may reuse a server cache: every request (each cell's warmup included) leads with a
+nonce, so its image tokens are never a prefix cache hit, and takes the next K pool images on a
+counter that runs across all cells. The generated pool is sized to the whole sweep unless --pool
+is given, so image hashes never repeat; with a smaller --pool or too few --frames-dir frames they
+repeat once the pool wraps (warned about up front), and hash-keyed multimodal caches can hit.
+
+Usage:
+    python multi_image_bench.py [--url http://localhost:8006] [--images-per-request 1,2,4,8] [--concurrency 1,4,16]
+    python multi_image_bench.py --frames-dir /data/frames --frame-stride 15 --images-per-request 4,8,16
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "llm"))
+from loadgen import add_slo_args, build_payload, chat_url, run_level, slo_from_args, summarize
+from server_metrics import MetricsPoller, gpu_memory_used_mb
+from image_payload import ImagePayloadCache
+from resolution_sweep import generate_image
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp")
+POOL_DIR = Path(__file__).resolve().parent / "images" / "multi"
+
+PROMPT = "These images are consecutive frames. Describe what changes between them in 30 words."
+MAX_TOKENS = 128
+
+
+def load_pool(args):
+    """Image paths: sampled video frames if --frames-dir is given, else a generated pool."""
+    if args.frames_dir:
+        frames = sorted(p for p in Path(args.frames_dir).iterdir() if p.suffix.lower() in IMAGE_EXTS)
+        return frames[::args.frame_stride]
+
+    POOL_DIR.mkdir(parents=True, exist_ok=True)
+    width, height = (int(v) for v in args.size.split("x"))
+    missing = sum(1 for i in range(args.pool) if not (POOL_DIR / f"pool_{width}x{height}_{i}.jpg").exists())
+    if missing:
+        print(f"🎨 Generating {missing} pool images in {POOL_DIR}...", flush=True)
+    pool = []
+    for i in range(args.pool):
+        path = POOL_DIR / f"pool_{width}x{height}_{i}.jpg"
+        if not path.exists():
+            generate_image(path, width, height, seed=i)
+        pool.append(path)
+    return pool
+
+
+def make_payload_fn(model, data_urls, k, counter):
+    """Every call (warmup included) takes the next K pool entries from the shared `counter`, and its
+    text leads with a nonce, so no two requests share a prefix."""
+    def make_payload(i):
+        first = next(counter) * k
+        content = [{"type": "text", "text": f"[{uuid.uuid4().hex[:12]}] {PROMPT}"}]
+        for j in range(k):
+            content.append({"type": "image_url", "image_url": {"url": data_urls[(first + j) % len(data_urls)]}})
+        return build_payload(model, [{"role": "user", "content": content}], MAX_TOKENS, temperature=0.0)
+    return make_payload
+
+
+def cell_requests(args, concurrency):
+    return max(args.requests, concurrency * 2)
+
+
+async def run_cell(args, url, data_urls, k, concurrency, counter):
+    poller = MetricsPoller(url, interval=args.metrics_interval).start()
+    gpu_before = gpu_memory_used_mb(args.gpu_index) if args.gpu_index is not None else []
+    num_requests = cell_requests(args, concurrency)
+    records, duration = await run_level(url, make_payload_fn(args.model, data_urls, k, counter), concurrency,
+                                        num_requests, warmup=1, timeout=args.timeout)
+    gpu_after = gpu_memory_used_mb(args.gpu_index) if args.gpu_index is not None else []
+    await poller.stop()
+
+    summary = summarize(records, duration, slo_from_args(args))
+    prompt_tokens = [r["prompt_tokens"] for r in records if r.get("prompt_tokens")]
+    errors = [r["error"] for r in records if r["error"]]
+    return {
+        "images_per_request": k,
+        "concurrency": concurrency,
+        "summary": summary,
+        "avg_prompt_tokens": sum(prompt_tokens) / len(prompt_tokens) if prompt_tokens else None,
+        "first_error": errors[0] if errors else None,
+        "server": {
+            "peak_kv_usage": poller.peak("kv_usage"),
+            "mean_kv_usage": poller.mean("kv_usage"),
+            "peak_running": poller.peak("running"),
+            "peak_waiting": poller.peak("waiting"),
+            "metrics_samples": poller.samples,
+            "gpu_memory_mb_before": gpu_before,
+            "gpu_memory_mb_after": gpu_after,
+        },
+    }
+
+
+async def run(args, data_urls):
+    url = chat_url(args.url)
+    cells = []
+    counter = itertools.count()
+    rejected_k = None
+    for k in args.images_per_request:
+        if rejected_k is not None and k >= rejected_k:
+            print(f"  K={k:<3} skipped (server rejected K={rejected_k})")
+            continue
+        for concurrency in args.concurrency:
+            print(f"  K={k:<3} concurrency {concurrency:<4}...", end=" ", flush=True)
+            cell = await run_cell(args, url, data_urls, k, concurrency, counter)
+            cells.append(cell)
+            s = cell["summary"]
+            if s["num_errors"] == s["num_requests"]:
+                print(f"❌ {cell['first_error']}")
+                if cell["first_error"] and cell["first_error"].startswith("HTTP 400"):
+                    rejected_k = k
+                break
+            kv = cell["server"]["peak_kv_usage"]
+            print(f"✅ TTFT p50 {s['ttft_ms'].get('p50', 0):8.1f}ms p99 {s['ttft_ms'].get('p99', 0):8.1f}ms | "
+                  f"{s.get('tokens_per_second', 0):7.1f} tok/s | {s.get('requests_per_second', 0):5.2f} req/s | "
+                  f"SLO met {(s['goodput']['attainment'] or 0) * 100:5.1f}% | "
+                  f"prompt {cell['avg_prompt_tokens'] or 0:7.0f} tok | "
+                  f"KV peak {kv * 100 if kv is not None else float('nan'):5.1f}% | "
+                  f"waiting peak {cell['server']['peak_waiting'] or 0:.0f}")
+    return cells
+
+
+def per_image_cost(cells):
+    """Marginal TTFT and prompt tokens per extra image at each concurrency (least squares over K)."""
+    costs = {}
+    for concurrency in sorted({c["concurrency"] for c in cells}):
+        points = [(c["images_per_request"], c["summary"]["ttft_ms"].get("p50"), c["avg_prompt_tokens"])
+                  for c in cells if c["concurrency"] == concurrency and c["summary"]["ttft_ms"]]
+        if len(points) < 2:
+            continue
+        n = len(points)
+        mk = sum(p[0] for p in points) / n
+        var = sum((p[0] - mk) ** 2 for p in points)
+        if var == 0:
+            continue
+        mt = sum(p[1] for p in points) / n
+        costs[concurrency] = {"ttft_ms_per_image": sum((p[0] - mk) * (p[1] - mt) for p in points) / var}
+        tokens = [p for p in points if p[2]]
+        if len(tokens) == n:
+            mp = sum(p[2] for p in points) / n
+            costs[concurrency]["prompt_tokens_per_image"] = sum((p[0] - mk) * (p[2] - mp) for p in points) / var
+    return costs
+
+
+def parse_levels(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-image / video-frame VLM benchmark")
+    parser.add_argument("--url", default="http://localhost:8006", help="VLM server URL (SGLang: 8007)")
+    parser.add_argument("--model", default="qwen3-vl", help="Served model name (SGLang: qwen3-vl-sglang)")
+    parser.add_argument("--images-per-request", type=parse_levels, default=[1, 2, 4, 8], help="K values to sweep")
+    parser.add_argument("--concurrency", type=parse_levels, default=[1, 4, 16], help="Concurrency levels")
+    parser.add_argument("--requests", type=int, default=16, help="Requests per cell (at least 2x concurrency)")
+    parser.add_argument("--frames-dir", help="Directory of extracted video frames (sorted by name)")
+    parser.add_argument("--frame-stride", type=int, default=1, help="Keep every Nth frame (client-side sampling)")
+    parser.add_argument("--pool", type=int,
+                        help="Generated pool size when no --frames-dir (default: every image the sweep sends)")
+    parser.add_argument("--size", default="1280x720", help="Generated pool image size")
+    parser.add_argument("--max-pixels", type=int, help="Pre-resize each image to this pixel budget")
+    parser.add_argument("--gpu-index", type=int, help="Also record nvidia-smi memory for this GPU")
+    parser.add_argument("--metrics-interval", type=float, default=0.5, help="/metrics scrape interval (s)")
+    parser.add_argument("--timeout", type=int, default=300, help="Per-request timeout (s)")
+    add_slo_args(parser)
+    args = parser.parse_args()
+
+    needed = sum(k * (cell_requests(args, c) + 1) for k in args.images_per_request for c in args.concurrency)
+    if args.pool is None:
+        args.pool = needed
+    pool = load_pool(args)
+    if not pool:
+        print("❌ ERROR: no images found")
+        return 1
+
+    # Encode everything before timing starts
+    cache = ImagePayloadCache()
+    payloads = [cache.get(p, max_pixels=args.max_pixels) for p in pool]
+    data_urls = [p["data_url"] for p in payloads]
+
+    print(f"\n{'='*80}")
+    print("🎞️  Multi-image VLM Benchmark")
+    print(f"{'='*80}")
+    print(f"Server:             {args.url} ({args.model})")
+    print(f"Images:             {len(pool)} {'frames from ' + args.frames_dir if args.frames_dir else 'generated'}"
+          f" (~{sum(p['payload_bytes'] for p in payloads) / len(payloads) / 1024:.0f} KB each)")
+    print(f"Images per request: {args.images_per_request}")
+    print(f"Concurrency:        {args.concurrency}")
+    print(f"SLO:                TTFT <= {args.slo_ttft_ms:.0f}ms, TPOT <= {args.slo_tpot_ms:.0f}ms")
+    if needed > len(pool):
+        fix = "more frames or a smaller --frame-stride" if args.frames_dir else "raise --pool"
+        print(f"⚠️  The sweep sends {needed} images but the pool has {len(pool)}: repeated images can hit "
+              f"hash-keyed multimodal caches ({fix})")
+    print(f"{'='*80}\n")
+
+    cells = asyncio.run(run(args, data_urls))
+    costs = per_image_cost(cells)
+
+    print(f"\n{'─'*80}")
+    print("SCALING PER EXTRA IMAGE:")
+    print(f"{'─'*80}")
+    for concurrency, cost in costs.items():
+        line = f"  concurrency {concurrency:<4} +{cost['ttft_ms_per_image']:.1f}ms TTFT per image"
+        if "prompt_tokens_per_image" in cost:
+            line += f" | +{cost['prompt_tokens_per_image']:.0f} prompt tokens per image"
+        print(line)
+
+    output_data = {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "vlm_multi_image",
+        "endpoint": args.url,
+        "model": args.model,
+        "images": [str(p) for p in pool],
+        "max_pixels": args.max_pixels,
+        "max_tokens": MAX_TOKENS,
+        "slo": slo_from_args(args),
+        "per_image_cost": costs,
+        "cells": cells,
+    }
+    output_file = Path(__file__).resolve().parent / f"eval_vlm_multi_image_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(output_data, f, indent=2)
+
+    print(f"\n💾 Results saved to: {output_file}")
+    print(f"{'='*80}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -2,29 +2,23 @@
 """
 Quick VLM benchmark - test image understanding with timing
 Usage: python quick_bench.py [--url http://localhost:8006] [--image path/to/image.png]
+       python quick_bench.py --repeat 5 --compare-resize --max-pixels 1003520
 """
 
 import argparse
-import base64
+import json
+import sys
 import time
 import requests
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "llm"))
+from http_phases import TimedBody, format_phases, phases_ms
+from image_payload import ImagePayloadCache, PRE_RESIZE_MAX_PIXELS
 
-def encode_image(image_path: str) -> str:
-    """Encode image to base64."""
-    with open(image_path, "rb") as f:
-        return base64.b64encode(f.read()).decode("utf-8")
 
-
-def test_vlm(url: str, image_path: str, prompt: str = "Describe this image in detail."):
-    """Run a single VLM test."""
-    
-    # Encode image
-    print(f"📸 Loading image: {image_path}")
-    image_b64 = encode_image(image_path)
-    
-    # Prepare request
+def build_body(image_url: str, prompt: str, max_tokens: int = 200) -> bytes:
+    """Serialize the request once so JSON encoding stays out of the measured latency."""
     payload = {
         "model": "qwen3-vl",
         "messages": [
@@ -34,40 +28,76 @@ def test_vlm(url: str, image_path: str, prompt: str = "Describe this image in de
                     {"type": "text", "text": prompt},
                     {
                         "type": "image_url",
-                        "image_url": {"url": f"data:image/png;base64,{image_b64}"}
+                        "image_url": {"url": image_url}
                     }
                 ]
             }
         ],
-        "max_tokens": 200,
-        "temperature": 0.0
+        "max_tokens": max_tokens,
+        "temperature": 0.0,
+        "stream": True,
+        "stream_options": {"include_usage": True}
     }
+    return json.dumps(payload).encode("utf-8")
+
+
+def test_vlm(url: str, body: bytes, prompt: str = "Describe this image in detail.", max_tokens: int = 200):
+    """Run a single VLM test with a pre-built request body."""
     
     print(f"\n🚀 Sending request to {url}")
     print(f"   Prompt: {prompt}")
-    print(f"   Max tokens: {payload['max_tokens']}")
+    print(f"   Max tokens: {max_tokens}")
+    print(f"   Request size: {len(body) / 1024:.0f} KB")
     
-    # Send request and measure time
+    # Send request and measure time; the body timestamps its own upload so a slow upload of the
+    # base64 image shows up separately from a slow prefill
+    timed_body = TimedBody(body)
     start = time.time()
+    first_chunk_time = None
+    first_token_time = None
+    content = ""
+    usage = {}
     
     try:
         response = requests.post(
             f"{url}/v1/chat/completions",
-            json=payload,
+            data=timed_body,
+            headers={"Content-Type": "application/json"},
+            stream=True,
             timeout=60
         )
-        
-        end = time.time()
-        elapsed_ms = (end - start) * 1000
+        headers_time = time.time()
         
         if response.status_code == 200:
-            result = response.json()
+            for line in response.iter_lines():
+                if not line or not line.startswith(b"data: "):
+                    continue
+                data = line[6:]
+                if data == b"[DONE]":
+                    break
+                if first_chunk_time is None:
+                    first_chunk_time = time.time()
+                chunk = json.loads(data)
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+                if chunk.get("choices"):
+                    delta = chunk["choices"][0].get("delta") or {}
+                    if delta.get("content"):
+                        if first_token_time is None and delta["content"].strip():
+                            first_token_time = time.time()
+                        content += delta["content"]
+            
+            end = time.time()
+            elapsed_ms = (end - start) * 1000
+            ttft_ms = (first_token_time - start) * 1000 if first_token_time else 0
+            marks = dict(timed_body.marks(start), response_headers=headers_time - start)
+            phases = phases_ms(marks,
+                               first_chunk_time - start if first_chunk_time else None,
+                               ttft_ms / 1000 if first_token_time else None)
             
             # Extract metrics
-            usage = result.get("usage", {})
             prompt_tokens = usage.get("prompt_tokens", 0)
             completion_tokens = usage.get("completion_tokens", 0)
-            content = result["choices"][0]["message"]["content"]
             
             # Calculate throughput
             tokens_per_sec = completion_tokens / (elapsed_ms / 1000) if elapsed_ms > 0 else 0
@@ -75,6 +105,10 @@ def test_vlm(url: str, image_path: str, prompt: str = "Describe this image in de
             print(f"\n✅ SUCCESS")
             print(f"{'='*80}")
             print(f"⏱️  Total time: {elapsed_ms:.0f} ms ({elapsed_ms/1000:.2f}s)")
+            print(f"⚡ TTFT: {ttft_ms:.0f} ms")
+            print(f"   {format_phases(phases)}")
+            if phases.get("upload_mb_per_s"):
+                print(f"   Upload: {len(body) / 1024:.0f} KB at {phases['upload_mb_per_s']:.1f} MB/s")
             print(f"📊 Tokens:")
             print(f"   Prompt: {prompt_tokens} tokens")
             print(f"   Completion: {completion_tokens} tokens")
@@ -89,9 +123,11 @@ def test_vlm(url: str, image_path: str, prompt: str = "Describe this image in de
             return {
                 "success": True,
                 "time_ms": elapsed_ms,
+                "ttft_ms": ttft_ms,
                 "prompt_tokens": prompt_tokens,
                 "completion_tokens": completion_tokens,
                 "tokens_per_sec": tokens_per_sec,
+                "phases_ms": phases,
                 "content": content
             }
         else:
@@ -109,12 +145,48 @@ def test_vlm(url: str, image_path: str, prompt: str = "Describe this image in de
         return {"success": False, "error": str(e)}
 
 
+def describe_payload(label: str, payload: dict):
+    """Print what will actually be sent for one image variant."""
+    w, h = payload["sent_size"]
+    ow, oh = payload["orig_size"]
+    source = "disk cache" if payload["from_disk"] else "encoded"
+    print(f"📸 {label}: {ow}x{oh} -> {w}x{h} | "
+          f"{payload['payload_bytes'] / 1024:.0f} KB payload ({source} in {payload['encode_ms']:.0f} ms)")
+
+
+def summarize(label: str, results: list):
+    """Average time/TTFT/speed for a list of successful runs."""
+    avg_time = sum(r["time_ms"] for r in results) / len(results)
+    avg_ttft = sum(r["ttft_ms"] for r in results) / len(results)
+    avg_tps = sum(r["tokens_per_sec"] for r in results) / len(results)
+    phases = {}
+    for r in results:
+        for name, value in r["phases_ms"].items():
+            phases.setdefault(name, []).append(value)
+    avg_phases = {name: sum(v) / len(v) for name, v in phases.items()}
+    
+    print(f"\n{'='*80}")
+    print(f"📈 Summary - {label} ({len(results)} successful runs)")
+    print(f"{'='*80}")
+    print(f"Average time: {avg_time:.0f} ms")
+    print(f"Average TTFT: {avg_ttft:.0f} ms ({format_phases(avg_phases)})")
+    print(f"Average speed: {avg_tps:.1f} tokens/s")
+    print(f"{'='*80}\n")
+    return avg_ttft, avg_phases
+
+
 def main():
     parser = argparse.ArgumentParser(description="Quick VLM benchmark")
     parser.add_argument("--url", default="http://localhost:8006", help="VLM server URL")
     parser.add_argument("--image", default="/compile/image.jpg", help="Path to test image")
     parser.add_argument("--prompt", default="Describe this image in detail.", help="Prompt to use")
     parser.add_argument("--repeat", type=int, default=1, help="Number of times to repeat test")
+    parser.add_argument("--pre-resize", action="store_true", help="Resize client-side to the processor resolution")
+    parser.add_argument("--max-pixels", type=int, default=PRE_RESIZE_MAX_PIXELS,
+                        help="Pixel budget for --pre-resize (match the server's max_pixels)")
+    parser.add_argument("--compare-resize", action="store_true",
+                        help="Alternate original and pre-resized payloads and report the savings")
+    parser.add_argument("--no-disk-cache", action="store_true", help="Keep encoded payloads in memory only")
     
     args = parser.parse_args()
     
@@ -129,33 +201,61 @@ def main():
     print(f"Server: {args.url}")
     print(f"Image: {args.image}")
     print(f"Runs: {args.repeat}")
+    if args.pre_resize or args.compare_resize:
+        print(f"Max pixels: {args.max_pixels}")
     print(f"{'='*80}\n")
     
-    results = []
+    # Encode once, before any timing starts
+    cache = ImagePayloadCache(use_disk=not args.no_disk_cache)
+    variants = []
+    if args.compare_resize or not args.pre_resize:
+        variants.append(("original", cache.get(args.image)))
+    if args.compare_resize or args.pre_resize:
+        variants.append(("resized", cache.get(args.image, max_pixels=args.max_pixels)))
+    
+    bodies = {}
+    for label, payload in variants:
+        describe_payload(label, payload)
+        bodies[label] = build_body(payload["data_url"], args.prompt)
+    
+    results = {label: [] for label, _ in variants}
     for i in range(args.repeat):
-        if args.repeat > 1:
-            print(f"\n📌 Run {i+1}/{args.repeat}")
-        
-        result = test_vlm(args.url, args.image, args.prompt)
-        if result["success"]:
-            results.append(result)
-        
-        if i < args.repeat - 1:
-            time.sleep(1)  # Brief pause between runs
+        for label, _ in variants:
+            if args.repeat > 1 or len(variants) > 1:
+                print(f"\n📌 Run {i+1}/{args.repeat} ({label})")
+            
+            result = test_vlm(args.url, bodies[label], args.prompt)
+            if result["success"]:
+                results[label].append(result)
+            
+            if i < args.repeat - 1 or label != variants[-1][0]:
+                time.sleep(1)  # Brief pause between runs
     
     # Summary if multiple runs
-    if len(results) > 1:
-        avg_time = sum(r["time_ms"] for r in results) / len(results)
-        avg_tps = sum(r["tokens_per_sec"] for r in results) / len(results)
-        
-        print(f"\n{'='*80}")
-        print(f"📈 Summary ({len(results)} successful runs)")
+    avg_ttft, avg_phases = {}, {}
+    for label, runs in results.items():
+        if len(runs) > 1 or (runs and len(results) > 1):
+            avg_ttft[label], avg_phases[label] = summarize(label, runs)
+    
+    if "original" in avg_ttft and "resized" in avg_ttft:
+        original = dict(variants)["original"]
+        resized = dict(variants)["resized"]
+        saved_bytes = original["payload_bytes"] - resized["payload_bytes"]
+        saved_ttft = avg_ttft["original"] - avg_ttft["resized"]
+        print(f"{'='*80}")
+        print(f"✂️  Pre-resize savings")
         print(f"{'='*80}")
-        print(f"Average time: {avg_time:.0f} ms")
-        print(f"Average speed: {avg_tps:.1f} tokens/s")
+        print(f"Request size: {original['payload_bytes'] / 1024:.0f} KB -> {resized['payload_bytes'] / 1024:.0f} KB "
+              f"({saved_bytes / 1024:.0f} KB, {saved_bytes / original['payload_bytes'] * 100:.0f}% smaller)")
+        print(f"TTFT:         {avg_ttft['original']:.0f} ms -> {avg_ttft['resized']:.0f} ms ({saved_ttft:+.0f} ms saved)")
+        for name, label in [("upload", "Upload"), ("wait_headers", "Server (headers)"),
+                            ("wait_first_chunk", "Server (first chunk)")]:
+            before, after = avg_phases["original"].get(name), avg_phases["resized"].get(name)
+            if before is not None and after is not None:
+                print(f"  {label + ':':<22} {before:.0f} ms -> {after:.0f} ms ({before - after:+.0f} ms saved)")
         print(f"{'='*80}\n")
     
-    return 0 if results else 1
+    return 0 if any(results.values()) else 1
 
 
 if __name__ == "__main__":
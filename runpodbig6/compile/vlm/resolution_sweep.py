@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Image resolution / image-token sweep for Qwen3-VL on vLLM and SGLang.
+
+Generates synthetic test images locally (256² up to 4K, several aspect ratios), sends each one
+to both servers and records the server-reported prompt tokens next to TTFT, decode throughput
+and SLO goodput (--slo-ttft-ms / --slo-tpot-ms; requests run one at a time, so goodput is per image
+over its measured requests), so a client-side resize policy can be chosen from data.
+
+Every request must pay the vision encoder and the image-token prefill, so none may hit a server
+cache: the text part starts with a per-request nonce (prefix cache) and every request, warmup
+included, sends its own copy of the image with one pixel changed (multimodal processor/encoder
+caches keyed by image hash). The copies are re-encoded per run, before timing starts.
+
+Usage: python resolution_sweep.py [--samples 3] [--aspects 1:1,4:3,16:9,9:16,21:9]
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import random
+import sys
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "llm"))
+from loadgen import (add_slo_args, build_payload, chat_url, goodput, new_session, now, percentiles, slo_from_args,
+                     stream_chat)
+from image_payload import ImagePayloadCache, image_tokens, smart_resize
+
+BACKENDS = {
+    "vLLM": {"url": "http://localhost:8006", "model": "qwen3-vl"},
+    "SGLang": {"url": "http://localhost:8007", "model": "qwen3-vl-sglang"},
+}
+
+# Long edge in pixels, from 256² to 4K UHD
+LONG_EDGES = [256, 512, 768, 1024, 1536, 2048, 2560, 3840]
+ASPECTS = ["1:1", "4:3", "16:9", "9:16", "21:9"]
+
+PROMPT = "Describe this image in 20 words."
+MAX_TOKENS = 64
+
+
+def image_size(long_edge, aspect):
+    """(width, height) with the given long edge and w:h aspect ratio."""
+    w, h = (int(x) for x in aspect.split(":"))
+    if w >= h:
+        return long_edge, max(1, round(long_edge * h / w))
+    return max(1, round(long_edge * w / h)), long_edge
+
+
+def generate_image(path, width, height, seed=0):
+    """Deterministic synthetic scene: gradient background, shapes and text labels."""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    for _ in range(max(8, (width * height) // 40000)):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1 = min(width, x0 + rng.randint(8, max(9, width // 4)))
+        y1 = min(height, y0 + rng.randint(8, max(9, height // 4)))
+        color = tuple(rng.randrange(256) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.rectangle([x0, y0, x1, y1], fill=color)
+        else:
+            draw.ellipse([x0, y0, x1, y1], outline=color, width=3)
+    for i in range(max(2, height // 128)):
+        draw.text((rng.randrange(max(1, width - 200)), rng.randrange(height)), f"LABEL {i} {width}x{height}",
+                  fill=(255, 255, 255))
+    img.save(path, format="JPEG", quality=90)
+
+
+def prepare_images(image_dir, long_edges, aspects):
+    """Generate (or reuse) one image per (long edge, aspect)."""
+    image_dir.mkdir(parents=True, exist_ok=True)
+    images = []
+    for long_edge in long_edges:
+        for aspect in aspects:
+            width, height = image_size(long_edge, aspect)
+            path = image_dir / f"sweep_{width}x{height}.jpg"
+            if not path.exists():
+                generate_image(path, width, height, seed=width * 10000 + height)
+            target = smart_resize(width, height)
+            images.append({
+                "path": str(path),
+                "aspect": aspect,
+                "width": width,
+                "height": height,
+                "expected_image_tokens": image_tokens(*target),
+            })
+    return images
+
+
+def perturbed_variants(path, count, rng):
+    """`count` JPEG copies of an image, each with its top-left pixel set to a random colour: same
+    resolution and image tokens, but a different image hash for every request."""
+    from PIL import Image
+
+    img = Image.open(path).convert("RGB")
+    variants = []
+    for _ in range(count):
+        copy = img.copy()
+        copy.putpixel((0, 0), tuple(rng.randrange(256) for _ in range(3)))
+        buf = io.BytesIO()
+        copy.save(buf, format="JPEG", quality=90)
+        variants.append(buf.getvalue())
+    return variants
+
+
+def user_message(data_url=None):
+    """PROMPT led by a fixed-length nonce (no prefix cache hits), plus the image if given."""
+    text = f"[{uuid.uuid4().hex[:12]}] {PROMPT}"
+    if data_url is None:
+        return [{"role": "user", "content": text}]
+    return [{
+        "role": "user",
+        "content": [
+            {"type": "text", "text": text},
+            {"type": "image_url", "image_url": {"url": data_url}},
+        ],
+    }]
+
+
+async def measure(session, backend, data_urls):
+    """One request per data URL (None: text only), sent one after another; returns their records."""
+    url = chat_url(backend["url"])
+    records = []
+    for data_url in data_urls:
+        payload = build_payload(backend["model"], user_message(data_url), MAX_TOKENS, temperature=0.0)
+        records.append(await stream_chat(session, url, payload))
+    return records
+
+
+def summarize_image(records, duration=None, slo=None):
+    ok = [r for r in records if not r["error"] and r["ttft"] is not None]
+    if not ok:
+        return {"error": records[0]["error"] if records else "no samples"}
+    decode = [(r["tokens"] - 1) / (r["time"] - r["ttft"]) for r in ok if r["tokens"] > 1 and r["time"] > r["ttft"]]
+    summary = {
+        "prompt_tokens": ok[-1]["prompt_tokens"],
+        "ttft_ms": percentiles([r["ttft"] * 1000 for r in ok]),
+        "decode_tps": sum(decode) / len(decode) if decode else 0,
+        "e2e_s": percentiles([r["time"] for r in ok]),
+    }
+    if duration:
+        summary["goodput"] = goodput(records, duration, slo)
+    return summary
+
+
+def fit_ms_per_token(rows):
+    """Least-squares slope/intercept of TTFT p50 (ms) against image tokens."""
+    points = [(r["image_tokens"], r["ttft_ms"]["p50"]) for r in rows
+              if r.get("image_tokens") is not None and r.get("ttft_ms")]
+    if len(points) < 2:
+        return None
+    n = len(points)
+    mx = sum(p[0] for p in points) / n
+    my = sum(p[1] for p in points) / n
+    var = sum((p[0] - mx) ** 2 for p in points)
+    if var == 0:
+        return None
+    slope = sum((p[0] - mx) * (p[1] - my) for p in points) / var
+    return {"ms_per_1k_image_tokens": slope * 1000, "intercept_ms": my - slope * mx}
+
+
+async def sweep_backend(name, backend, images, variants, slo):
+    """Text-only baseline, then every image in order."""
+    rows = []
+    async with new_session(timeout=300) as session:
+        baseline = summarize_image(await measure(session, backend, [None]))
+        text_tokens = baseline.get("prompt_tokens") or 0
+
+        for img in images:
+            payloads = variants[img["path"]]
+            # One unrecorded request (with its own image copy) so the first sample is not a cold start
+            await measure(session, backend, [payloads[0]["data_url"]])
+            start = now()
+            records = await measure(session, backend, [p["data_url"] for p in payloads[1:]])
+            summary = summarize_image(records, now() - start, slo)
+            row = {**img, "backend": name, "payload_bytes": payloads[1]["payload_bytes"], **summary}
+            if summary.get("prompt_tokens"):
+                row["image_tokens"] = summary["prompt_tokens"] - text_tokens
+            rows.append(row)
+
+            if "error" in summary:
+                print(f"  {name:<7} {img['width']:>5}x{img['height']:<5} ❌ {summary['error']}")
+            else:
+                print(f"  {name:<7} {img['width']:>5}x{img['height']:<5} ({img['aspect']:>5}) | "
+                      f"img tokens {row.get('image_tokens', 0):>6} | TTFT p50 {summary['ttft_ms']['p50']:8.1f}ms | "
+                      f"decode {summary['decode_tps']:6.1f} tok/s | "
+                      f"SLO met {(summary['goodput']['attainment'] or 0) * 100:5.1f}%")
+    return {"text_only_prompt_tokens": text_tokens, "rows": rows}
+
+
+async def run(args):
+    images = prepare_images(Path(args.image_dir), args.long_edges, args.aspects)
+    # Warmup + samples unique copies per image; memory only, since they are new every run
+    print(f"🎨 Encoding {len(images) * (args.samples + 1)} perturbed image copies...", flush=True)
+    cache = ImagePayloadCache(use_disk=False)
+    rng = random.Random()
+    variants = {img["path"]: [cache.get_bytes(raw) for raw in perturbed_variants(img["path"], args.samples + 1, rng)]
+                for img in images}
+
+    backends = {name: BACKENDS[name] for name in args.backends}
+    results = await asyncio.gather(*(sweep_backend(name, b, images, variants, slo_from_args(args))
+                                     for name, b in backends.items()))
+    return dict(zip(backends, results)), images
+
+
+def parse_list(value, cast=str):
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VLM image resolution sweep")
+    parser.add_argument("--backends", type=parse_list, default=list(BACKENDS), help="Comma-separated: vLLM,SGLang")
+    parser.add_argument("--vllm-url", default=BACKENDS["vLLM"]["url"], help="vLLM server URL")
+    parser.add_argument("--sglang-url", default=BACKENDS["SGLang"]["url"], help="SGLang server URL")
+    parser.add_argument("--long-edges", type=lambda v: parse_list(v, int), default=LONG_EDGES, help="Long edges in px")
+    parser.add_argument("--aspects", type=parse_list, default=ASPECTS, help="Aspect ratios as w:h")
+    parser.add_argument("--samples", type=int, default=3, help="Measured requests per image per backend")
+    parser.add_argument("--image-dir", default=str(Path(__file__).resolve().parent / "sweep_images"),
+                        help="Where generated test images are stored")
+    add_slo_args(parser)
+    args = parser.parse_args()
+    if args.samples < 1:
+        parser.error("--samples must be at least 1")
+    BACKENDS["vLLM"]["url"] = args.vllm_url
+    BACKENDS["SGLang"]["url"] = args.sglang_url
+
+    print(f"\n{'='*80}")
+    print(f"VLM Resolution Sweep: {', '.join(args.backends)}")
+    print(f"{'='*80}")
+    for name in args.backends:
+        print(f"{name + ':':<8} {BACKENDS[name]['url']} ({BACKENDS[name]['model']})")
+    print(f"Long edges: {args.long_edges}")
+    print(f"Aspects:    {args.aspects}")
+    print(f"Samples:    {args.samples} per image")
+    print(f"SLO:        TTFT <= {args.slo_ttft_ms:.0f}ms, TPOT <= {args.slo_tpot_ms:.0f}ms")
+    print(f"{'='*80}\n")
+
+    results, images = asyncio.run(run(args))
+
+    print(f"\n{'─'*80}")
+    print("TTFT vs IMAGE TOKENS:")
+    print(f"{'─'*80}")
+    fits = {}
+    for name, result in results.items():
+        fits[name] = fit_ms_per_token(result["rows"])
+        if fits[name]:
+            print(f"  {name:<7} {fits[name]['ms_per_1k_image_tokens']:.1f} ms per 1k image tokens "
+                  f"(+{fits[name]['intercept_ms']:.0f}ms fixed)")
+
+    print(f"\n{'Resolution':<12} {'Aspect':>6} {'Expected':>9}" +
+          "".join(f" {name + ' tok':>11} {name + ' TTFT':>12}" for name in results))
+    for i, img in enumerate(images):
+        line = f"{str(img['width']) + 'x' + str(img['height']):<12} {img['aspect']:>6} {img['expected_image_tokens']:>9}"
+        for result in results.values():
+            row = result["rows"][i]
+            line += f" {row.get('image_tokens', 0):>11} {row.get('ttft_ms', {}).get('p50', 0):>10.1f}ms"
+        print(line)
+
+    output_data = {
+        "timestamp": datetime.now().isoformat(),
+        "test_type": "vlm_resolution_sweep",
+        "backends": {name: BACKENDS[name] for name in results},
+        "prompt": PROMPT,
+        "max_tokens": MAX_TOKENS,
+        "samples": args.samples,
+        "slo": slo_from_args(args),
+        "fits": fits,
+        "results": results,
+    }
+    output_file = Path(__file__).resolve().parent / f"eval_vlm_resolution_sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(output_data, f, indent=2)
+
+    print(f"\n💾 Results saved to: {output_file}")
+    print(f"{'='*80}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,33 @@
 #!/usr/bin/env python3
-"""Compare vLLM vs SGLang for Vision-Language Model (Qwen3-VL) inference."""
-
-import time
-import requests
+"""
+Compare vLLM vs SGLang for Vision-Language Model (Qwen3-VL) inference.
+
+Images come from a local corpus (generated on first run) and are inlined as cached data URLs,
+or served from a local static server with --serve-images, so no internet fetch ends up in TTFT.
+Each backend runs its own request stream concurrently and independently of the other, after
+`concurrency` unrecorded warmup requests with their own prompt and image, so every recorded request
+is a warm one.
+
+Usage: python test_vlm_comparison.py [--rounds 3] [--concurrency 1] [--image-dir DIR] [--serve-images]
+"""
+
+import argparse
+import asyncio
+import functools
+import http.server
+import tempfile
+import threading
 import sys
 import json
 from datetime import datetime
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "llm"))
+from client_profiler import ClientProfiler
+from loadgen import build_payload, new_session, stream_chat
+from image_payload import ImagePayloadCache
+from resolution_sweep import generate_image
+
 # Test configuration
 VLLM_URL = "http://localhost:8006/v1/chat/completions"
 SGLANG_URL = "http://localhost:8007/v1/chat/completions"
@@ -16,8 +36,9 @@ SGLANG_MODEL = "qwen3-vl-sglang"
 MAX_TOKENS = 256
 NUM_REQUESTS = 3
 
-# Test image URL (using a sample image for testing)
-TEST_IMAGE_URL = "https://qianwen-res.oss-cn-beijing.aliyuncs.com/Qwen-VL/assets/demo.jpeg"
+# Local image corpus (one image per round, generated if the directory is empty)
+IMAGE_DIR = Path(__file__).resolve().parent / "images"
+CORPUS_SIZE = (1280, 960)
 
 # Three different ~1500 token system prompts with vision analysis tasks
 SYSTEM_PROMPTS = [
@@ -128,129 +149,157 @@ USER_QUERIES = [
     "List the key objects you can identify in 10-15 words."
 ]
 
-def test_backend(backend_name, url, model_name, system_prompt, user_query):
+# Unrecorded warmup: not one of the measured prompts or images, so no round gets a cache hit from it
+WARMUP_QUERY = "Warmup: name one color in this image."
+
+def load_corpus(image_dir):
+    """Image paths from the local corpus, generating a few synthetic ones if it is empty."""
+    image_dir.mkdir(parents=True, exist_ok=True)
+    images = sorted(p for p in image_dir.iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png", ".webp"))
+    if not images:
+        for i in range(NUM_REQUESTS):
+            path = image_dir / f"corpus_{i}.jpg"
+            generate_image(path, *CORPUS_SIZE, seed=i)
+            images.append(path)
+    return images
+
+def serve_images(image_dir):
+    """Serve the corpus from a local static HTTP server in a background thread. Returns the base URL."""
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(image_dir))
+    handler.log_message = lambda *args: None
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+async def test_backend(session, backend_name, url, model_name, system_prompt, user_query, image_url, round_idx):
     """Test a single backend with given prompt."""
-    print(f"  Testing {backend_name}...", end=" ", flush=True)
-    
     # Construct message with image
-    payload = {
-        "model": model_name,
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": user_query},
-                    {"type": "image_url", "image_url": {"url": TEST_IMAGE_URL}}
-                ]
-            }
-        ],
-        "max_tokens": MAX_TOKENS,
-        "temperature": 0.7,
-        "stream": True
-    }
-    
-    try:
-        start_time = time.time()
-        first_token_time = None
-        full_response = ""
-        tokens_generated = 0
-        
-        response = requests.post(url, json=payload, stream=True, timeout=180)
-        
-        if response.status_code != 200:
-            print(f"❌ Error: HTTP {response.status_code}")
-            return None
-        
-        # Stream response to measure TTFT
-        for line in response.iter_lines():
-            if line:
-                line = line.decode('utf-8')
-                if line.startswith('data: '):
-                    data = line[6:]
-                    if data == '[DONE]':
-                        break
-                    try:
-                        chunk = json.loads(data)
-                        if first_token_time is None and 'choices' in chunk and len(chunk['choices']) > 0:
-                            choice = chunk['choices'][0]
-                            delta = choice.get('delta') if choice else None
-                            if delta and delta.get('content') and len(delta.get('content', '').strip()) > 0:
-                                first_token_time = time.time()
-                        
-                        if 'choices' in chunk and len(chunk['choices']) > 0:
-                            choice = chunk['choices'][0]
-                            delta = choice.get('delta') if choice else None
-                            if delta:
-                                content = delta.get('content', '')
-                                if content:
-                                    full_response += content
-                        
-                        if 'usage' in chunk and chunk['usage']:
-                            tokens_generated = chunk['usage'].get('completion_tokens', 0)
-                    except (json.JSONDecodeError, AttributeError, KeyError, TypeError):
-                        pass
-        
-        end_time = time.time()
-        total_time = end_time - start_time
-        ttft = (first_token_time - start_time) if first_token_time else 0
-        
-        # Estimate tokens if not provided
-        if tokens_generated == 0 and full_response:
-            tokens_generated = max(1, len(full_response) // 4)
-        
-        tokens_per_second = tokens_generated / total_time if total_time > 0 else 0
-        
-        print(f"✅ TTFT: {ttft:.3f}s | Total: {total_time:.2f}s | {tokens_per_second:.2f} tok/s")
-        
-        return {
-            "backend": backend_name,
-            "time": total_time,
-            "ttft": ttft,
-            "tokens": tokens_generated,
-            "tps": tokens_per_second,
-            "response": full_response,
-            "query": user_query
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": user_query},
+                {"type": "image_url", "image_url": {"url": image_url}}
+            ]
         }
+    ]
+    record = await stream_chat(session, url, build_payload(model_name, messages, MAX_TOKENS))
     
-    except Exception as e:
-        print(f"❌ Error: {str(e)}")
+    if record["error"]:
+        print(f"  {backend_name:<7} round {round_idx+1}: ❌ Error: {record['error']}")
         return None
+    
+    # Estimate tokens if not provided
+    tokens_generated = record["tokens"]
+    if tokens_generated == 0 and record["text"]:
+        tokens_generated = max(1, len(record["text"]) // 4)
+    
+    total_time = record["time"]
+    ttft = record["ttft"] or 0
+    tokens_per_second = tokens_generated / total_time if total_time > 0 else 0
+    
+    print(f"  {backend_name:<7} round {round_idx+1}: ✅ TTFT: {ttft:.3f}s | Total: {total_time:.2f}s | {tokens_per_second:.2f} tok/s")
+    
+    return {
+        "backend": backend_name,
+        "round": round_idx,
+        "start_ts": record["start_ts"],
+        "time": total_time,
+        "ttft": ttft,
+        "tokens": tokens_generated,
+        "tps": tokens_per_second,
+        "response": record["text"],
+        "query": user_query
+    }
+
+def warmup_image_url():
+    """Data URL of a synthetic image outside the corpus, for the warmup requests."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "warmup.jpg"
+        generate_image(path, *CORPUS_SIZE, seed=-1)
+        return ImagePayloadCache(use_disk=False).get(path)["data_url"]
+
+async def warm_up(session, backend_name, url, model_name, image_url, concurrency):
+    """`concurrency` unrecorded requests: opens the connections and pays server-side first-request costs."""
+    messages = [{"role": "user", "content": [{"type": "text", "text": WARMUP_QUERY},
+                                             {"type": "image_url", "image_url": {"url": image_url}}]}]
+    records = await asyncio.gather(*(stream_chat(session, url, build_payload(model_name, messages, 16))
+                                     for _ in range(concurrency)))
+    error = next((r["error"] for r in records if r["error"]), None)
+    status = f"❌ Error: {error}" if error else f"✅ {max(r['time'] for r in records):.2f}s (not recorded)"
+    print(f"  {backend_name:<7} warmup x{concurrency}: {status}")
+
+async def run_backend(backend_name, url, model_name, image_urls, rounds, concurrency, warmup_url):
+    """One backend's request stream: unrecorded warmup, then `rounds` requests, `concurrency` at a time."""
+    results = []
+    pending = list(range(rounds))
+    
+    async def worker(session):
+        while pending:
+            i = pending.pop(0)
+            result = await test_backend(session, backend_name, url, model_name,
+                                        SYSTEM_PROMPTS[i % len(SYSTEM_PROMPTS)],
+                                        USER_QUERIES[i % len(USER_QUERIES)],
+                                        image_urls[i % len(image_urls)], i)
+            if result:
+                results.append(result)
+    
+    async with new_session(timeout=180) as session:
+        await warm_up(session, backend_name, url, model_name, warmup_url, concurrency)
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    return sorted(results, key=lambda r: r["round"])
+
+async def run_all(image_urls, rounds, concurrency, profiler, warmup_url):
+    profiler.watch_loop()
+    vllm, sglang = await asyncio.gather(
+        run_backend("vLLM", VLLM_URL, VLLM_MODEL, image_urls, rounds, concurrency, warmup_url),
+        run_backend("SGLang", SGLANG_URL, SGLANG_MODEL, image_urls, rounds, concurrency, warmup_url),
+    )
+    return vllm + sglang
 
 def main():
+    global NUM_REQUESTS, VLLM_URL, SGLANG_URL
+    parser = argparse.ArgumentParser(description="vLLM vs SGLang VLM comparison")
+    parser.add_argument("--vllm-url", default=VLLM_URL, help="vLLM chat completions endpoint")
+    parser.add_argument("--sglang-url", default=SGLANG_URL, help="SGLang chat completions endpoint")
+    parser.add_argument("--rounds", type=int, default=NUM_REQUESTS, help="Requests per backend")
+    parser.add_argument("--concurrency", type=int, default=1, help="In-flight requests per backend")
+    parser.add_argument("--image-dir", default=str(IMAGE_DIR), help="Local image corpus")
+    parser.add_argument("--serve-images", action="store_true",
+                        help="Serve images from a local static server instead of inlining data URLs")
+    args = parser.parse_args()
+    NUM_REQUESTS = args.rounds
+    VLLM_URL, SGLANG_URL = args.vllm_url, args.sglang_url
+    
+    image_dir = Path(args.image_dir)
+    images = load_corpus(image_dir)
+    if args.serve_images:
+        base_url = serve_images(image_dir)
+        image_urls = [f"{base_url}/{p.relative_to(image_dir)}" for p in images]
+        image_source = f"{base_url} ({len(images)} images from {image_dir})"
+    else:
+        # Encode once up front; every request reuses the cached data URL
+        cache = ImagePayloadCache()
+        image_urls = [cache.get(p)["data_url"] for p in images]
+        image_source = f"{len(images)} inlined images from {image_dir}"
+    
     print(f"\n{'='*80}")
     print(f"VLM Inference Comparison: vLLM vs SGLang")
     print(f"Model: Qwen3-VL-30B-A3B-Instruct")
     print(f"{'='*80}")
     print(f"vLLM endpoint:   {VLLM_URL}")
     print(f"SGLang endpoint: {SGLANG_URL}")
-    print(f"Test image:      {TEST_IMAGE_URL}")
-    print(f"Running {NUM_REQUESTS} rounds with ~1500 token system prompts")
+    print(f"Test images:     {image_source}")
+    print(f"Running {NUM_REQUESTS} rounds per backend (concurrency {args.concurrency}) with ~1500 token system prompts")
+    print(f"Warmup:          {args.concurrency} unrecorded request(s) per backend; every recorded round is warm")
     print(f"{'='*80}\n")
     
-    all_results = []
-    
-    for i in range(NUM_REQUESTS):
-        round_label = "COLD START" if i == 0 else f"WARM RUN {i}"
-        print(f"Round {i+1}/{NUM_REQUESTS} ({round_label}):")
-        
-        system_prompt = SYSTEM_PROMPTS[i]
-        user_query = USER_QUERIES[i]
-        
-        # Test vLLM
-        vllm_result = test_backend("vLLM", VLLM_URL, VLLM_MODEL, system_prompt, user_query)
-        if vllm_result:
-            all_results.append(vllm_result)
-        
-        # Small delay between backends
-        time.sleep(1)
-        
-        # Test SGLang
-        sglang_result = test_backend("SGLang", SGLANG_URL, SGLANG_MODEL, system_prompt, user_query)
-        if sglang_result:
-            all_results.append(sglang_result)
-        
-        print()
+    warmup_url = warmup_image_url()
+    profiler = ClientProfiler().start()
+    all_results = asyncio.run(run_all(image_urls, NUM_REQUESTS, args.concurrency, profiler, warmup_url))
+    profiler.stop()
+    print()
     
     # Analyze results
     print(f"{'─'*80}")
@@ -261,8 +310,7 @@ def main():
     sglang_results = [r for r in all_results if r['backend'] == 'SGLang']
     
     for i in range(NUM_REQUESTS):
-        round_label = "🥶 COLD" if i == 0 else "🔥 WARM"
-        print(f"\nRound {i+1} ({round_label}):")
+        print(f"\nRound {i+1}:")
         
         if i < len(vllm_results):
             r = vllm_results[i]
@@ -281,56 +329,56 @@ def main():
     
     if vllm_results:
         vllm_avg_ttft = sum(r['ttft'] for r in vllm_results) / len(vllm_results)
-        vllm_avg_ttft_warm = sum(r['ttft'] for r in vllm_results[1:]) / max(1, len(vllm_results[1:]))
         vllm_avg_tps = sum(r['tps'] for r in vllm_results) / len(vllm_results)
         
         print(f"\nvLLM:")
-        print(f"  Average TTFT (all):  {vllm_avg_ttft:.3f}s")
-        print(f"  Average TTFT (warm): {vllm_avg_ttft_warm:.3f}s")
+        print(f"  Average TTFT:        {vllm_avg_ttft:.3f}s")
         print(f"  Average throughput:  {vllm_avg_tps:.2f} tok/s")
     
     if sglang_results:
         sglang_avg_ttft = sum(r['ttft'] for r in sglang_results) / len(sglang_results)
-        sglang_avg_ttft_warm = sum(r['ttft'] for r in sglang_results[1:]) / max(1, len(sglang_results[1:]))
         sglang_avg_tps = sum(r['tps'] for r in sglang_results) / len(sglang_results)
         
         print(f"\nSGLang:")
-        print(f"  Average TTFT (all):  {sglang_avg_ttft:.3f}s")
-        print(f"  Average TTFT (warm): {sglang_avg_ttft_warm:.3f}s")
+        print(f"  Average TTFT:        {sglang_avg_ttft:.3f}s")
         print(f"  Average throughput:  {sglang_avg_tps:.2f} tok/s")
     
     if vllm_results and sglang_results:
-        print(f"\nComparison (Warm runs):")
-        ttft_diff = ((sglang_avg_ttft_warm - vllm_avg_ttft_warm) / vllm_avg_ttft_warm) * 100
+        print(f"\nComparison (recorded requests, all warm):")
+        ttft_diff = ((sglang_avg_ttft - vllm_avg_ttft) / vllm_avg_ttft) * 100
         tps_diff = ((sglang_avg_tps - vllm_avg_tps) / vllm_avg_tps) * 100
         
         print(f"  TTFT: SGLang is {abs(ttft_diff):.1f}% {'faster' if ttft_diff < 0 else 'slower'} than vLLM")
         print(f"  Throughput: SGLang is {abs(tps_diff):.1f}% {'faster' if tps_diff > 0 else 'slower'} than vLLM")
     
+    profiler.print_summary(all_results)
+    
     # Save results
     output_data = {
         "timestamp": datetime.now().isoformat(),
         "test_type": "vlm_comparison",
         "model": "Qwen3-VL-30B-A3B-Instruct",
-        "test_image": TEST_IMAGE_URL,
+        "test_images": [str(p) for p in images],
+        "image_transport": "static_server" if args.serve_images else "data_url",
+        "concurrency": args.concurrency,
+        "warmup_requests": args.concurrency,
         "max_tokens": MAX_TOKENS,
         "num_requests": NUM_REQUESTS,
         "results": all_results,
         "statistics": {
             "vllm": {
-                "avg_ttft_all": vllm_avg_ttft if vllm_results else None,
-                "avg_ttft_warm": vllm_avg_ttft_warm if vllm_results else None,
+                "avg_ttft": vllm_avg_ttft if vllm_results else None,
                 "avg_tps": vllm_avg_tps if vllm_results else None
             } if vllm_results else None,
             "sglang": {
-                "avg_ttft_all": sglang_avg_ttft if sglang_results else None,
-                "avg_ttft_warm": sglang_avg_ttft_warm if sglang_results else None,
+                "avg_ttft": sglang_avg_ttft if sglang_results else None,
                 "avg_tps": sglang_avg_tps if sglang_results else None
             } if sglang_results else None
-        }
+        },
+        "client_profile": profiler.to_dict(all_results)
     }
     
-    output_file = f"/compile/vlm/eval_vlm_comparison_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output_file = Path(__file__).resolve().parent / f"eval_vlm_comparison_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     with open(output_file, 'w') as f:
         json.dump(output_data, f, indent=2)
     